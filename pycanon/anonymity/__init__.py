@@ -23,6 +23,7 @@ delta-disclosure privacy.
 from ._beta_likeness import basic_beta_likeness
 from ._beta_likeness import enhanced_beta_likeness
 from ._delta_disclosure import delta_disclosure
+from ._equiv_classes import worst_equiv_classes
 from ._k_anonymity import k_anonymity
 from ._k_anonymity import alpha_k_anonymity
 from ._l_diversity import l_diversity
@@ -40,4 +41,5 @@ __all__ = [
     "entropy_l_diversity",
     "recursive_c_l_diversity",
     "t_closeness",
+    "worst_equiv_classes",
 ]
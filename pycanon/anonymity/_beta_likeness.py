@@ -20,19 +20,25 @@ import numpy as np
 import pandas as pd
 
 from pycanon.anonymity.utils import aux_anonymity
-from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_results
 
 
+@aux_results.cached
 def basic_beta_likeness(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> float:
     """Calculate beta for basic beta-likeness.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -46,39 +52,58 @@ def basic_beta_likeness(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: beta value for basic beta-likeness.
     :rtype: float.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _basic_beta_likeness_equiv(equiv, sens_att, gen)
+
+
+def _basic_beta_likeness_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    gen=True,
+) -> float:
     beta_sens_att = []
-    if gen:
-        for sens_att_value in sens_att:
-            _, dist = aux_anonymity.aux_calculate_beta(
-                data, quasi_ident, sens_att_value
-            )
-            beta_sens_att.append(max(dist))
-    else:
-        for i, sens_att_value in enumerate(sens_att):
-            tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-            _, dist = aux_anonymity.aux_calculate_beta(data, tmp_qi, sens_att_value)
-            beta_sens_att.append(max(dist))
+    for i, sens_att_value in enumerate(sens_att):
+        tmp_equiv = equiv if gen else equiv.extend(np.delete(sens_att, i))
+        dist = aux_anonymity.ec_beta(tmp_equiv, sens_att_value)
+        beta_sens_att.append(max(dist))
     beta = max(beta_sens_att)
     return beta
 
 
+@aux_results.cached
 def enhanced_beta_likeness(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> float:
     """Calculate beta for enhanced beta-likeness.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -92,26 +117,39 @@ def enhanced_beta_likeness(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: beta value for enhanced beta-likeness.
     :rtype: float.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _enhanced_beta_likeness_equiv(equiv, sens_att, gen)
+
+
+def _enhanced_beta_likeness_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    gen=True,
+) -> float:
     beta_sens_att = []
-    if gen:
-        for sens_att_value in sens_att:
-            p, dist = aux_anonymity.aux_calculate_beta(
-                data, quasi_ident, sens_att_value
-            )
-            min_beta_lnp = [min(max(dist), -np.log(p_i)) for p_i in p]
-            beta_sens_att.append(max(min_beta_lnp))
-    else:
-        for i, sens_att_value in enumerate(sens_att):
-            tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-            p, dist = aux_anonymity.aux_calculate_beta(data, tmp_qi, sens_att_value)
-            min_beta_lnp = [min(max(dist), -np.log(p_i)) for p_i in p]
-            beta_sens_att.append(max(min_beta_lnp))
+    for i, sens_att_value in enumerate(sens_att):
+        tmp_equiv = equiv if gen else equiv.extend(np.delete(sens_att, i))
+        p = tmp_equiv.sa_counts(sens_att_value).p
+        dist = aux_anonymity.ec_beta(tmp_equiv, sens_att_value)
+        min_beta_lnp = [min(max(dist), -np.log(p_i)) for p_i in p]
+        beta_sens_att.append(max(min_beta_lnp))
     beta = max(beta_sens_att)
     return beta
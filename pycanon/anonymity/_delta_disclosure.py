@@ -20,19 +20,25 @@ import numpy as np
 import pandas as pd
 
 from pycanon.anonymity.utils import aux_anonymity
-from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_results
 
 
+@aux_results.cached
 def delta_disclosure(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> float:
     """Calculate delta for delta-disclousure privacy.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -46,26 +52,36 @@ def delta_disclosure(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: delta value for delta-discloure privacy.
     :rtype: float.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _delta_disclosure_equiv(equiv, sens_att, gen)
+
+
+def _delta_disclosure_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    gen=True,
+) -> float:
     delta_sens_att = []
-    if gen:
-        for sens_att_value in sens_att:
-            aux = aux_anonymity.aux_calculate_delta_disclosure(
-                data, quasi_ident, sens_att_value
-            )
-            delta_sens_att.append(aux)
-    else:
-        for i, sens_att_value in enumerate(sens_att):
-            tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-            aux = aux_anonymity.aux_calculate_delta_disclosure(
-                data, tmp_qi, sens_att_value
-            )
-            delta_sens_att.append(aux)
+    for i, sens_att_value in enumerate(sens_att):
+        tmp_equiv = equiv if gen else equiv.extend(np.delete(sens_att, i))
+        delta_sens_att.append(max(aux_anonymity.ec_delta(tmp_equiv, sens_att_value)))
     delta = max(delta_sens_att)
     return delta
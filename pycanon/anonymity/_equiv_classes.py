@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2026 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import typing
+
+import numpy as np
+import pandas as pd
+
+from pycanon.anonymity.utils import aux_anonymity
+
+
+def _ec_k(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    return equiv.sizes
+
+
+def _ec_l(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    return np.min([aux_anonymity.ec_n_values(equiv, sa) for sa in sens_att], axis=0)
+
+
+def _ec_entropy_l(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    entropy = np.min([aux_anonymity.ec_entropy(equiv, sa) for sa in sens_att], axis=0)
+    return np.exp(1) ** entropy
+
+
+def _ec_alpha(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    max_count = [aux_anonymity.ec_max_count(equiv, sa) for sa in sens_att]
+    return np.max(max_count, axis=0) / equiv.sizes
+
+
+def _ec_beta(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    return np.max([aux_anonymity.ec_beta(equiv, sa) for sa in sens_att], axis=0)
+
+
+def _ec_enhanced_beta(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    # beta is bounded by -ln(p) of the values of the SA, as in the model
+    beta = [
+        np.minimum(
+            aux_anonymity.ec_beta(equiv, sa), np.max(-np.log(equiv.sa_counts(sa).p))
+        )
+        for sa in sens_att
+    ]
+    return np.max(beta, axis=0)
+
+
+def _ec_delta(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    return np.max([aux_anonymity.ec_delta(equiv, sa) for sa in sens_att], axis=0)
+
+
+def _ec_t(equiv: aux_anonymity.EquivClasses, sens_att: list) -> np.ndarray:
+    return np.max([aux_anonymity.ec_emd(equiv, sa) for sa in sens_att], axis=0)
+
+
+# Statistic of each equivalence class for each model, name of the statistic and
+# whether the worst classes are those with the largest values.
+_EC_STATISTICS: typing.Dict[str, typing.Tuple[typing.Callable, str, bool]] = {
+    "k_anonymity": (_ec_k, "k", False),
+    "alpha_k_anonymity": (_ec_alpha, "alpha", True),
+    "l_diversity": (_ec_l, "l", False),
+    "entropy_l_diversity": (_ec_entropy_l, "l", False),
+    "basic_beta_likeness": (_ec_beta, "beta", True),
+    "enhanced_beta_likeness": (_ec_enhanced_beta, "beta", True),
+    "delta_disclosure": (_ec_delta, "delta", True),
+    "t_closeness": (_ec_t, "t", True),
+}
+
+
+def _worst_equiv_classes_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    model: str = "k_anonymity",
+    n: int = 10,
+) -> pd.DataFrame:
+    if model not in _EC_STATISTICS:
+        raise ValueError(
+            f"Invalid model '{model}'. Available models are: {list(_EC_STATISTICS)}"
+        )
+    ec_statistic, name, largest = _EC_STATISTICS[model]
+    values = ec_statistic(equiv, list(sens_att))
+    key = -values if largest else values
+    if n < len(key):
+        idx = np.argpartition(key, n)[:n]
+    else:
+        idx = np.arange(len(key))
+    idx = idx[np.argsort(key[idx], kind="stable")]
+    worst = equiv.data[equiv.quasi_ident].iloc[equiv.first[idx]]
+    worst = worst.reset_index(drop=True)
+    worst["size"] = equiv.sizes[idx]
+    worst[name] = values[idx]
+    return worst
+
+
+def worst_equiv_classes(
+    data: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+    model: str = "k_anonymity",
+    n: int = 10,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
+) -> pd.DataFrame:
+    """Find the n equivalence classes with the worst value for a privacy model.
+
+    The worst classes are the smallest ones (k-anonymity), the least diverse
+    ones (l-diversity, entropy l-diversity) or those with the largest alpha,
+    beta, delta or t. They are selected with a partial sort of the value of
+    the model in each equivalence class.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes. Not needed for k-anonymity.
+    :type sens_att: list of strings
+
+    :param model: privacy model, one of "k_anonymity", "alpha_k_anonymity",
+        "l_diversity", "entropy_l_diversity", "basic_beta_likeness",
+        "enhanced_beta_likeness", "delta_disclosure" and "t_closeness".
+        Default to "k_anonymity".
+    :type model: string
+
+    :param n: number of equivalence classes to be returned. Default to 10.
+    :type n: int
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
+    :return: values of the QI of the worst equivalence classes, together with
+        their size and the value of the model in each one, from worst to best.
+    :rtype: pandas dataframe.
+    """
+    sens_att = [] if sens_att is None else sens_att
+    if model != "k_anonymity" and len(sens_att) == 0:
+        raise ValueError(f"Sensitive attributes are needed for {model}")
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _worst_equiv_classes_equiv(equiv, sens_att, model, n)
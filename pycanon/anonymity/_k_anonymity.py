@@ -20,41 +20,80 @@ import numpy as np
 import pandas as pd
 
 from pycanon.anonymity.utils import aux_anonymity
-from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_results
+from pycanon.anonymity.utils import aux_sketch
 
 
+@aux_results.cached
 def k_anonymity(
-    data: pd.DataFrame, quasi_ident: typing.Union[typing.List, np.ndarray]
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
+    engine: str = "exact",
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> int:
     """Calculate k for k-anonymity.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
     :type quasi_ident: list of strings
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param engine: "exact" (default) or "sketch". With "sketch", the value is
+        estimated with bounded memory from a sketch of the equivalence classes
+        (see aux_sketch.EquivSketch), which can also be given as the data. The
+        estimate can exceed the true value, so it is not a guarantee.
+    :type engine: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: k value for k-anonymity.
     :rtype: int.
     """
-    aux_functions.check_qi(data, quasi_ident)
+    if aux_sketch.use_sketch(data, engine):
+        sketch = aux_sketch.get_equiv_sketch(data, quasi_ident, weights=weights)
+        return sketch.k_anonymity()[0]
+    return _k_anonymity_equiv(
+        aux_anonymity.get_equiv_classes(
+            data, quasi_ident, weights=weights, memory_limit=memory_limit
+        )
+    )
+
 
-    equiv_class = aux_anonymity.get_equiv_class(data, quasi_ident)
-    k_anon = min([len(x) for x in equiv_class])
-    return k_anon
+def _k_anonymity_equiv(equiv: aux_anonymity.EquivClasses) -> int:
+    return int(np.min(equiv.sizes))
 
 
+@aux_results.cached
 def alpha_k_anonymity(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> typing.Tuple[float, int]:
     """Calculate alpha and k for (alpha,k)-anonymity.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -68,41 +107,44 @@ def alpha_k_anonymity(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: alpha and k values for (alpha,k)-anonymity.
     :rtype: alpha is a float, k is an int.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
-    k_anon = k_anonymity(data, quasi_ident)
-    equiv_class = aux_anonymity.get_equiv_class(data, quasi_ident)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _alpha_k_anonymity_equiv(equiv, sens_att, gen)
+
+
+def _alpha_k_anonymity_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    gen=True,
+) -> typing.Tuple[float, int]:
+    k_anon = _k_anonymity_equiv(equiv)
     if gen:
-        alpha_ec = []
-        for ec in equiv_class:
-            data_temp = data.iloc[aux_functions.convert(ec)]
-            alpha_sa = []
-            for sa in sens_att:
-                values = np.unique(data_temp[sa].values)
-                _alpha = [
-                    len(data_temp[data_temp[sa] == s]) / len(data_temp) for s in values
-                ]
-                alpha_sa.append(max(_alpha))
-            alpha_ec.append(max(alpha_sa))
-        alpha = max(alpha_ec)
+        alpha_sa = [
+            aux_anonymity.ec_max_count(equiv, sa) / equiv.sizes for sa in sens_att
+        ]
+        alpha = max(np.max(alpha_sa, axis=0))
     else:
         alpha_sa = []
         for i, sa in enumerate(sens_att):
-            tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-            equiv_class = aux_anonymity.get_equiv_class(data, tmp_qi)
-            alpha_ec = []
-            for ec in equiv_class:
-                data_temp = data.iloc[aux_functions.convert(ec)]
-                values = np.unique(data_temp[sa].values)
-                _alpha = [
-                    len(data_temp[data_temp[sa] == s]) / len(data_temp) for s in values
-                ]
-                alpha_ec.append(max(_alpha))
+            tmp_equiv = equiv.extend(np.delete(sens_att, i))
+            alpha_ec = aux_anonymity.ec_max_count(tmp_equiv, sa) / tmp_equiv.sizes
             alpha_sa.append(max(alpha_ec))
         alpha = max(alpha_sa)
     return alpha, k_anon
@@ -21,18 +21,27 @@ import pandas as pd
 
 from pycanon.anonymity.utils import aux_anonymity
 from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_results
+from pycanon.anonymity.utils import aux_sketch
 
 
+@aux_results.cached
 def l_diversity(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     gen=True,
+    weights: typing.Optional[str] = None,
+    engine: str = "exact",
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> int:
     """Calculate l for l-diversity.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -46,43 +55,72 @@ def l_diversity(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param engine: "exact" (default) or "sketch". With "sketch", the value is
+        estimated with bounded memory from a sketch of the equivalence classes
+        (see aux_sketch.EquivSketch), which can also be given as the data. The
+        estimate can exceed the true value, so it is not a guarantee.
+        Only with gen=True or a single SA.
+    :type engine: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: l value for l-diversity.
     :rtype: int.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
+    if aux_sketch.use_sketch(data, engine):
+        if not gen and len(sens_att) > 1:
+            raise ValueError("The sketch engine needs gen=True for several SA.")
+        sketch = aux_sketch.get_equiv_sketch(data, quasi_ident, sens_att, weights)
+        return sketch.l_diversity()[0]
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _l_diversity_equiv(equiv, sens_att, gen)
 
-    equiv_class = aux_anonymity.get_equiv_class(data, quasi_ident)
+
+def _l_diversity_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    gen=True,
+) -> int:
     l_div = []
     if gen:
-        for ec in equiv_class:
-            data_temp = data.iloc[aux_functions.convert(ec)]
-            l_sa = [len(np.unique(data_temp[sa].values)) for sa in sens_att]
-            l_div.append(min(l_sa))
+        for sa in sens_att:
+            l_div.append(min(aux_anonymity.ec_n_values(equiv, sa)))
     else:
         for i, sa in enumerate(sens_att):
-            tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-            equiv_class = aux_anonymity.get_equiv_class(data, tmp_qi)
-            l_ec = []
-            for ec in equiv_class:
-                data_temp = data.iloc[aux_functions.convert(ec)]
-                l_ec.append(len(np.unique(data_temp[sa].values)))
-            l_div.append(min(l_ec))
-    return min(l_div)
+            tmp_equiv = equiv.extend(np.delete(sens_att, i))
+            l_div.append(min(aux_anonymity.ec_n_values(tmp_equiv, sa)))
+    return int(min(l_div))
 
 
+@aux_results.cached
 def entropy_l_diversity(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> float:
     """Calculate l for entropy l-diversity.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -96,60 +134,63 @@ def entropy_l_diversity(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: l value for entropy l-diversity.
     :rtype: float.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _entropy_l_diversity_equiv(equiv, sens_att, gen)
+
 
+def _entropy_l_diversity_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    gen=True,
+) -> float:
     if gen:
-        equiv_class = aux_anonymity.get_equiv_class(data, quasi_ident)
-        entropy_ec = []
-        for ec in equiv_class:
-            data_temp = data.iloc[aux_functions.convert(ec)]
-            entropy_sa = []
-            for sa in sens_att:
-                values = np.unique(data_temp[sa].values)
-                p = [
-                    len(data_temp[data_temp[sa] == s]) / len(data_temp) for s in values
-                ]
-                entropy = np.sum(p * np.log(p))
-                entropy_sa.append(-entropy)
-            entropy_ec.append(min(entropy_sa))
+        entropy_sa = [aux_anonymity.ec_entropy(equiv, sa) for sa in sens_att]
+        entropy_ec = np.min(entropy_sa, axis=0)
         ent_l = int(min(np.exp(1) ** entropy_ec))
     else:
         entropy_sa = []
         for i, sa in enumerate(sens_att):
-            tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-            equiv_class = aux_anonymity.get_equiv_class(data, tmp_qi)
-            entropy_ec = []
-            for ec in equiv_class:
-                data_temp = data.iloc[aux_functions.convert(ec)]
-                entropy = 0
-                values = np.unique(data_temp[sa].values)
-                p = [
-                    len(data_temp[data_temp[sa] == s]) / len(data_temp) for s in values
-                ]
-                entropy = np.sum(p * np.log(p))
-                entropy_ec.append(-entropy)
-            entropy_sa.append(min(entropy_ec))
-        ent_l = int(min(np.exp(1) ** entropy_sa))
+            tmp_equiv = equiv.extend(np.delete(sens_att, i))
+            entropy_sa.append(min(aux_anonymity.ec_entropy(tmp_equiv, sa)))
+        ent_l = int(min(np.exp(1) ** np.array(entropy_sa)))
     return ent_l
 
 
+@aux_results.cached
 def recursive_c_l_diversity(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     imp=False,
     gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> typing.Tuple[float, int]:
     """Calculate c and l for recursive (c,l)-diversity.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -163,42 +204,45 @@ def recursive_c_l_diversity(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: c and l values for recursive (c,l)-diversity.
     :rtype: c is a float, l is an int.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
-    l_div = l_diversity(data, quasi_ident, sens_att)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _recursive_c_l_diversity_equiv(equiv, sens_att, imp, gen)
+
+
+def _recursive_c_l_diversity_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    imp=False,
+    gen=True,
+) -> typing.Tuple[float, int]:
+    l_div = _l_diversity_equiv(equiv, sens_att)
     if l_div > 1:
         c_div_aux = []
         if gen:
-            equiv_class = aux_anonymity.get_equiv_class(data, quasi_ident)
             for sens_att_value in sens_att:
-                c_sa = []
-                for ec in equiv_class:
-                    data_temp = data.iloc[aux_functions.convert(ec)]
-                    values = np.unique(data_temp[sens_att_value].values)
-                    r_ec = np.sort(
-                        [len(data_temp[data_temp[sens_att_value] == s]) for s in values]
-                    )
-                    c_sa.append(
-                        np.floor(r_ec[0] / sum(r_ec[l_div - 1 :]) + 1)  # noqa: E203
-                    )
+                c_sa = aux_anonymity.ec_recursive_c(equiv, sens_att_value, l_div)
                 c_div_aux.append(int(max(c_sa)))
         else:
             for i, sa in enumerate(sens_att):
-                tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-                equiv_class = aux_anonymity.get_equiv_class(data, tmp_qi)
-                c_sa = []
-                for ec in equiv_class:
-                    data_temp = data.iloc[aux_functions.convert(ec)]
-                    values = np.unique(data_temp[sa].values)
-                    r_ec = np.sort([len(data_temp[data_temp[sa] == s]) for s in values])
-                    c_sa.append(
-                        np.floor(r_ec[0] / sum(r_ec[l_div - 1 :]) + 1)  # noqa: E203
-                    )
+                tmp_equiv = equiv.extend(np.delete(sens_att, i))
+                c_sa = aux_anonymity.ec_recursive_c(tmp_equiv, sa, l_div)
                 c_div_aux.append(int(max(c_sa)))
         c_div = np.max(c_div_aux)
     else:
@@ -20,19 +20,25 @@ import numpy as np
 import pandas as pd
 
 from pycanon.anonymity.utils import aux_anonymity
-from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_results
 
 
+@aux_results.cached
 def t_closeness(
-    data: pd.DataFrame,
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
     gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
 ) -> float:
     """Calculate t for t-closeness.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -46,38 +52,35 @@ def t_closeness(
         case of multiple SA, if False, the set of QI is updated for each SA
     :type  gen: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
+
     :return: t value for basic t-closeness.
     :rtype: float.
     """
     quasi_ident = np.array(quasi_ident)
     sens_att = np.array(sens_att)
-    aux_functions.check_qi(data, quasi_ident)
-    aux_functions.check_sa(data, sens_att)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _t_closeness_equiv(equiv, sens_att, gen)
+
+
+def _t_closeness_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    gen=True,
+) -> float:
     t_sens_att = []
-    if gen:
-        for sens_att_value in sens_att:
-            if pd.api.types.is_numeric_dtype(data[sens_att_value]):
-                t_sens_att.append(
-                    aux_anonymity.aux_t_closeness_num(data, quasi_ident, sens_att_value)
-                )
-            elif pd.api.types.is_string_dtype(data[sens_att_value]):
-                t_sens_att.append(
-                    aux_anonymity.aux_t_closeness_str(data, quasi_ident, sens_att_value)
-                )
-            else:
-                raise ValueError("Error, invalid sens_att value type")
-    else:
-        for i, sens_att_value in enumerate(sens_att):
-            if pd.api.types.is_numeric_dtype(data[sens_att_value]):
-                tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-                t_sens_att.append(
-                    aux_anonymity.aux_t_closeness_num(data, tmp_qi, sens_att_value)
-                )
-            elif pd.api.types.is_string_dtype(data[sens_att_value]):
-                tmp_qi = np.concatenate([quasi_ident, np.delete(sens_att, i)])
-                t_sens_att.append(
-                    aux_anonymity.aux_t_closeness_str(data, tmp_qi, sens_att_value)
-                )
-            else:
-                raise ValueError("Error, invalid sens_att value type")
+    for i, sens_att_value in enumerate(sens_att):
+        tmp_equiv = equiv if gen else equiv.extend(np.delete(sens_att, i))
+        t_sens_att.append(max(aux_anonymity.ec_emd(tmp_equiv, sens_att_value)))
     return max(t_sens_att)
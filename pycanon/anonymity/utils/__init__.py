@@ -18,5 +18,12 @@
 
 __all__ = [
     "aux_anonymity",
+    "aux_cache",
+    "aux_fingerprint",
     "aux_functions",
+    "aux_index",
+    "aux_results",
+    "aux_sketch",
+    "aux_spill",
+    "aux_sql",
 ]
@@ -24,9 +24,20 @@ delta-disclosure privacy.
 
 import numpy as np
 import pandas as pd
+
+from typing import Dict, Iterable, NamedTuple, Tuple, Union
+
 from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_spill
+from pycanon.anonymity.utils import aux_sql
 
-from typing import Tuple, Union
+GROUPINGS = ["auto", "hash", "sort"]
+# Minimum rows of a dataframe to choose its grouping (smaller ones are hashed),
+# rows of the sample used to choose it and the minimum proportion of distinct
+# combinations of QI in the sample to group the records by sorting them
+SORT_MIN_ROWS = 2**16
+SORT_SAMPLE_ROWS = 10000
+SORT_DISTINCT_RATIO = 0.5
 
 
 def get_equiv_class(data: pd.DataFrame, quasi_ident: Union[list, np.ndarray]) -> list:
@@ -51,9 +62,851 @@ def get_equiv_class(data: pd.DataFrame, quasi_ident: Union[list, np.ndarray]) ->
     return equiv_class
 
 
+def get_equiv_class_codes(
+    data: pd.DataFrame,
+    quasi_ident: Union[list, np.ndarray],
+    grouping: str = "hash",
+) -> np.ndarray:
+    """Assign to each record the index of its equivalence class.
+
+    Missing values of the quasi-identifiers are taken as one more value, so
+    the records with them form equivalence classes of their own (as in
+    get_equiv_class with several QI), numbered after the rest. The classes
+    are numbered in the order of their values of the QI, whatever the
+    grouping.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are the quasi-identifiers.
+    :type quasi_ident: is a list of strings
+
+    :param grouping: "hash" (default) to group the records with a hash table
+        (pandas groupby), "sort" to sort them (see get_equiv_class_offsets)
+        or "auto" to choose it with choose_grouping.
+    :type grouping: string
+
+    :return: equivalence class index of each record.
+    :rtype: numpy array of ints.
+    """
+    if isinstance(quasi_ident, np.ndarray):
+        quasi_ident = quasi_ident.tolist()
+    if _resolve_grouping(data, quasi_ident, grouping) == "sort":
+        return get_equiv_class_offsets(data, quasi_ident)[0]
+    codes = data.groupby(by=quasi_ident, observed=True, dropna=False).ngroup()
+    return codes.to_numpy(dtype=np.int64)
+
+
+def get_equiv_class_offsets(
+    data: pd.DataFrame, quasi_ident: Union[list, np.ndarray]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Group the records by the quasi-identifiers by sorting them.
+
+    The values of each QI are taken as integer keys (the values themselves
+    for integers, booleans and floats without missing values, their sorted
+    codes otherwise, with the missing values last), the rows are sorted by
+    the keys with np.lexsort and the classes start where any key changes. It
+    needs less memory than a hash table when the QI are almost unique (e.g.
+    timestamps), and the sort is skipped if the rows are already sorted by
+    the QI.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are the quasi-identifiers.
+    :type quasi_ident: is a list of strings
+
+    :return: equivalence class index of each record (as in
+        get_equiv_class_codes), permutation of the rows that sorts them by
+        class and offset of each class in it, followed by the number of rows.
+    :rtype: numpy arrays of ints.
+    """
+    if isinstance(quasi_ident, np.ndarray):
+        quasi_ident = quasi_ident.tolist()
+    n_rows = len(data)
+    keys = [_sort_key(data[col]) for col in quasi_ident]
+    order = None if _is_sorted(keys) else np.lexsort(keys[::-1])
+    boundary = np.zeros(n_rows, dtype=bool)
+    boundary[:1] = True
+    for key in keys:
+        if order is not None:
+            key = key[order]
+        boundary[1:] |= key[1:] != key[:-1]
+    permutation = np.arange(n_rows) if order is None else order
+    offsets = np.append(np.flatnonzero(boundary), n_rows)
+    codes = np.empty(n_rows, dtype=np.int64)
+    codes[permutation] = np.cumsum(boundary) - 1
+    return codes, permutation, offsets
+
+
+def choose_grouping(data: pd.DataFrame, quasi_ident: Union[list, np.ndarray]) -> str:
+    """Choose how to group the records of a dataframe by the quasi-identifiers.
+
+    The records are sorted if, in an evenly spaced sample of rows, they are
+    already sorted by the QI or most of the combinations of QI are distinct,
+    and grouped with a hash table otherwise. Dataframes with less than
+    SORT_MIN_ROWS rows are always grouped with a hash table, as sampling them
+    would cost more than the grouping saves.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are the quasi-identifiers.
+    :type quasi_ident: is a list of strings
+
+    :return: "sort" or "hash".
+    :rtype: string
+    """
+    if len(data) < max(SORT_MIN_ROWS, 2):
+        return "hash"
+    if isinstance(quasi_ident, np.ndarray):
+        quasi_ident = quasi_ident.tolist()
+    step = max(len(data) // SORT_SAMPLE_ROWS, 1)
+    sample = data[quasi_ident].iloc[::step]
+    _, permutation, offsets = get_equiv_class_offsets(sample, quasi_ident)
+    if np.all(np.diff(permutation) > 0):
+        return "sort"
+    if len(offsets) - 1 >= SORT_DISTINCT_RATIO * len(sample):
+        return "sort"
+    return "hash"
+
+
+def _resolve_grouping(data: pd.DataFrame, quasi_ident: list, grouping: str) -> str:
+    if grouping not in GROUPINGS:
+        raise ValueError(f"Invalid grouping: {grouping}. Use one of {GROUPINGS}")
+    if grouping == "auto":
+        return choose_grouping(data, quasi_ident)
+    return grouping
+
+
+def _sort_key(column: pd.Series) -> np.ndarray:
+    """Get sortable keys of the values of a column, the missing values last."""
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        # the classes are in the order of the categories, as in groupby
+        codes = column.cat.codes.to_numpy()
+        n_values = len(dtype.categories)
+    elif isinstance(dtype, np.dtype) and dtype.kind in "biuf" and not column.hasnans:
+        return column.to_numpy()
+    else:
+        codes, uniques = pd.factorize(column, sort=True)
+        n_values = len(uniques)
+    return np.where(codes < 0, n_values, codes)
+
+
+def _is_sorted(keys: list) -> bool:
+    """Check whether the rows are sorted by the keys (lexicographically)."""
+    if not keys or len(keys[0]) < 2:
+        return True
+    # pairs of consecutive rows equal in all the previous keys
+    tied = np.ones(len(keys[0]) - 1, dtype=bool)
+    for key in keys:
+        previous, current = key[:-1], key[1:]
+        if np.any(current[tied] < previous[tied]):
+            return False
+        tied &= current == previous
+    return True
+
+
+def get_equiv_class_sizes(
+    codes: np.ndarray, weights: Union[np.ndarray, None] = None
+) -> np.ndarray:
+    """Calculate the size of each equivalence class from the records' codes.
+
+    :param codes: equivalence class index of each record, as returned by
+        get_equiv_class_codes.
+    :type codes: numpy array of ints
+
+    :param weights: number of records represented by each row. If None, each
+        row is a record.
+    :type weights: numpy array of ints
+
+    :return: number of records in each equivalence class.
+    :rtype: numpy array of ints.
+    """
+    return _weighted_bincount(codes, weights)
+
+
+def _weighted_bincount(
+    codes: np.ndarray, weights: Union[np.ndarray, None], minlength: int = 0
+) -> np.ndarray:
+    """Count the (weighted) occurrences of the non-negative codes."""
+    mask = codes >= 0
+    if weights is None:
+        return np.bincount(codes[mask], minlength=minlength)
+    counts = np.bincount(codes[mask], weights=weights[mask], minlength=minlength)
+    if np.issubdtype(weights.dtype, np.integer):
+        counts = np.rint(counts).astype(np.int64)
+    return counts
+
+
+def aggregate_chunks(
+    chunks: Iterable[pd.DataFrame],
+    columns: Union[list, np.ndarray],
+    weights: Union[str, None] = None,
+) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Aggregate the records of several chunks by the given columns.
+
+    Each chunk is reduced to its distinct combinations of values of the
+    columns and merged with the previous ones, so that only one chunk is kept
+    in memory at a time.
+
+    :param chunks: chunks of the data under study.
+    :type chunks: iterable of pandas dataframes
+
+    :param columns: list with the name of the columns to be kept.
+    :type columns: list of strings
+
+    :param weights: name of the column with the number of records
+        represented by each row. If None, each row is a record.
+    :type weights: string
+
+    :return: distinct combinations of values of the columns and number of
+        records with each of them.
+    :rtype: pandas dataframe and numpy array of ints.
+    """
+    if isinstance(columns, np.ndarray):
+        columns = columns.tolist()
+    columns = list(dict.fromkeys(columns))
+    counts = None
+    for chunk in chunks:
+        grouped = chunk.groupby(by=columns, dropna=False, observed=True, sort=False)
+        if weights is None:
+            chunk_counts = grouped.size()
+        else:
+            chunk_counts = grouped[weights].sum()
+        if counts is None:
+            counts = chunk_counts
+        else:
+            counts = (
+                pd.concat([counts, chunk_counts])
+                .groupby(level=columns, dropna=False, observed=True, sort=False)
+                .sum()
+            )
+    if counts is None:
+        raise ValueError("No data to aggregate.")
+    data = counts.index.to_frame(index=False)
+    for col in data.columns:
+        if isinstance(data[col].dtype, pd.CategoricalDtype):
+            data[col] = data[col].astype(data[col].cat.categories.dtype)
+    return data, counts.to_numpy(dtype=np.int64)
+
+
+class SACounts(NamedTuple):
+    """Frequency of the values of a sensitive attribute in each equivalence class.
+
+    Only the (equivalence class, value) pairs present in the data are stored,
+    sorted by equivalence class and value.
+    """
+
+    values: np.ndarray
+    p: np.ndarray
+    ec: np.ndarray
+    value: np.ndarray
+    count: np.ndarray
+
+
+class EquivClasses:
+    """Equivalence classes of a dataset, shared between privacy models and metrics.
+
+    The records are grouped by the quasi-identifiers only once. The frequencies
+    of the sensitive attributes in each equivalence class are calculated on
+    demand and cached, so that several models can be evaluated over the same
+    grouping.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are the quasi-identifiers.
+    :type quasi_ident: is a list of strings
+
+    :param weights: number of records represented by each row of the
+        dataframe (e.g. when the data has been aggregated, or the inverse of
+        the inclusion probability of each row of a sample). If None, each row
+        is a record.
+    :type weights: numpy array of ints or floats
+
+    :param codes: equivalence class index of each record, if it is already
+        known (e.g. for a resample of the same records). If None, the records
+        are grouped by the quasi-identifiers.
+    :type codes: numpy array of ints
+
+    :param sizes: size of each equivalence class, if it is already known
+        together with the codes. If None, it is calculated from the codes and
+        the weights.
+    :type sizes: numpy array of ints or floats
+
+    :param grouping: "auto" (default), "hash" or "sort", how the records are
+        grouped (see get_equiv_class_codes). With "sort", the permutation of
+        the rows by class and the offsets of the classes are obtained
+        directly.
+    :type grouping: string
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        quasi_ident: Union[list, np.ndarray],
+        weights: Union[np.ndarray, None] = None,
+        codes: Union[np.ndarray, None] = None,
+        grouping: str = "auto",
+        sizes: Union[np.ndarray, None] = None,
+    ):
+        """Group the records of the dataset by the quasi-identifiers."""
+        if isinstance(quasi_ident, np.ndarray):
+            quasi_ident = quasi_ident.tolist()
+        self.data = data
+        self.quasi_ident = list(quasi_ident)
+        self.weights = weights
+        self.grouping = grouping
+        self._permutation: Union[np.ndarray, None] = None
+        self._offsets: Union[np.ndarray, None] = None
+        if codes is None:
+            grouping = _resolve_grouping(data, self.quasi_ident, grouping)
+            if grouping == "sort":
+                codes, self._permutation, self._offsets = get_equiv_class_offsets(
+                    data, self.quasi_ident
+                )
+            else:
+                codes = get_equiv_class_codes(data, self.quasi_ident)
+        self.codes = codes
+        if sizes is not None:
+            self.sizes = sizes
+        elif self._offsets is not None and weights is None:
+            self.sizes = np.diff(self._offsets)
+        else:
+            self.sizes = get_equiv_class_sizes(self.codes, weights)
+        self._sa_counts: Dict[tuple, SACounts] = {}
+        self._extended: Dict[tuple, "EquivClasses"] = {}
+        self._first: Union[np.ndarray, None] = None
+
+    @property
+    def n_ec(self) -> int:
+        """Get the number of equivalence classes."""
+        return len(self.sizes)
+
+    @property
+    def n_records(self) -> Union[int, float]:
+        """Get the number of records of the dataset.
+
+        It is a float if the weights are not integers (e.g. the inverse of the
+        inclusion probabilities of a sample).
+        """
+        if self.weights is None:
+            return len(self.data)
+        if np.issubdtype(self.weights.dtype, np.integer):
+            return int(self.weights.sum())
+        return float(self.weights.sum())
+
+    @property
+    def first(self) -> np.ndarray:
+        """Get the position of the first record of each equivalence class."""
+        if self._first is None:
+            if self._offsets is not None:
+                self._first = self.permutation[self.offsets[:-1]]
+            else:
+                mask = self.codes >= 0
+                self._first = np.zeros(self.n_ec, dtype=np.int64)
+                self._first[self.codes[mask][::-1]] = np.flatnonzero(mask)[::-1]
+        return self._first
+
+    @property
+    def permutation(self) -> np.ndarray:
+        """Get the position of the rows sorted by equivalence class.
+
+        The rows of each class keep their order, and the rows that do not
+        belong to any class are left out.
+        """
+        if self._permutation is None:
+            permutation = np.argsort(self.codes, kind="stable")
+            self._permutation = permutation[self.codes[permutation] >= 0]
+        return self._permutation
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """Get the offset of each equivalence class in the permutation.
+
+        It is followed by the number of rows of the permutation, so the rows
+        of the class ec are permutation[offsets[ec]:offsets[ec + 1]].
+        """
+        if self._offsets is None:
+            self._offsets = np.searchsorted(
+                self.codes[self.permutation], np.arange(self.n_ec + 1)
+            )
+        return self._offsets
+
+    def rows(self, ec: int) -> np.ndarray:
+        """Get the position of the rows of an equivalence class in the data.
+
+        :param ec: index of the equivalence class.
+        :type ec: int
+
+        :return: position of the rows of the class.
+        :rtype: numpy array of ints.
+        """
+        start, stop = self.offsets[ec], self.offsets[ec + 1]
+        return self.permutation[start:stop]
+
+    def sa_counts(self, sens_att_value: Union[str, list]) -> SACounts:
+        """Get the frequency of each value of the SA in each equivalence class.
+
+        :param sens_att_value: sensitive attribute under study. If a list is
+            given, the combination of the values of its columns is used.
+        :type sens_att_value: string or list of strings
+
+        :return: values of the SA, proportion of each value in the entire
+            database and frequency of each value in each equivalence class.
+        :rtype: SACounts.
+        """
+        key = _columns_key(sens_att_value)
+        if key not in self._sa_counts:
+            values, sa_codes = _factorize(self.data, list(key))
+            m = max(len(values), 1)
+            p = _weighted_bincount(sa_codes, self.weights, len(values))
+            p = p / self.n_records
+            mask = (self.codes >= 0) & (sa_codes >= 0)
+            pairs, inverse = np.unique(
+                self.codes[mask] * m + sa_codes[mask], return_inverse=True
+            )
+            weights = None if self.weights is None else self.weights[mask]
+            count = _weighted_bincount(inverse, weights, len(pairs))
+            self._sa_counts[key] = SACounts(values, p, pairs // m, pairs % m, count)
+        return self._sa_counts[key]
+
+    def extend(self, columns: Union[list, np.ndarray]) -> "EquivClasses":
+        """Get the equivalence classes adding the given columns to the QI.
+
+        Used when the set of QI is updated for each SA (gen=False).
+
+        :param columns: columns to be added to the quasi-identifiers.
+        :type columns: list of strings
+
+        :return: equivalence classes for the extended set of QI.
+        :rtype: EquivClasses.
+        """
+        key = _columns_key(list(columns))
+        if not key:
+            return self
+        if key not in self._extended:
+            self._extended[key] = EquivClasses(
+                self.data,
+                self.quasi_ident + list(key),
+                self.weights,
+                None,
+                self.grouping,
+            )
+        return self._extended[key]
+
+    def check_columns(
+        self,
+        quasi_ident: Union[list, np.ndarray],
+        sens_att: Union[list, np.ndarray, None] = None,
+        weights: Union[str, None] = None,
+    ) -> None:
+        """Check that the classes can be used for the given QI, SA and weights.
+
+        The QI must be the ones used to group the records (in any order), the
+        SA must be available and the weights are those given when the classes
+        were built.
+
+        :param quasi_ident: list with the name of the quasi-identifiers.
+        :type quasi_ident: list of strings
+
+        :param sens_att: list with the name of the sensitive attributes.
+        :type sens_att: list of strings
+
+        :param weights: name of the column with the number of records
+            represented by each row.
+        :type weights: string
+        """
+        if sorted(map(str, quasi_ident)) != sorted(map(str, self.quasi_ident)):
+            raise ValueError(
+                f"The equivalence classes are defined by {self.quasi_ident}, "
+                f"not by {list(quasi_ident)}"
+            )
+        aux_functions.check_sa(self.data, [] if sens_att is None else sens_att)
+        if weights is not None:
+            raise ValueError(
+                "The weights are given when the equivalence classes are built."
+            )
+
+
+def _columns_key(columns: Union[str, list, np.ndarray]) -> tuple:
+    if isinstance(columns, str):
+        return (columns,)
+    return tuple(np.asarray(columns).tolist())
+
+
+def _factorize(data: pd.DataFrame, columns: list) -> Tuple[np.ndarray, np.ndarray]:
+    """Encode the (sorted) values of the given columns as integers."""
+    if len(columns) == 1:
+        sa_codes, values = pd.factorize(data[columns[0]], sort=True)
+        return np.asarray(values), sa_codes.astype(np.int64)
+    grouped = data.groupby(by=columns, observed=True)
+    sa_codes = grouped.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+    return grouped.size().index.to_numpy(), sa_codes
+
+
+def get_equiv_classes(
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    quasi_ident: Union[list, np.ndarray],
+    sens_att: Union[list, np.ndarray, None] = None,
+    weights: Union[str, None] = None,
+    memory_limit: Union[int, str, None] = None,
+    grouping: str = "auto",
+) -> EquivClasses:
+    """Check the QI and SA and group the data by the quasi-identifiers.
+
+    :param data: dataframe with the data under study, Arrow-compatible
+        table (e.g. polars dataframe or pyarrow table, converted with
+        aux_functions.from_arrow), iterable of dataframes with chunks of the
+        data (e.g. as returned by aux_functions.iter_file), which are
+        aggregated incrementally, table of a SQL database, which is
+        aggregated by the database, or equivalence classes already built
+        (e.g. loaded with aux_index.load_index), which are returned as they
+        are.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes, aux_sql.SQLTable or
+        EquivClasses
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are the quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If grouping a dataframe at
+        once would exceed it, or the data is given in chunks, the records are
+        grouped by partitions spilled to disk (see aux_spill). If None, the
+        records are grouped in memory.
+    :type memory_limit: int or string
+
+    :param grouping: "auto" (default), "hash" or "sort", how the records of
+        a dataframe are grouped in memory (see get_equiv_class_codes).
+    :type grouping: string
+
+    :return: equivalence classes of the data.
+    :rtype: EquivClasses.
+    """
+    sens_att = [] if sens_att is None else list(sens_att)
+    if isinstance(data, EquivClasses):
+        data.check_columns(quasi_ident, sens_att, weights)
+        return data
+    columns = list(quasi_ident) + sens_att
+    if aux_functions.is_arrow_like(data):
+        data = aux_functions.from_arrow(
+            data, columns + ([] if weights is None else [weights])
+        )
+    if memory_limit is not None and not isinstance(data, aux_sql.SQLTable):
+        limit = aux_spill.parse_memory_limit(memory_limit)
+        if isinstance(data, pd.DataFrame):
+            n_columns = len(set(columns))
+            if aux_spill.estimate_memory(len(data), n_columns) <= limit:
+                return get_equiv_classes(
+                    data, quasi_ident, sens_att, weights, grouping=grouping
+                )
+            data = aux_spill.iter_blocks(data, limit, n_columns)
+        data, counts, codes = aux_spill.aggregate_spilled(
+            _checked_chunks(data, quasi_ident, sens_att, weights),
+            quasi_ident,
+            sens_att,
+            limit,
+            weights,
+        )
+        return EquivClasses(data, quasi_ident, counts, codes=codes)
+    if isinstance(data, pd.DataFrame):
+        aux_functions.check_qi(data, quasi_ident)
+        aux_functions.check_sa(data, sens_att)
+        if weights is not None:
+            weights = aux_functions.check_weights(data, weights)
+        return EquivClasses(data, quasi_ident, weights, grouping=grouping)
+    if isinstance(data, aux_sql.SQLTable):
+        data, counts = aux_sql.get_aggregates(data, quasi_ident, sens_att, weights)
+        return EquivClasses(data, quasi_ident, counts)
+    data, counts = aggregate_chunks(
+        _checked_chunks(data, quasi_ident, sens_att, weights), columns, weights
+    )
+    return EquivClasses(data, quasi_ident, counts)
+
+
+def _checked_chunks(
+    chunks: Iterable[pd.DataFrame],
+    quasi_ident: Union[list, np.ndarray],
+    sens_att: list,
+    weights: Union[str, None] = None,
+) -> Iterable[pd.DataFrame]:
+    for chunk in chunks:
+        aux_functions.check_qi(chunk, quasi_ident)
+        aux_functions.check_sa(chunk, sens_att)
+        if weights is not None:
+            aux_functions.check_weights(chunk, weights)
+        yield chunk
+
+
+def get_common_codes(datasets: list, columns: Union[list, np.ndarray]) -> list:
+    """Encode the given columns of several datasets with a common dictionary.
+
+    Each combination of values of the columns is mapped to the same integer
+    key in all the datasets, so that they can be joined on integer keys.
+    Missing values are encoded as a value of their own.
+
+    :param datasets: dataframes sharing the given columns.
+    :type datasets: list of pandas dataframes
+
+    :param columns: list with the name of the columns to be encoded.
+    :type columns: list of strings
+
+    :return: integer key of each record, for each dataset.
+    :rtype: list of numpy arrays of ints.
+    """
+    lengths = [len(data) for data in datasets]
+    key = np.zeros(sum(lengths), dtype=np.int64)
+    for col in columns:
+        codes, uniques = pd.factorize(
+            pd.concat([data[col] for data in datasets], ignore_index=True)
+        )
+        radix = len(uniques) + 1
+        if len(key) > 0 and int(key.max()) >= (2**62) // radix:
+            key = pd.factorize(key)[0].astype(np.int64)
+        key = key * radix + (codes + 1)
+    return np.split(key, np.cumsum(lengths)[:-1])
+
+
+def ec_max_count(equiv: EquivClasses, sens_att_value: Union[str, list]) -> np.ndarray:
+    """Calculate the frequency of the most common value of the SA in each class.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :return: frequency of the most common value in each equivalence class.
+    :rtype: numpy array of ints (floats if the weights are not integers).
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    max_count = np.zeros(equiv.n_ec, dtype=counts.count.dtype)
+    np.maximum.at(max_count, counts.ec, counts.count)
+    return max_count
+
+
+def ec_n_values(equiv: EquivClasses, sens_att_value: str) -> np.ndarray:
+    """Calculate the number of distinct values of the SA in each equivalence class.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :return: number of distinct values in each equivalence class.
+    :rtype: numpy array of ints.
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    return np.bincount(counts.ec, minlength=equiv.n_ec)
+
+
+def ec_entropy(equiv: EquivClasses, sens_att_value: str) -> np.ndarray:
+    """Calculate the entropy of the SA in each equivalence class.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :return: entropy of the SA in each equivalence class.
+    :rtype: numpy array of floats.
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    return grouped_entropy(counts.ec, counts.count, equiv.n_ec)
+
+
+def grouped_entropy(group: np.ndarray, count: np.ndarray, n_groups: int) -> np.ndarray:
+    """Calculate the Shannon entropy of several distributions given by counts.
+
+    :param group: index of the distribution (e.g. equivalence class) of each
+        count.
+    :type group: numpy array of ints
+
+    :param count: frequency of each value in its distribution. Null
+        frequencies are ignored.
+    :type count: numpy array
+
+    :param n_groups: number of distributions.
+    :type n_groups: int
+
+    :return: entropy of each distribution.
+    :rtype: numpy array of floats.
+    """
+    mask = count > 0
+    group, count = group[mask], count[mask]
+    totals = np.bincount(group, weights=count, minlength=n_groups)
+    q = count / totals[group]
+    return -np.bincount(group, weights=q * np.log(q), minlength=n_groups)
+
+
+def ec_recursive_c(equiv: EquivClasses, sens_att_value: str, l_div: int) -> np.ndarray:
+    """Calculate c for recursive (c,l)-diversity in each equivalence class.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :param l_div: l value for l-diversity.
+    :type l_div: int
+
+    :return: c value in each equivalence class.
+    :rtype: numpy array of floats.
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    r = counts.count[np.lexsort((counts.count, counts.ec))]
+    ends = np.cumsum(np.bincount(counts.ec, minlength=equiv.n_ec))
+    starts = ends - np.bincount(counts.ec, minlength=equiv.n_ec)
+    cum_r = np.concatenate([[0], np.cumsum(r)])
+    tail = cum_r[ends] - cum_r[starts + l_div - 1]
+    return np.floor(r[starts] / tail + 1)
+
+
+def ec_beta(equiv: EquivClasses, sens_att_value: str) -> np.ndarray:
+    """Calculate the distance used in beta-likeness for each equivalence class.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :return: maximum relative distance between the proportion of each value
+        of the SA in the equivalence class and in the entire database.
+    :rtype: numpy array of floats.
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    p = counts.p[counts.value]
+    q = counts.count / equiv.sizes[counts.ec]
+    # The values not present in a class have a distance of -1
+    dist = np.full(equiv.n_ec, -1.0)
+    np.maximum.at(dist, counts.ec, (q - p) / p)
+    return dist
+
+
+def ec_delta(equiv: EquivClasses, sens_att_value: str) -> np.ndarray:
+    """Calculate delta for delta-disclosure privacy in each equivalence class.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :return: delta in each equivalence class.
+    :rtype: numpy array of floats.
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    q = counts.count / equiv.sizes[counts.ec]
+    delta = np.zeros(equiv.n_ec)
+    np.maximum.at(delta, counts.ec, np.abs(np.log(q / counts.p[counts.value])))
+    return delta
+
+
+def ec_emd(equiv: EquivClasses, sens_att_value: str) -> np.ndarray:
+    """Calculate the EMD for t-closeness in each equivalence class.
+
+    The EMD for numerical attributes is used if the SA is numeric, and the
+    "Equal Distance" if it is categorical.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :return: EMD in each equivalence class.
+    :rtype: numpy array of floats.
+    """
+    # the values of the SA have the dtype of the column (or of its categories)
+    dtype = equiv.sa_counts(sens_att_value).values.dtype
+    if pd.api.types.is_numeric_dtype(dtype):
+        return ec_emd_num(equiv, sens_att_value)
+    elif pd.api.types.is_string_dtype(dtype):
+        return ec_emd_str(equiv, sens_att_value)
+    raise ValueError("Error, invalid sens_att value type")
+
+
+def ec_emd_num(
+    equiv: EquivClasses, sens_att_value: str, block_size: int = 2**22
+) -> np.ndarray:
+    """Calculate the EMD for t-closeness in each equivalence class (numerical SA).
+
+    The equivalence classes are processed in blocks so that at most
+    block_size dense frequencies are kept in memory.
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :param block_size: maximum number of elements of each dense block.
+    :type block_size: int
+
+    :return: EMD in each equivalence class.
+    :rtype: numpy array of floats.
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    m = len(counts.values)
+    factor = 1 / (m - 1)
+    q = counts.count / equiv.sizes[counts.ec]
+    emd = np.zeros(equiv.n_ec)
+    step = max(block_size // m, 1)
+    bounds = np.searchsorted(counts.ec, np.arange(0, equiv.n_ec + step, step))
+    for i, start in enumerate(range(0, equiv.n_ec, step)):
+        stop = min(start + step, equiv.n_ec)
+        sl = slice(bounds[i], bounds[i + 1])
+        r = np.zeros((stop - start, m))
+        r[counts.ec[sl] - start, counts.value[sl]] = q[sl]
+        r -= counts.p
+        emd[start:stop] = factor * np.sum(np.abs(np.cumsum(r, axis=1)), axis=1)
+    return emd
+
+
+def ec_emd_str(equiv: EquivClasses, sens_att_value: str) -> np.ndarray:
+    """Calculate the EMD for t-closeness in each class (categorical SA).
+
+    :param equiv: equivalence classes of the data under study.
+    :type equiv: EquivClasses
+
+    :param sens_att_value: sensitive attribute under study.
+    :type sens_att_value: string
+
+    :return: EMD in each equivalence class.
+    :rtype: numpy array of floats.
+    """
+    counts = equiv.sa_counts(sens_att_value)
+    p = counts.p[counts.value]
+    q = counts.count / equiv.sizes[counts.ec]
+    # The values not present in a class contribute with their proportion p
+    present = np.bincount(counts.ec, weights=np.abs(q - p) - p, minlength=equiv.n_ec)
+    return 0.5 * (present + counts.p.sum())
+
+
 def aux_calculate_beta(
     data: pd.DataFrame, quasi_ident: Union[list, np.ndarray], sens_att_value: str
-) -> Tuple[np.ndarray, list]:
+) -> Tuple[np.ndarray, np.ndarray]:
     """Beta calculation for basic and enhanced beta-likeness.
 
     :param data: dataframe with the data under study.
@@ -68,20 +921,10 @@ def aux_calculate_beta(
 
     :return: proportion of each value of the sensitive attribute in the entire
         database and distance from the proportion in each equivalence class.
-    :rtype: np.array and list.
-    """
-    equiv_class = get_equiv_class(data, quasi_ident)
-    values = np.unique(data[sens_att_value].values)
-    p = np.array([len(data[data[sens_att_value] == s]) / len(data) for s in values])
-    q = []
-    for ec in equiv_class:
-        data_temp = data.iloc[aux_functions.convert(ec)]
-        qi = np.array(
-            [len(data_temp[data_temp[sens_att_value] == s]) / len(ec) for s in values]
-        )
-        q.append(qi)
-    dist = [max((q[i] - p) / p) for i in range(len(equiv_class))]
-    return p, dist
+    :rtype: np.array and np.array.
+    """
+    equiv = EquivClasses(data, quasi_ident)
+    return equiv.sa_counts(sens_att_value).p, ec_beta(equiv, sens_att_value)
 
 
 def aux_calculate_delta_disclosure(
@@ -102,18 +945,7 @@ def aux_calculate_delta_disclosure(
     :return: delta for the introduced SA.
     :rtype: float.
     """
-    equiv_class = get_equiv_class(data, quasi_ident)
-    values = np.unique(data[sens_att_value].values)
-    p = np.array([len(data[data[sens_att_value] == s]) / len(data) for s in values])
-    q = []
-    for ec in equiv_class:
-        data_temp = data.iloc[aux_functions.convert(ec)]
-        qi = np.array(
-            [len(data_temp[data_temp[sens_att_value] == s]) / len(ec) for s in values]
-        )
-        q.append(qi)
-    aux = [max([np.abs(np.log(x)) for x in qi / p if x > 0]) for qi in q]
-    return max(aux)
+    return max(ec_delta(EquivClasses(data, quasi_ident), sens_att_value))
 
 
 def aux_t_closeness_num(
@@ -136,24 +968,7 @@ def aux_t_closeness_num(
     :return: t for the introduced SA (numerical).
     :rtype: float.
     """
-    equiv_class = get_equiv_class(data, quasi_ident)
-    values = np.unique(data[sens_att_value].values)
-    m = len(values)
-    p = np.array([len(data[data[sens_att_value] == s]) / len(data) for s in values])
-    emd = []
-    for ec in equiv_class:
-        data_temp = data.iloc[aux_functions.convert(ec)]
-        qi = np.array(
-            [len(data_temp[data_temp[sens_att_value] == s]) / len(ec) for s in values]
-        )
-        r = qi - p
-        abs_r, emd_ec = 0.0, 0.0
-        for i in range(m):
-            abs_r += r[i]
-            emd_ec += np.abs(abs_r)
-        emd_ec = 1 / (m - 1) * emd_ec
-        emd.append(emd_ec)
-    return max(emd)
+    return max(ec_emd_num(EquivClasses(data, quasi_ident), sens_att_value))
 
 
 def aux_t_closeness_str(
@@ -177,20 +992,4 @@ def aux_t_closeness_str(
     :return: t for the introduced SA (categorical).
     :rtype: float.
     """
-    equiv_class = get_equiv_class(data, quasi_ident)
-    values = np.unique(data[sens_att_value].values)
-    m = len(values)
-    p = np.array([len(data[data[sens_att_value] == s]) / len(data) for s in values])
-    emd = []
-    for ec in equiv_class:
-        data_temp = data.iloc[aux_functions.convert(ec)]
-        qi = np.array(
-            [len(data_temp[data_temp[sens_att_value] == s]) / len(ec) for s in values]
-        )
-        r = qi - p
-        emd_ec = 0.0
-        for i in range(m):
-            emd_ec += np.abs(r[i])
-        emd_ec = 0.5 * emd_ec
-        emd.append(emd_ec)
-    return max(emd)
+    return max(ec_emd_str(EquivClasses(data, quasi_ident), sens_att_value))
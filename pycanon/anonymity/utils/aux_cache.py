@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Cache of parsed input files, stored as Arrow (feather) sidecar files.
+
+Each entry is keyed by the path, size, modification time and a fast hash of
+the contents of the original file, together with the options used to read
+it. The least recently used entries are removed when the size of the cache
+directory exceeds the given limit. The cache requires pyarrow (the "arrow"
+extra), see AVAILABLE.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+import typing
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    AVAILABLE = False
+else:
+    AVAILABLE = True
+
+DEFAULT_CACHE_SIZE = 2**30
+CACHE_SUFFIX = ".arrow"
+
+
+def check_available() -> None:
+    """Check that pyarrow, needed to store the cached files, is installed."""
+    if not AVAILABLE:
+        raise ImportError(
+            "The cache of parsed files requires pyarrow, install it with "
+            "'pip install pycanon[arrow]'"
+        )
+
+
+def file_fingerprint(
+    file_name: typing.Union[str, pathlib.Path], sample_size: int = 2**20
+) -> str:
+    """Calculate a fast fingerprint of the contents of a file.
+
+    Only the size and the first and last sample_size bytes of the file are
+    hashed, so the time needed does not depend on the size of the file.
+
+    :param file_name: file to be fingerprinted.
+    :type file_name: string or pathlib.Path
+
+    :param sample_size: number of bytes hashed at each end of the file.
+    :type sample_size: int
+
+    :return: hexadecimal digest.
+    :rtype: string
+    """
+    size = os.path.getsize(file_name)
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_name, "rb") as f:
+        digest.update(f.read(sample_size))
+        if size > sample_size:
+            f.seek(max(size - sample_size, sample_size))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def cache_file(
+    cache_dir: typing.Union[str, pathlib.Path],
+    file_name: typing.Union[str, pathlib.Path],
+    options: dict,
+) -> pathlib.Path:
+    """Get the sidecar file of the cache for the given file and read options.
+
+    :param cache_dir: directory of the cache.
+    :type cache_dir: string or pathlib.Path
+
+    :param file_name: original file.
+    :type file_name: string or pathlib.Path
+
+    :param options: options used to read the file (e.g. columns or
+        separator). Must be serializable as JSON.
+    :type options: dict
+
+    :return: path of the sidecar file (which may not exist yet).
+    :rtype: pathlib.Path
+    """
+    file_name = pathlib.Path(file_name).resolve()
+    stat = file_name.stat()
+    key = {
+        "path": str(file_name),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": file_fingerprint(file_name),
+        "options": options,
+    }
+    digest = hashlib.blake2b(
+        json.dumps(key, sort_keys=True, default=str).encode(), digest_size=20
+    )
+    return pathlib.Path(cache_dir) / (digest.hexdigest() + CACHE_SUFFIX)
+
+
+def load(path: pathlib.Path) -> typing.Optional[pd.DataFrame]:
+    """Read a sidecar file of the cache, if it exists.
+
+    The file is memory-mapped and its modification time is updated, so that
+    it is the last one to be evicted.
+
+    :param path: sidecar file, as returned by cache_file.
+    :type path: pathlib.Path
+
+    :return: cached dataframe, or None if it is not in the cache.
+    :rtype: pandas dataframe
+    """
+    check_available()
+    if not path.exists():
+        return None
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except (OSError, ValueError):
+        return None
+    os.utime(path)
+    return table.to_pandas(split_blocks=True)
+
+
+def store(
+    path: pathlib.Path, data: pd.DataFrame, max_size: int = DEFAULT_CACHE_SIZE
+) -> bool:
+    """Write a dataframe to the cache and evict the least recently used entries.
+
+    :param path: sidecar file, as returned by cache_file.
+    :type path: pathlib.Path
+
+    :param data: dataframe to be cached.
+    :type data: pandas dataframe
+
+    :param max_size: maximum size in bytes of the cache directory.
+    :type max_size: int
+
+    :return: True if the dataframe has been cached (data with mixed types
+        in a column cannot be stored in Arrow format).
+    :rtype: boolean
+    """
+    check_available()
+    data = data.reset_index(drop=True)
+    data.attrs = {}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        feather.write_feather(data, tmp_name, compression="uncompressed")
+        os.replace(tmp_name, path)
+    except (pa.ArrowException, TypeError, ValueError):
+        os.remove(tmp_name)
+        return False
+    evict(path.parent, max_size)
+    return True
+
+
+def evict(cache_dir: typing.Union[str, pathlib.Path], max_size: int) -> None:
+    """Remove the least recently used entries until the cache fits in max_size.
+
+    :param cache_dir: directory of the cache.
+    :type cache_dir: string or pathlib.Path
+
+    :param max_size: maximum size in bytes of the cache directory.
+    :type max_size: int
+    """
+    entries = []
+    for entry in pathlib.Path(cache_dir).glob("*" + CACHE_SUFFIX):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime_ns, stat.st_size, entry))
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_size:
+            break
+        try:
+            entry.unlink()
+        except FileNotFoundError:
+            pass
+        total -= size
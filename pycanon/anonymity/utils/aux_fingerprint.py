@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Fingerprints of the columns of a dataset, computed over their buffers.
+
+The memory buffers of the selected columns (the codes for categoricals,
+whose categories are hashed separately) are hashed in blocks of rows, which
+can be processed in parallel threads as hashlib releases the GIL. Columns
+without a fixed-width buffer (e.g. strings stored as objects) are hashed
+value by value with pandas within each block. The digest of each block is kept, so the
+blocks that changed between two versions of a dataset can be found.
+"""
+
+import hashlib
+import json
+import typing
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+
+from pycanon.anonymity.utils import aux_functions
+
+DEFAULT_BLOCK_SIZE = 2**18
+DIGEST_SIZE = 20
+
+
+def fingerprint(
+    data: pd.DataFrame,
+    columns: typing.Union[typing.List, np.ndarray, None] = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    n_jobs: int = 1,
+    blocks: bool = False,
+) -> typing.Union[str, typing.Tuple[str, typing.List[str]]]:
+    """Calculate a fingerprint of the values of the given columns.
+
+    The digest depends on the values, dtypes and order of the rows and
+    columns (and on the block size), but not on the number of threads.
+
+    :param data: dataframe, or Arrow-compatible table (e.g. polars dataframe
+        or pyarrow table).
+    :type data: pandas dataframe or object implementing __arrow_c_stream__
+        or __dataframe__
+
+    :param columns: list with the name of the columns to be fingerprinted.
+        If None, all the columns are used.
+    :type columns: list of strings
+
+    :param block_size: number of rows of each block. Default to 2**18.
+    :type block_size: int
+
+    :param n_jobs: number of threads used to hash the blocks in parallel.
+    :type n_jobs: int
+
+    :param blocks: if True, the digest of each block is also returned.
+    :type blocks: boolean
+
+    :return: hexadecimal digest and, if blocks is True, list with the
+        hexadecimal digest of each block.
+    :rtype: string, or string and list of strings
+    """
+    if block_size < 1:
+        raise ValueError(f"The block size must be positive: {block_size}")
+    if aux_functions.is_arrow_like(data):
+        data = aux_functions.from_arrow(data, columns)
+    if columns is None:
+        columns = data.columns.tolist()
+    columns = list(np.asarray(columns).tolist())
+    for col in columns:
+        if col not in data.columns:
+            raise ValueError(f"Value not defined: {col}. Cannot be fingerprinted")
+
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    digest.update(str(len(data)).encode())
+    buffers = []
+    for col in columns:
+        values, description = _column_buffer(data[col])
+        digest.update(json.dumps([str(col), description]).encode())
+        buffers.append(values)
+
+    def block_digest(start: int) -> str:
+        block = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        stop = start + block_size
+        for values in buffers:
+            block.update(_block_values(values, start, stop).view(np.uint8))
+        return block.hexdigest()
+
+    with futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        block_digests = list(
+            executor.map(block_digest, range(0, len(data), block_size))
+        )
+    for block in block_digests:
+        digest.update(bytes.fromhex(block))
+    if blocks:
+        return digest.hexdigest(), block_digests
+    return digest.hexdigest()
+
+
+def changed_rows(
+    blocks: typing.List[str],
+    other_blocks: typing.List[str],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> typing.List[typing.Tuple[int, int]]:
+    """Find the rows that may differ between two fingerprinted datasets.
+
+    :param blocks: digests of the blocks of a dataset, as returned by
+        fingerprint with blocks=True.
+    :type blocks: list of strings
+
+    :param other_blocks: digests of the blocks of the other dataset.
+    :type other_blocks: list of strings
+
+    :param block_size: number of rows of each block used to fingerprint
+        both datasets.
+    :type block_size: int
+
+    :return: start (included) and end (excluded) of each range of rows in
+        blocks with different digests. Rows present in only one of the
+        datasets are included in the last range.
+    :rtype: list of tuples of ints
+    """
+    n_blocks = max(len(blocks), len(other_blocks))
+    ranges: typing.List[typing.Tuple[int, int]] = []
+    for i in range(n_blocks):
+        if i < len(blocks) and i < len(other_blocks) and blocks[i] == other_blocks[i]:
+            continue
+        start, end = i * block_size, (i + 1) * block_size
+        if ranges and ranges[-1][1] == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def _column_buffer(
+    column: pd.Series,
+) -> typing.Tuple[typing.Union[np.ndarray, pd.Series], dict]:
+    """Get a fixed-width array with the values of the column and its dtype.
+
+    Columns without a fixed-width buffer are returned as they are, and their
+    values are hashed block by block.
+    """
+    dtype = column.dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = column.cat.categories
+        values, _ = _column_buffer(pd.Series(categories))
+        values = _block_values(values, 0, len(categories))
+        cat_digest = hashlib.blake2b(values.view(np.uint8), digest_size=DIGEST_SIZE)
+        description = {
+            "dtype": "category",
+            "categories": cat_digest.hexdigest(),
+            "categories_dtype": str(categories.dtype),
+            "ordered": bool(dtype.ordered),
+        }
+        return np.ascontiguousarray(column.cat.codes.to_numpy()), description
+    if isinstance(dtype, np.dtype) and dtype.kind in "biufcmM":
+        return np.ascontiguousarray(column.to_numpy()), {"dtype": str(dtype)}
+    return column, {"dtype": str(dtype)}
+
+
+def _block_values(
+    values: typing.Union[np.ndarray, pd.Series], start: int, stop: int
+) -> np.ndarray:
+    """Get the fixed-width values of a block of rows of a column."""
+    if isinstance(values, np.ndarray):
+        return values[start:stop]
+    # objects (e.g. strings) and extension dtypes: hash of each value
+    block = values.iloc[start:stop]
+    return pd.util.hash_pandas_object(block, index=False).to_numpy()
@@ -18,42 +18,590 @@
 
 import os
 import pathlib
+import sys
 import typing
 
 import numpy as np
 import pandas as pd
 
+from pycanon.anonymity.utils import aux_cache
+
+ARROW_EXTENSIONS = [".parquet", ".feather", ".arrow", ".ipc"]
+COMPRESSION_EXTENSIONS = {
+    ".gz": "gzip",
+    ".bz2": "bz2",
+    ".xz": "xz",
+    ".zst": "zstd",
+    ".zstd": "zstd",
+}
+STDIN = "-"
+
 
 def read_file(
-    file_name: typing.Union[str, pathlib.Path], sep: str = ","
+    file_name: typing.Union[str, pathlib.Path],
+    sep: str = ",",
+    quasi_ident: typing.Optional[typing.Union[typing.List, np.ndarray]] = None,
+    sens_att: typing.Optional[typing.Union[typing.List, np.ndarray]] = None,
+    engine: typing.Optional[str] = None,
+    compact_dtypes: bool = False,
+    filters: typing.Optional[list] = None,
+    cache_dir: typing.Optional[typing.Union[str, pathlib.Path]] = None,
+    cache_size: int = aux_cache.DEFAULT_CACHE_SIZE,
 ) -> pd.DataFrame:
     """Read the given file. Returns a pandas dataframe.
 
-    :param file_name: file with the data under study.
+    Supported formats are csv, txt, xlsx, sav, and (if pyarrow is installed)
+    parquet, feather and Arrow IPC (.arrow, .ipc). Arrow IPC and feather
+    files are memory-mapped. Csv and txt files can be compressed (.gz, .bz2,
+    .xz, or .zst if zstandard is installed) and are decompressed while they
+    are parsed.
+
+    :param file_name: file with the data under study, or "-" to read a csv
+        file (possibly compressed) from the standard input.
     :type file_name: string or pathlib.Path
 
     :param sep: delimiter to use for a csv file.
     :type sep: string
 
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers. If the QI and/or SA are given, only those
+        columns are read.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param engine: parser engine for csv files ("c", "python" or "pyarrow").
+        The "pyarrow" engine parses the file using multiple threads.
+    :type engine: string
+
+    :param compact_dtypes: boolean, default to False. If True, the string
+        columns with few distinct values are stored as categoricals and
+        integer columns are downcast to the smallest integer type.
+    :type compact_dtypes: boolean
+
+    :param filters: row filters for parquet, feather and Arrow IPC files, in
+        the disjunctive normal form used by pyarrow, e.g.
+        [("age", ">", 30), ("sex", "==", "Female")]. They are applied by the
+        reader, before converting the data to a dataframe.
+    :type filters: list of tuples or list of lists of tuples
+
+    :param cache_dir: directory where the parsed data is cached as an Arrow
+        (feather) file, requires pyarrow (ImportError otherwise). If the same
+        file is read again with the same options and it has not changed, the
+        cached data is used. If None, no cache is used.
+    :type cache_dir: string or pathlib.Path
+
+    :param cache_size: maximum size in bytes of the cache directory. The
+        least recently used files are removed when it is exceeded.
+    :type cache_size: int
+
     :return: dataframe with the data.
     :rtype: pandas dataframe.
     """
     if isinstance(file_name, str):
         file_name = pathlib.Path(file_name)
 
-    _, file_extension = os.path.splitext(file_name)
-    if file_extension in [".csv", ".xlsx", ".sav", ".txt"]:
+    columns = _get_columns(quasi_ident, sens_att)
+    if cache_dir is None or str(file_name) == STDIN:
+        return _read_data(
+            file_name, sep, quasi_ident, sens_att, engine, compact_dtypes, filters
+        )
+    aux_cache.check_available()
+    options = {
+        "sep": sep,
+        "columns": columns,
+        "compact_dtypes": compact_dtypes,
+        "filters": filters,
+    }
+    cached = aux_cache.cache_file(cache_dir, file_name, options)
+    data = aux_cache.load(cached)
+    if data is None:
+        data = _read_data(
+            file_name, sep, quasi_ident, sens_att, engine, compact_dtypes, filters
+        )
+        aux_cache.store(cached, data, cache_size)
+    return data
+
+
+def _read_data(
+    file_name: pathlib.Path,
+    sep: str,
+    quasi_ident: typing.Optional[typing.Union[typing.List, np.ndarray]],
+    sens_att: typing.Optional[typing.Union[typing.List, np.ndarray]],
+    engine: typing.Optional[str],
+    compact_dtypes: bool,
+    filters: typing.Optional[list],
+) -> pd.DataFrame:
+    """Read the QI and SA of the file, checking that they are in it."""
+    columns = _get_columns(quasi_ident, sens_att)
+    try:
+        data = _read_columns(file_name, sep, columns, engine, filters)
+    except (KeyError, ValueError):
+        # the readers fail with their own errors if a column is not in the file
+        if columns is not None and str(file_name) != STDIN:
+            header = pd.DataFrame(columns=_read_header(file_name, sep))
+            _check_columns(header, quasi_ident, sens_att)
+        raise
+    if columns is not None:
+        _check_columns(data, quasi_ident, sens_att)
+    if compact_dtypes:
+        data = _compact_dtypes(data)
+    return data
+
+
+def _read_columns(
+    file_name: pathlib.Path,
+    sep: str,
+    columns: typing.Optional[list],
+    engine: typing.Optional[str],
+    filters: typing.Optional[list],
+) -> pd.DataFrame:
+    """Read the given columns of the file."""
+    file_extension, compression = _split_extension(file_name)
+    if file_extension in ARROW_EXTENSIONS:
+        data = _read_arrow(file_name, columns, filters)
+    elif filters is not None:
+        raise ValueError(
+            "Row filters are only supported for parquet, feather and Arrow files."
+        )
+    elif file_extension in [".csv", ".xlsx", ".sav", ".txt"]:
         if file_extension in [".csv", ".txt"]:
-            data = pd.read_csv(file_name)
+            source, compression = _csv_source(file_name, compression)
+            data = pd.read_csv(
+                source,
+                sep=sep,
+                usecols=columns,
+                engine=engine,
+                compression=compression,
+            )
         elif file_extension == ".xlsx":
-            data = pd.read_excel(file_name)
+            _import_openpyxl()
+            data = pd.read_excel(file_name, usecols=columns)
         else:
-            data = pd.read_spss(file_name)
+            data = pd.read_spss(file_name, usecols=columns)
     else:
         raise ValueError("Invalid file extension.")
     return data
 
 
+def _read_header(file_name: pathlib.Path, sep: str) -> list:
+    """Read the name of the columns of the file."""
+    file_extension, compression = _split_extension(file_name)
+    if file_extension == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(file_name).names
+    if file_extension in ARROW_EXTENSIONS:
+        return _read_arrow(file_name, None, None, to_pandas=False).column_names
+    if file_extension == ".xlsx":
+        return list(pd.read_excel(file_name, nrows=0).columns)
+    if file_extension == ".sav":
+        import pyreadstat
+
+        return pyreadstat.read_sav(file_name, metadataonly=True)[1].column_names
+    return list(
+        pd.read_csv(file_name, sep=sep, nrows=0, compression=compression).columns
+    )
+
+
+def _check_columns(
+    data: pd.DataFrame,
+    quasi_ident: typing.Optional[typing.Union[typing.List, np.ndarray]],
+    sens_att: typing.Optional[typing.Union[typing.List, np.ndarray]],
+) -> None:
+    """Check that the given QI and SA are columns of the data."""
+    if quasi_ident is not None:
+        check_qi(data, quasi_ident)
+    if sens_att is not None:
+        check_sa(data, sens_att)
+
+
+def _split_extension(
+    file_name: pathlib.Path,
+) -> typing.Tuple[str, typing.Optional[str]]:
+    """Get the extension of the file and its compression, if any."""
+    if str(file_name) == STDIN:
+        return ".csv", None
+    root, file_extension = os.path.splitext(file_name)
+    compression = COMPRESSION_EXTENSIONS.get(file_extension.lower())
+    if compression is None:
+        return file_extension, None
+    _, file_extension = os.path.splitext(root)
+    if file_extension not in [".csv", ".txt"]:
+        raise ValueError("Only csv and txt files can be compressed.")
+    return file_extension, compression
+
+
+def _csv_source(
+    file_name: pathlib.Path, compression: typing.Optional[str]
+) -> typing.Tuple[typing.Any, typing.Optional[str]]:
+    """Get the source of a csv file and its compression.
+
+    The compression of the standard input is detected from its first bytes.
+    """
+    if str(file_name) != STDIN:
+        return file_name, compression
+    source = sys.stdin.buffer
+    head = source.peek(6)[:6] if hasattr(source, "peek") else b""
+    for magic, stdin_compression in [
+        (b"\x1f\x8b", "gzip"),
+        (b"BZh", "bz2"),
+        (b"\xfd7zXZ\x00", "xz"),
+        (b"\x28\xb5\x2f\xfd", "zstd"),
+    ]:
+        if head.startswith(magic):
+            return source, stdin_compression
+    return source, None
+
+
+def _read_arrow(
+    file_name: pathlib.Path,
+    columns: typing.Optional[list],
+    filters: typing.Optional[list],
+    to_pandas: bool = True,
+) -> pd.DataFrame:
+    """Read a parquet, feather or Arrow IPC file using pyarrow."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    expression = None if filters is None else pq.filters_to_expression(filters)
+    if file_name.suffix == ".parquet":
+        table = pq.read_table(file_name, columns=columns, filters=expression)
+    else:
+        with pa.memory_map(str(file_name), "r") as source:
+            try:
+                table = pa.ipc.open_file(source).read_all()
+            except pa.ArrowInvalid:
+                source.seek(0)
+                table = pa.ipc.open_stream(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        if expression is not None:
+            table = table.filter(expression)
+    if not to_pandas:
+        return table
+    return table.to_pandas(split_blocks=True)
+
+
+def _get_columns(
+    quasi_ident: typing.Optional[typing.Union[typing.List, np.ndarray]],
+    sens_att: typing.Optional[typing.Union[typing.List, np.ndarray]],
+) -> typing.Optional[list]:
+    """Get the columns to be read (None to read all of them)."""
+    if quasi_ident is None and sens_att is None:
+        return None
+    columns = list(quasi_ident if quasi_ident is not None else [])
+    columns += list(sens_att if sens_att is not None else [])
+    return list(dict.fromkeys(columns))
+
+
+def _compact_dtypes(data: pd.DataFrame, max_unique_ratio: float = 0.5) -> pd.DataFrame:
+    """Convert the columns of the dataframe to more compact dtypes.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param max_unique_ratio: maximum ratio of distinct values to number of
+        records for a string column to be converted to categorical.
+    :type max_unique_ratio: float
+
+    :return: dataframe with the converted columns.
+    :rtype: pandas dataframe.
+    """
+    for col in data.columns:
+        column = data[col]
+        if pd.api.types.is_string_dtype(column) or column.dtype == object:
+            if column.nunique(dropna=False) <= max_unique_ratio * len(column):
+                data[col] = column.astype("category")
+        elif pd.api.types.is_integer_dtype(column):
+            data[col] = pd.to_numeric(column, downcast="integer")
+    return data
+
+
+def iter_file(
+    file_name: typing.Union[str, pathlib.Path],
+    chunksize: int = 100000,
+    columns: typing.Optional[typing.Union[typing.List, np.ndarray]] = None,
+    sep: str = ",",
+    compact_dtypes: bool = False,
+) -> typing.Iterator[pd.DataFrame]:
+    """Read the given file in chunks. Yields pandas dataframes.
+
+    The dtypes of the first chunk are kept in the following ones whenever
+    the values allow it, and the categorical columns share the same
+    categories (new values are appended), so that the codes of a value are
+    the same in all the chunks. The chunks can be passed to the privacy
+    models, which aggregate them incrementally.
+
+    :param file_name: file with the data under study, or "-" to read a csv
+        file (possibly compressed) from the standard input.
+    :type file_name: string or pathlib.Path
+
+    :param chunksize: number of records of each chunk.
+    :type chunksize: int
+
+    :param columns: name of the columns to be read. If None, all the columns
+        are read.
+    :type columns: list of strings
+
+    :param sep: delimiter to use for a csv file.
+    :type sep: string
+
+    :param compact_dtypes: boolean, default to False. If True, the string
+        columns with few distinct values in the first chunk are stored as
+        categoricals and integer columns are downcast.
+    :type compact_dtypes: boolean
+
+    :return: chunks of the data.
+    :rtype: iterator of pandas dataframes.
+    """
+    if isinstance(file_name, str):
+        file_name = pathlib.Path(file_name)
+    if chunksize < 1:
+        raise ValueError("chunksize must be a positive integer.")
+    if isinstance(columns, np.ndarray):
+        columns = columns.tolist()
+
+    file_extension, compression = _split_extension(file_name)
+    if file_extension in [".csv", ".txt"]:
+        source, compression = _csv_source(file_name, compression)
+        chunks = pd.read_csv(
+            source,
+            sep=sep,
+            usecols=columns,
+            chunksize=chunksize,
+            compression=compression,
+        )
+    elif file_extension == ".sav":
+        import pyreadstat
+
+        chunks = (
+            chunk
+            for chunk, _ in pyreadstat.read_file_in_chunks(
+                pyreadstat.read_sav,
+                file_name,
+                chunksize=chunksize,
+                usecols=columns,
+                apply_value_formats=True,
+            )
+        )
+    elif file_extension == ".xlsx":
+        chunks = _iter_excel(file_name, chunksize, columns)
+    elif file_extension in ARROW_EXTENSIONS:
+        chunks = _iter_arrow(file_name, chunksize, columns)
+    else:
+        raise ValueError("Invalid file extension.")
+
+    dtypes = _ChunkDtypes(compact_dtypes)
+    for chunk in chunks:
+        yield dtypes.apply(chunk)
+
+
+def _iter_excel(
+    file_name: pathlib.Path, chunksize: int, columns: typing.Optional[list]
+) -> typing.Iterator[pd.DataFrame]:
+    """Stream the rows of the first sheet of an xlsx file.
+
+    As in pd.read_excel, the empty rows are kept as records with missing
+    values, except the ones after the last record.
+    """
+    openpyxl = _import_openpyxl()
+    workbook = openpyxl.load_workbook(file_name, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        idx = [i for i, col in enumerate(header) if columns is None or col in columns]
+        names = [header[i] for i in idx]
+        batch, n_empty = [], 0
+        for row in rows:
+            if all(value is None for value in row):
+                # the empty rows are only kept if a record follows them
+                n_empty += 1
+                continue
+            records = [[None] * len(idx) for _ in range(n_empty)]
+            records.append([row[i] if i < len(row) else None for i in idx])
+            n_empty = 0
+            for record in records:
+                batch.append(record)
+                if len(batch) == chunksize:
+                    yield pd.DataFrame(batch, columns=names)
+                    batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=names)
+    finally:
+        workbook.close()
+
+
+def _import_openpyxl() -> typing.Any:
+    """Import openpyxl, needed to read xlsx files."""
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError(
+            "Reading xlsx files requires openpyxl, install it with "
+            "'pip install pycanon[excel]'"
+        ) from None
+    return openpyxl
+
+
+def _iter_arrow(
+    file_name: pathlib.Path, chunksize: int, columns: typing.Optional[list]
+) -> typing.Iterator[pd.DataFrame]:
+    """Read a parquet, feather or Arrow IPC file by record batches."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if file_name.suffix == ".parquet":
+        batches = pq.ParquetFile(file_name).iter_batches(
+            batch_size=chunksize, columns=columns
+        )
+        for batch in batches:
+            yield batch.to_pandas()
+        return
+    table = _read_arrow(file_name, columns, None, to_pandas=False)
+    for batch in table.to_batches(max_chunksize=chunksize):
+        yield pa.Table.from_batches([batch]).to_pandas()
+
+
+class _ChunkDtypes:
+    """Keep the dtypes and the categories of consecutive chunks consistent."""
+
+    def __init__(self, compact_dtypes: bool = False):
+        """Initialize with no dtypes, which are taken from the first chunk."""
+        self.compact_dtypes = compact_dtypes
+        self.dtypes: typing.Optional[dict] = None
+        self.categories: typing.Dict[str, list] = {}
+        self.known: typing.Dict[str, set] = {}
+
+    def apply(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        if self.dtypes is None:
+            if self.compact_dtypes:
+                chunk = _compact_dtypes(chunk)
+            self.dtypes = chunk.dtypes.to_dict()
+            for col, dtype in self.dtypes.items():
+                if isinstance(dtype, pd.CategoricalDtype):
+                    self.categories[col] = list(dtype.categories)
+                    self.known[col] = set(dtype.categories)
+        for col, dtype in self.dtypes.items():
+            if col not in chunk.columns:
+                continue
+            if col in self.categories:
+                chunk[col] = self._categorical(col, chunk[col])
+            elif chunk[col].dtype != dtype:
+                chunk[col] = _cast(chunk[col], dtype)
+        return chunk
+
+    def _categorical(self, col: str, column: pd.Series) -> pd.Series:
+        categories, known = self.categories[col], self.known[col]
+        for value in column.dropna().unique():
+            if value not in known:
+                known.add(value)
+                categories.append(value)
+        return pd.Series(
+            pd.Categorical(column, categories=categories), index=column.index
+        )
+
+
+def _cast(column: pd.Series, dtype) -> pd.Series:
+    """Cast the column to the given dtype if no value changes."""
+    try:
+        converted = column.astype(dtype)
+    except (TypeError, ValueError):
+        return column
+    same = (converted == column) | (converted.isna() & column.isna())
+    return converted if same.all() else column
+
+
+def is_arrow_like(data: typing.Any) -> bool:
+    """Check if the data implements the Arrow or dataframe interchange protocols.
+
+    :param data: object to be checked (e.g. a polars dataframe or a pyarrow
+        table).
+    :type data: any
+
+    :return: True if the object has __arrow_c_stream__ or __dataframe__
+        (and it is not a pandas dataframe).
+    :rtype: boolean
+    """
+    return not isinstance(data, pd.DataFrame) and (
+        hasattr(data, "__arrow_c_stream__") or hasattr(data, "__dataframe__")
+    )
+
+
+def from_arrow(
+    data: typing.Any,
+    columns: typing.Optional[typing.Union[typing.List, np.ndarray]] = None,
+) -> pd.DataFrame:
+    """Get a pandas dataframe from an Arrow-compatible table, without copies.
+
+    The table is read through the Arrow PyCapsule interface
+    (__arrow_c_stream__) or the dataframe interchange protocol
+    (__dataframe__), so polars dataframes and pyarrow tables can be used.
+    String columns are converted to categoricals whose codes are the indices
+    of an Arrow dictionary array (the existing dictionary if the column is
+    already dictionary-encoded), and numeric columns share the Arrow buffers
+    when they have no nulls. Requires pyarrow.
+
+    :param data: table with the data under study.
+    :type data: object implementing __arrow_c_stream__ or __dataframe__
+
+    :param columns: name of the columns to be converted. If None, all the
+        columns are converted.
+    :type columns: list of strings
+
+    :return: dataframe with the data.
+    :rtype: pandas dataframe.
+    """
+    import pyarrow as pa
+
+    if isinstance(data, pa.Table):
+        table = data
+    elif hasattr(data, "__arrow_c_stream__"):
+        table = pa.table(data)
+    else:
+        from pyarrow.interchange import from_dataframe
+
+        table = from_dataframe(data)
+    if columns is not None:
+        if isinstance(columns, np.ndarray):
+            columns = columns.tolist()
+        missing = [col for col in columns if col not in table.column_names]
+        if len(missing) > 0:
+            raise ValueError(f"Values not defined: {missing}.")
+        table = table.select(list(dict.fromkeys(columns)))
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table[i].dictionary_encode())
+    table = table.unify_dictionaries()
+    return pd.DataFrame(
+        {name: _from_arrow_column(table[name]) for name in table.column_names}
+    )
+
+
+def _from_arrow_column(column: typing.Any) -> typing.Union[pd.Series, pd.Categorical]:
+    """Convert a pyarrow chunked array to a pandas series or categorical."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    if not pa.types.is_dictionary(column.type):
+        return column.to_pandas()
+    if column.num_chunks == 0:
+        return pd.Categorical.from_codes([], categories=[])
+    codes = []
+    for chunk in column.chunks:
+        indices = chunk.indices
+        if indices.null_count > 0:
+            indices = pc.fill_null(indices, -1)
+        codes.append(indices.to_numpy(zero_copy_only=False))
+    categories = column.chunk(0).dictionary.to_pandas()
+    codes = codes[0] if len(codes) == 1 else np.concatenate(codes)
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
 def check_qi(
     data: pd.DataFrame, quasi_ident: typing.Union[typing.List, np.ndarray]
 ) -> None:
@@ -98,6 +646,30 @@ def check_sa(
         )
 
 
+def check_weights(data: pd.DataFrame, weights: str) -> np.ndarray:
+    """Check if the entered column of weights is valid.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param weights: name of the column with the number of records
+        represented by each row.
+    :type weights: string
+
+    :return: weight of each row.
+    :rtype: numpy array of ints.
+    """
+    if weights not in data.columns:
+        raise ValueError(f"Value not defined: {weights}. Cannot be the weights")
+    values = data[weights]
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        raise ValueError(f"The weights column '{weights}' must be numeric")
+    values = values.to_numpy(dtype=np.float64)
+    if np.any(~np.isfinite(values) | (values <= 0) | (values != np.round(values))):
+        raise ValueError(f"The weights in '{weights}' must be positive integers")
+    return values.astype(np.int64)
+
+
 def convert(ec_set: set) -> list:
     """Convert a set with an equivalence class to a list.
 
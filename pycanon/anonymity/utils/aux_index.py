@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Index of the equivalence classes of a dataset, saved as npy files.
+
+The grouping of the records by the quasi-identifiers is done once and saved
+in a directory: the equivalence class of each row, the permutation of the
+rows that sorts them by class and the offset of each class in it, the size
+of each class, the encoded values of the QI of each class and the frequency
+of the values of each SA in each class. The arrays are memory-mapped when
+the index is loaded, so the privacy models can be evaluated over it without
+reading the data or grouping the records again.
+"""
+
+import json
+import pathlib
+import typing
+
+import numpy as np
+import pandas as pd
+
+from pycanon.anonymity.utils import aux_anonymity
+from pycanon.anonymity.utils import aux_fingerprint
+
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+SA_FIELDS = ["values", "p", "ec", "value", "count"]
+
+
+class EquivIndex(aux_anonymity.EquivClasses):
+    """Equivalence classes loaded from an index saved with build_index.
+
+    It can be given as the data to the privacy models, the report and
+    worst_equiv_classes. The rows of the data of the classes are the
+    equivalence classes, with the values of their QI.
+
+    :param path: directory of the index.
+    :type path: string or pathlib.Path
+
+    :param mmap: whether to memory-map the arrays (default) or read them.
+    :type mmap: boolean
+    """
+
+    def __init__(self, path: typing.Union[str, pathlib.Path], mmap: bool = True):
+        """Read the description of the index and map its arrays."""
+        self.path = pathlib.Path(path)
+        if not (self.path / INDEX_FILE).is_file():
+            raise ValueError(f"There is no index in {self.path}")
+        self.manifest = json.loads((self.path / INDEX_FILE).read_text())
+        if self.manifest["version"] != INDEX_VERSION:
+            raise ValueError(
+                f"Unsupported index version {self.manifest['version']}, "
+                "build the index again"
+            )
+        self._mmap_mode = "r" if mmap else None
+        # the values of the QI of the classes are read when first needed
+        super().__init__(
+            None,
+            self.manifest["quasi_ident"],
+            codes=self._load("codes"),
+            sizes=self._load("sizes"),
+        )
+        self.sens_att = self.manifest["sens_att"]
+        self._permutation = self._load("permutation")
+        self._offsets = self._load("offsets")
+        self._first = np.arange(len(self.sizes))
+
+    def _load(self, name: str) -> np.ndarray:
+        values = np.load(self.path / f"{name}.npy", mmap_mode=self._mmap_mode)
+        missing = self.path / f"{name}_missing.npy"
+        if missing.is_file():
+            values = values.astype(object)
+            values[np.load(missing)] = np.nan
+        return values
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """Get the values of the QI of each equivalence class."""
+        if self._data is None:
+            self._data = pd.DataFrame(
+                {
+                    col: self._load(f"qi{i}_values")[self._load(f"qi{i}_codes")]
+                    for i, col in enumerate(self.quasi_ident)
+                }
+            )
+        return self._data
+
+    @data.setter
+    def data(self, data: typing.Union[pd.DataFrame, None]) -> None:
+        self._data = data
+
+    @property
+    def n_records(self) -> typing.Union[int, float]:
+        """Get the number of records of the dataset."""
+        return self.manifest["n_records"]
+
+    def sa_counts(self, sens_att_value: typing.Union[str, list]):
+        """Get the frequency of each value of the SA in each equivalence class.
+
+        :param sens_att_value: sensitive attribute under study, which must be
+            one of the SA of the index.
+        :type sens_att_value: string
+
+        :return: values of the SA, proportion of each value in the entire
+            database and frequency of each value in each equivalence class.
+        :rtype: aux_anonymity.SACounts.
+        """
+        key = aux_anonymity._columns_key(sens_att_value)
+        if key not in self._sa_counts:
+            if len(key) != 1 or key[0] not in self.sens_att:
+                raise ValueError(f"The SA {list(key)} are not in the index")
+            i = self.sens_att.index(key[0])
+            self._sa_counts[key] = aux_anonymity.SACounts(
+                *[self._load(f"sa{i}_{field}") for field in SA_FIELDS]
+            )
+        return self._sa_counts[key]
+
+    def extend(self, columns: typing.Union[list, np.ndarray]):
+        """Get the equivalence classes adding the given SA to the QI.
+
+        Used when the set of QI is updated for each SA (gen=False), if the
+        index was built with extended=True.
+
+        :param columns: SA to be added to the quasi-identifiers.
+        :type columns: list of strings
+
+        :return: equivalence classes for the extended set of QI.
+        :rtype: EquivIndex.
+        """
+        key = aux_anonymity._columns_key(list(columns))
+        if not key:
+            return self
+        if key not in self._extended:
+            for extended in self.manifest["extended"]:
+                if sorted(extended["columns"]) == sorted(key):
+                    self._extended[key] = EquivIndex(
+                        self.path / extended["path"], self._mmap_mode is not None
+                    )
+                    break
+            else:
+                raise ValueError(
+                    f"The index has no classes extended with {list(key)}, "
+                    "build it with extended=True to use gen=False"
+                )
+        return self._extended[key]
+
+    def check_columns(
+        self,
+        quasi_ident: typing.Union[list, np.ndarray],
+        sens_att: typing.Union[list, np.ndarray, None] = None,
+        weights: typing.Union[str, None] = None,
+    ) -> None:
+        """Check that the index can be used for the given QI, SA and weights.
+
+        :param quasi_ident: list with the name of the quasi-identifiers.
+        :type quasi_ident: list of strings
+
+        :param sens_att: list with the name of the sensitive attributes.
+        :type sens_att: list of strings
+
+        :param weights: name of the column with the number of records
+            represented by each row.
+        :type weights: string
+        """
+        if sorted(map(str, quasi_ident)) != sorted(map(str, self.quasi_ident)):
+            raise ValueError(
+                f"The index is built for the QI {self.quasi_ident}, "
+                f"not for {list(quasi_ident)}"
+            )
+        sens_att = [] if sens_att is None else list(sens_att)
+        missing = [sa for sa in sens_att if sa not in self.sens_att]
+        if missing:
+            raise ValueError(f"The SA {missing} are not in the index")
+        if weights is not None and weights != self.manifest["weights"]:
+            raise ValueError(
+                f"The index is built with the weights {self.manifest['weights']}"
+            )
+
+    def matches(self, data: pd.DataFrame) -> bool:
+        """Check if the index was built from the given data.
+
+        The fingerprint of the columns of the index in the data is compared
+        with the one of the data used to build it.
+
+        :param data: dataframe with the data under study.
+        :type data: pandas dataframe
+
+        :return: whether the data has the same values as when the index was
+            built (False if the index was not built from a dataframe).
+        :rtype: boolean
+        """
+        if self.manifest["fingerprint"] is None:
+            return False
+        try:
+            digest = aux_fingerprint.fingerprint(data, self.manifest["columns"])
+        except ValueError:
+            return False
+        return digest == self.manifest["fingerprint"]
+
+
+def build_index(
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    path: typing.Union[str, pathlib.Path],
+    sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+    weights: typing.Optional[str] = None,
+    extended: bool = False,
+) -> EquivIndex:
+    """Group the data by the QI and save the equivalence classes as an index.
+
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database. For chunks and SQL
+        tables the rows of the index are the distinct combinations of values
+        of the QI and SA.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param path: directory where the index is saved.
+    :type path: string or pathlib.Path
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param extended: whether to also save the classes with the QI extended
+        with the rest of SA for each SA, needed to evaluate the models with
+        gen=False and several SA.
+    :type extended: boolean
+
+    :return: the index, loaded from the saved files.
+    :rtype: EquivIndex
+    """
+    quasi_ident = list(np.asarray(quasi_ident).tolist())
+    sens_att = [] if sens_att is None else list(np.asarray(sens_att).tolist())
+    columns = quasi_ident + sens_att + ([] if weights is None else [weights])
+    equiv = aux_anonymity.get_equiv_classes(data, quasi_ident, sens_att, weights)
+    digest = None
+    if isinstance(data, pd.DataFrame):
+        digest = aux_fingerprint.fingerprint(data, columns)
+    manifest = {"columns": columns, "weights": weights, "fingerprint": digest}
+
+    path = pathlib.Path(path)
+    extended_classes = []
+    if extended and len(sens_att) > 1:
+        for i, sa in enumerate(sens_att):
+            others = [other for other in sens_att if other != sa]
+            name = f"extended{i}"
+            _save_equiv(
+                equiv.extend(others), path / name, [sa], {**manifest, "extended": []}
+            )
+            extended_classes.append({"columns": others, "path": name})
+    _save_equiv(equiv, path, sens_att, {**manifest, "extended": extended_classes})
+    return EquivIndex(path)
+
+
+def load_index(path: typing.Union[str, pathlib.Path], mmap: bool = True) -> EquivIndex:
+    """Load an index of equivalence classes saved with build_index.
+
+    :param path: directory of the index.
+    :type path: string or pathlib.Path
+
+    :param mmap: whether to memory-map the arrays (default) or read them.
+    :type mmap: boolean
+
+    :return: the index, which can be given as the data to the privacy models.
+    :rtype: EquivIndex
+    """
+    return EquivIndex(path, mmap)
+
+
+def _save_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    path: pathlib.Path,
+    sens_att: list,
+    manifest: dict,
+) -> None:
+    """Save the arrays of the equivalence classes and the description."""
+    path.mkdir(parents=True, exist_ok=True)
+    n_rows = len(equiv.codes)
+    arrays = {
+        "codes": equiv.codes.astype(_index_dtype(equiv.n_ec)),
+        "permutation": equiv.permutation.astype(_index_dtype(n_rows)),
+        "offsets": equiv.offsets.astype(_index_dtype(n_rows)),
+        "sizes": equiv.sizes,
+    }
+    qi_values = equiv.data[equiv.quasi_ident].iloc[equiv.first]
+    for i, col in enumerate(equiv.quasi_ident):
+        qi_codes, values = pd.factorize(
+            qi_values[col], sort=True, use_na_sentinel=False
+        )
+        arrays[f"qi{i}_codes"] = qi_codes.astype(_index_dtype(len(values)))
+        arrays[f"qi{i}_values"] = np.asarray(values)
+    for i, sa in enumerate(sens_att):
+        for field, values in zip(SA_FIELDS, equiv.sa_counts(sa)):
+            arrays[f"sa{i}_{field}"] = values
+    for name, values in arrays.items():
+        values, missing = _fixed_width(values)
+        np.save(path / f"{name}.npy", values, allow_pickle=False)
+        if missing is not None:
+            np.save(path / f"{name}_missing.npy", missing, allow_pickle=False)
+    description = {
+        "version": INDEX_VERSION,
+        "quasi_ident": equiv.quasi_ident,
+        "sens_att": sens_att,
+        "n_rows": n_rows,
+        "n_records": equiv.n_records,
+    }
+    (path / INDEX_FILE).write_text(json.dumps({**manifest, **description}))
+
+
+def _index_dtype(n: int) -> type:
+    return np.int32 if n < 2**31 else np.int64
+
+
+def _fixed_width(
+    values: np.ndarray,
+) -> typing.Tuple[np.ndarray, typing.Optional[np.ndarray]]:
+    """Convert arrays of objects (e.g. strings) to fixed-width strings.
+
+    The missing values would be converted to the strings "nan" or "None", so
+    they are replaced by empty strings and their mask is also returned (None
+    if there are no missing values).
+    """
+    values = np.asarray(values)
+    if values.dtype != object:
+        return values, None
+    missing = pd.isna(values)
+    if not missing.any():
+        return values.astype(str), None
+    values = values.copy()
+    values[missing] = ""
+    return values.astype(str), missing
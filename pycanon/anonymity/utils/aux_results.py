@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Persistent cache of the results of the privacy models.
+
+Once enabled, the results of the privacy models and of get_report_values
+are stored in a SQLite database, keyed by a fingerprint of the columns of
+the data that are used (QI, SA and weights) and the rest of the parameters,
+as well as the version of pycanon and of the format of the stored results,
+so that the results of a previous version are not reused. The least
+recently used results are removed when the size of the stored results
+exceeds the given limit.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import pathlib
+import sqlite3
+import time
+import typing
+
+import numpy as np
+import pandas as pd
+
+import pycanon
+from pycanon.anonymity.utils import aux_fingerprint
+
+DEFAULT_RESULT_CACHE_SIZE = 2**26
+RESULTS_FILE = "results.sqlite"
+COLUMN_PARAMS = ["quasi_ident", "sens_att", "weights"]
+# Version of the format of the keys and stored results
+RESULTS_SCHEMA = 1
+
+_state: typing.Dict[str, typing.Any] = {
+    "cache": None,
+    "hits": 0,
+    "misses": 0,
+    "last": None,
+}
+
+
+class ResultCache:
+    """Store of results in a SQLite database, with a size limit.
+
+    :param path: SQLite database file.
+    :type path: string or pathlib.Path
+
+    :param max_size: maximum size in bytes of the stored results.
+    :type max_size: int
+    """
+
+    def __init__(
+        self,
+        path: typing.Union[str, pathlib.Path],
+        max_size: int = DEFAULT_RESULT_CACHE_SIZE,
+    ):
+        """Create the database and its table, if they do not exist."""
+        self.path = pathlib.Path(path)
+        self.max_size = max_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, key: str) -> typing.Tuple[bool, typing.Any]:
+        """Get a result from the cache, updating its last access time.
+
+        :param key: key of the result.
+        :type key: string
+
+        :return: whether the result is in the cache, and the result.
+        :rtype: boolean and any
+        """
+        with self._connect() as con:
+            row = con.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return False, None
+            con.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        return True, json.loads(row[0], object_hook=_decode)
+
+    def put(self, key: str, value: typing.Any) -> None:
+        """Store a result and evict the least recently used ones.
+
+        :param key: key of the result.
+        :type key: string
+
+        :param value: result, made of numbers, strings, lists and tuples.
+        :type value: any
+        """
+        encoded = json.dumps(_encode(value))
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (key, encoded, len(encoded), time.time()),
+            )
+            self._evict(con)
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        total = 0
+        evicted = []
+        for key, size in con.execute(
+            "SELECT key, size FROM results ORDER BY accessed DESC"
+        ):
+            total += size
+            if total > self.max_size:
+                evicted.append((key,))
+        con.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """Remove all the results."""
+        with self._connect() as con:
+            con.execute("DELETE FROM results")
+
+
+def enable(
+    cache_dir: typing.Union[str, pathlib.Path],
+    max_size: int = DEFAULT_RESULT_CACHE_SIZE,
+) -> ResultCache:
+    """Enable the cache of results of the privacy models.
+
+    :param cache_dir: directory of the cache.
+    :type cache_dir: string or pathlib.Path
+
+    :param max_size: maximum size in bytes of the stored results.
+    :type max_size: int
+
+    :return: the cache.
+    :rtype: ResultCache
+    """
+    _state["cache"] = ResultCache(pathlib.Path(cache_dir) / RESULTS_FILE, max_size)
+    return _state["cache"]
+
+
+def disable() -> None:
+    """Disable the cache of results of the privacy models."""
+    _state["cache"] = None
+
+
+def info() -> dict:
+    """Get the number of hits and misses of the cache of results.
+
+    :return: number of hits and misses, and whether the last lookup was a
+        "hit" or a "miss" (None if the cache has not been used).
+    :rtype: dict
+    """
+    return {key: _state[key] for key in ("hits", "misses", "last")}
+
+
+def cached(func: typing.Callable) -> typing.Callable:
+    """Decorate a function so that its results are cached, when enabled.
+
+    Only the calls whose data are pandas dataframes are cached. The
+    dataframes are represented in the key by the fingerprint of the columns
+    named by the quasi_ident, sens_att and weights parameters.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cache = _state["cache"]
+        if cache is None:
+            return func(*args, **kwargs)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        frames = {}
+        params = {}
+        for name, value in bound.arguments.items():
+            if isinstance(value, pd.DataFrame):
+                frames[name] = value
+            elif isinstance(value, (str, int, float, bool, list, tuple, np.ndarray)):
+                params[name] = _jsonable(value)
+            elif value is not None:
+                # e.g. iterables of chunks or SQL tables, not cached
+                return func(*args, **kwargs)
+        columns = []
+        for name in COLUMN_PARAMS:
+            value = params.get(name)
+            columns += [value] if isinstance(value, str) else list(value or [])
+        try:
+            params["data"] = {
+                name: aux_fingerprint.fingerprint(frame, list(dict.fromkeys(columns)))
+                for name, frame in frames.items()
+            }
+        except ValueError:
+            # missing columns, the function raises the error
+            return func(*args, **kwargs)
+        key = hashlib.blake2b(
+            json.dumps(
+                [
+                    RESULTS_SCHEMA,
+                    pycanon.__version__,
+                    func.__module__,
+                    func.__qualname__,
+                    params,
+                ],
+                sort_keys=True,
+            ).encode(),
+            digest_size=20,
+        ).hexdigest()
+        hit, value = cache.get(key)
+        _state["last"] = "hit" if hit else "miss"
+        _state["hits" if hit else "misses"] += 1
+        if not hit:
+            value = func(*args, **kwargs)
+            cache.put(key, value)
+        return value
+
+    return wrapper
+
+
+def _jsonable(value: typing.Any) -> typing.Any:
+    if isinstance(value, (np.ndarray, list, tuple)):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _encode(value: typing.Any) -> typing.Any:
+    """Convert a result to JSON, keeping the tuples."""
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, (list, np.ndarray)):
+        return [_encode(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode(value: dict) -> typing.Any:
+    if "__tuple__" in value:
+        return tuple(value["__tuple__"])
+    return value
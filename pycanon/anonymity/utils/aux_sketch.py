@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Probabilistic sketches of the equivalence classes, with bounded memory.
+
+The size of each equivalence class is estimated with a count-min sketch and
+the number of distinct values of each SA in it with HyperLogLog registers
+stored in the cells of the same grid. The classes are enumerated from a
+bottom-m sample of the hashes of their QI values, which keeps all the
+classes when there are fewer than m of them, and the classes with the
+smallest estimated sizes are also tracked explicitly. The sketches of
+different chunks or workers can be merged.
+
+The estimates of k and l are not a guarantee: the sizes are overestimated
+and, if there are more classes than those kept, the smallest class can still
+be missed (e.g. if it is displaced by other classes before they grow), so k
+(and l, which is estimated over the same classes) can exceed the true value.
+"""
+
+import math
+import typing
+
+import numpy as np
+import pandas as pd
+
+from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_sql
+
+ENGINES = ["exact", "sketch"]
+
+
+class EquivSketch:
+    """Sketch of the equivalence classes of a dataset.
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are the quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param epsilon: relative error of the size of the classes: the estimates
+        exceed the true sizes by at most epsilon times the number of records
+        with probability 1 - delta. Default to 1e-3.
+    :type epsilon: float
+
+    :param delta: probability of exceeding the error bound. Default to 0.01.
+    :type delta: float
+
+    :param n_classes: maximum number of classes kept to be evaluated.
+        Default to 2**16.
+    :type n_classes: int
+
+    :param n_small: maximum number of classes with the smallest estimated
+        sizes tracked in addition to the sample of classes. Default to 2**12.
+    :type n_small: int
+
+    :param precision: the HyperLogLog of each cell has 2**precision
+        registers, with a relative standard error of 1.04 / 2**(precision/2).
+        Default to 6.
+    :type precision: int
+
+    :param seed: seed of the hash functions. Only sketches with the same
+        seed and parameters can be merged.
+    :type seed: int
+    """
+
+    def __init__(
+        self,
+        quasi_ident: typing.Union[typing.List, np.ndarray],
+        sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+        epsilon: float = 1e-3,
+        delta: float = 0.01,
+        n_classes: int = 2**16,
+        precision: int = 6,
+        seed: int = 0,
+        n_small: int = 2**12,
+    ):
+        """Allocate the counters and registers of the sketch."""
+        if not 0 < epsilon < 1 or not 0 < delta < 1:
+            raise ValueError("epsilon and delta must be in (0, 1).")
+        if not 4 <= precision <= 16:
+            raise ValueError(f"The precision must be in [4, 16]: {precision}")
+        self.quasi_ident = list(np.asarray(quasi_ident).tolist())
+        self.sens_att = [] if sens_att is None else list(np.asarray(sens_att).tolist())
+        self.epsilon = epsilon
+        self.delta = delta
+        self.n_classes = n_classes
+        self.n_small = n_small
+        self.precision = precision
+        self.seed = seed
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        rng = np.random.default_rng(seed)
+        self._mult = rng.integers(1, 2**63, self.depth, dtype=np.uint64) * 2 + 1
+        self._add = rng.integers(0, 2**63, self.depth, dtype=np.uint64)
+        self.counts = np.zeros((self.depth, self.width), dtype=np.int64)
+        self.registers = {
+            sa: np.zeros((self.depth, self.width, 2**precision), dtype=np.uint8)
+            for sa in self.sens_att
+        }
+        self.keys = np.empty(0, dtype=np.uint64)
+        self.small = np.empty(0, dtype=np.uint64)
+        self.n_records = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Get the memory used by the sketch, in bytes."""
+        registers = sum(reg.nbytes for reg in self.registers.values())
+        n_keys = self.n_classes + self.n_small
+        return self.counts.nbytes + registers + n_keys * self.keys.itemsize
+
+    @property
+    def complete(self) -> bool:
+        """Check if all the equivalence classes are kept to be evaluated."""
+        return len(self.keys) < self.n_classes
+
+    @property
+    def n_ec(self) -> float:
+        """Get the (estimated) number of equivalence classes."""
+        if self.complete:
+            return len(self.keys)
+        # k-minimum values estimator
+        return (self.n_classes - 1) / (float(self.keys[-1]) / 2**64)
+
+    def update(
+        self, data: pd.DataFrame, weights: typing.Optional[np.ndarray] = None
+    ) -> None:
+        """Add the records of a dataframe to the sketch.
+
+        :param data: dataframe (or chunk) with the data under study.
+        :type data: pandas dataframe
+
+        :param weights: number of records represented by each row. If None,
+            each row is a record.
+        :type weights: numpy array of ints
+        """
+        if len(data) == 0:
+            return
+        keys = _hash(data, self.quasi_ident)
+        buckets = self._buckets(keys)
+        for i in range(self.depth):
+            self.counts[i] += np.bincount(
+                buckets[i], weights=weights, minlength=self.width
+            ).astype(np.int64)
+        for sa, registers in self.registers.items():
+            index, rank = _hll_update(_hash(data, [sa]), self.precision)
+            for i in range(self.depth):
+                np.maximum.at(registers[i], (buckets[i], index), rank)
+        keys = np.unique(keys)
+        self.keys = np.union1d(self.keys, keys)[: self.n_classes]
+        self.small = self._smallest(np.union1d(self.small, keys))
+        self.n_records += len(data) if weights is None else int(weights.sum())
+
+    def merge(self, other: "EquivSketch") -> "EquivSketch":
+        """Merge another sketch (e.g. of other chunk of the data) into this one.
+
+        :param other: sketch with the same QI, SA, seed and parameters.
+        :type other: EquivSketch
+
+        :return: this sketch, updated.
+        :rtype: EquivSketch
+        """
+        if self._params() != other._params():
+            raise ValueError("Only sketches with the same parameters can be merged.")
+        self.counts += other.counts
+        for sa, registers in self.registers.items():
+            np.maximum(registers, other.registers[sa], out=registers)
+        self.keys = np.union1d(self.keys, other.keys)[: self.n_classes]
+        self.small = self._smallest(np.union1d(self.small, other.small))
+        self.n_records += other.n_records
+        return self
+
+    @property
+    def evaluated(self) -> np.ndarray:
+        """Get the hashes of the classes evaluated: the sample and the smallest."""
+        return np.union1d(self.keys, self.small)
+
+    def sizes(self) -> np.ndarray:
+        """Estimate the size of each equivalence class kept in the sketch.
+
+        :return: upper estimate of the number of records of each class.
+        :rtype: numpy array of ints.
+        """
+        return self._estimate(self.evaluated)
+
+    def n_values(self, sens_att_value: str) -> np.ndarray:
+        """Estimate the number of distinct values of the SA in each class.
+
+        :param sens_att_value: sensitive attribute under study.
+        :type sens_att_value: string
+
+        :return: estimate of the number of distinct values of the SA in each
+            equivalence class kept in the sketch.
+        :rtype: numpy array of floats.
+        """
+        if sens_att_value not in self.registers:
+            raise ValueError(f"{sens_att_value} is not a SA of the sketch.")
+        registers = self.registers[sens_att_value]
+        buckets = self._buckets(self.evaluated)
+        cells = registers[np.arange(self.depth)[:, None], buckets]
+        return np.min(_hll_estimate(cells), axis=0)
+
+    def k_anonymity(self) -> typing.Tuple[int, float]:
+        """Estimate k for k-anonymity.
+
+        The estimate is an upper bound of k, not a guarantee: the sizes are
+        overestimated and, if the sketch is not complete, the smallest class
+        may not be among the classes evaluated.
+
+        :return: estimate of k and its error bound: the estimate exceeds the
+            size of the smallest class evaluated by at most the bound with
+            probability 1 - delta.
+        :rtype: int and float.
+        """
+        return int(self.sizes().min()), self.epsilon * self.n_records
+
+    def l_diversity(self) -> typing.Tuple[int, float]:
+        """Estimate l for l-diversity.
+
+        As for k, the classes with the fewest values of the SA may not be
+        among the classes evaluated, so the estimate can exceed the true l.
+
+        :return: estimate of l and relative standard error of the number of
+            distinct values of the SA in each class.
+        :rtype: int and float.
+        """
+        if not self.sens_att:
+            raise ValueError("The sketch has no sensitive attributes.")
+        l_div = min(np.rint(self.n_values(sa)).min() for sa in self.sens_att)
+        return int(l_div), 1.04 / math.sqrt(2**self.precision)
+
+    def _params(self) -> tuple:
+        return (
+            self.quasi_ident,
+            self.sens_att,
+            self.counts.shape,
+            self.precision,
+            self.n_classes,
+            self.n_small,
+            self.seed,
+        )
+
+    def _estimate(self, keys: np.ndarray) -> np.ndarray:
+        """Count-min estimate of the size of the classes with the given hashes."""
+        buckets = self._buckets(keys)
+        return np.min(self.counts[np.arange(self.depth)[:, None], buckets], axis=0)
+
+    def _smallest(self, keys: np.ndarray) -> np.ndarray:
+        """Keep the hashes of the classes with the smallest estimated sizes."""
+        if len(keys) <= self.n_small:
+            return keys
+        smallest = np.argpartition(self._estimate(keys), self.n_small - 1)
+        return np.sort(keys[smallest[: self.n_small]])
+
+    def _buckets(self, keys: np.ndarray) -> np.ndarray:
+        """Multiply-shift hash of the keys into the columns of each row."""
+        hashed = keys[None, :] * self._mult[:, None] + self._add[:, None]
+        return ((hashed >> np.uint64(32)) % np.uint64(self.width)).astype(np.intp)
+
+
+def _hash(data: pd.DataFrame, columns: list) -> np.ndarray:
+    """Hash the values of the given columns of each record."""
+    return pd.util.hash_pandas_object(data[columns], index=False).to_numpy(
+        dtype=np.uint64
+    )
+
+
+def _hll_update(
+    hashes: np.ndarray, precision: int
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Get the register and the rank of each hash for HyperLogLog."""
+    bits = 64 - precision
+    index = (hashes >> np.uint64(bits)).astype(np.intp)
+    rest = hashes & np.uint64(2**bits - 1)
+    rank = bits + 1 - _bit_length(rest)
+    return index, rank.astype(np.uint8)
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    length = np.zeros(len(values), dtype=np.int64)
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= np.uint64(2**shift)
+        length[mask] += shift
+        values[mask] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def _hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """Estimate the cardinality from the registers (last axis) of HyperLogLogs."""
+    m = registers.shape[-1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    raw = alpha * m**2 / np.sum(np.exp2(-registers.astype(np.float64)), axis=-1)
+    zeros = np.sum(registers == 0, axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    # linear counting for small cardinalities
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def use_sketch(data: typing.Any, engine: str) -> bool:
+    """Check the engine and if the models are estimated with a sketch.
+
+    :param data: data under study.
+    :type data: any
+
+    :param engine: "exact" or "sketch".
+    :type engine: string
+
+    :return: True if the data is a sketch or the engine is "sketch".
+    :rtype: boolean
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine: {engine}. Use one of {ENGINES}")
+    return engine == "sketch" or isinstance(data, EquivSketch)
+
+
+def get_equiv_sketch(
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame], EquivSketch],
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+    weights: typing.Optional[str] = None,
+    **kwargs,
+) -> EquivSketch:
+    """Check the QI and SA and build the sketch of the equivalence classes.
+
+    :param data: dataframe with the data under study, Arrow-compatible table,
+        iterable of dataframes with chunks of the data, or an already built
+        (e.g. merged) sketch.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or EquivSketch
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are the quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param weights: name of the column with the number of records
+        represented by each row. If None, each row is a record.
+    :type weights: string
+
+    :param kwargs: parameters of the sketch (see EquivSketch).
+
+    :return: sketch of the equivalence classes.
+    :rtype: EquivSketch
+    """
+    sens_att = [] if sens_att is None else list(np.asarray(sens_att).tolist())
+    quasi_ident = list(np.asarray(quasi_ident).tolist())
+    if isinstance(data, EquivSketch):
+        if data.quasi_ident != quasi_ident or not set(sens_att) <= set(data.sens_att):
+            raise ValueError("The QI and SA do not match the ones of the sketch.")
+        return data
+    if isinstance(data, aux_sql.SQLTable):
+        raise ValueError("Tables of a SQL database cannot be sketched.")
+    if aux_functions.is_arrow_like(data):
+        data = aux_functions.from_arrow(
+            data, quasi_ident + sens_att + ([] if weights is None else [weights])
+        )
+    sketch = EquivSketch(quasi_ident, sens_att, **kwargs)
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    for chunk in chunks:
+        aux_functions.check_qi(chunk, quasi_ident)
+        aux_functions.check_sa(chunk, sens_att)
+        sketch.update(
+            chunk,
+            None if weights is None else aux_functions.check_weights(chunk, weights),
+        )
+    return sketch
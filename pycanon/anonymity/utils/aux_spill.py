@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Grouping of the records with a memory budget, spilling to disk.
+
+The values of the QI and SA of each block of rows are encoded as integers
+with dictionaries shared by all the blocks, and the codes are written to a
+temporary file. The rows are then hash-partitioned by their QI codes until
+each partition can be grouped within the memory budget, writing at most
+MAX_FANOUT files at once and partitioning again (with another hash) the
+partitions that are still too large. As the records of an equivalence class
+are all in the same partition, each partition is aggregated independently,
+in blocks of rows, and its table of distinct combinations of values is
+written to disk, giving the same equivalence classes as grouping all the
+records at once.
+
+The budget bounds the working memory used to encode, partition and group
+the rows, with a minimum of MIN_BLOCK_ROWS rows per block. The dictionaries
+of distinct values of each column and the final table of distinct
+combinations of values of the QI and SA, which is the result of the grouping
+used to evaluate the models, are kept in memory and are not bounded by it.
+"""
+
+import math
+import os
+import re
+import tempfile
+import typing
+
+import numpy as np
+import pandas as pd
+
+# Bytes of working memory needed by pandas to group each byte of codes
+GROUPBY_OVERHEAD = 6
+CODE_BYTES = 8
+MIN_BLOCK_ROWS = 2**12
+# Maximum number of partition files written at once
+MAX_FANOUT = 64
+_UNITS = {"": 1, "B": 1, "KB": 2**10, "MB": 2**20, "GB": 2**30, "TB": 2**40}
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def parse_memory_limit(memory_limit: typing.Union[int, str]) -> int:
+    """Get the number of bytes of a memory limit.
+
+    :param memory_limit: number of bytes, or string with a number and a unit
+        (B, KB, MB, GB or TB, in powers of 1024), e.g. "512MB".
+    :type memory_limit: int or string
+
+    :return: number of bytes.
+    :rtype: int
+    """
+    if isinstance(memory_limit, str):
+        match = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]?B?)\s*", memory_limit.upper())
+        if match is None:
+            raise ValueError(f"Invalid memory limit: {memory_limit}")
+        memory_limit = float(match.group(1)) * _UNITS[match.group(2)]
+    if memory_limit <= 0:
+        raise ValueError(f"The memory limit must be positive: {memory_limit}")
+    return int(memory_limit)
+
+
+def estimate_memory(n_rows: int, n_columns: int) -> int:
+    """Estimate the working memory needed to group the records at once.
+
+    :param n_rows: number of rows of the data.
+    :type n_rows: int
+
+    :param n_columns: number of columns used to group the rows (QI and SA).
+    :type n_columns: int
+
+    :return: estimated number of bytes.
+    :rtype: int
+    """
+    return n_rows * _row_bytes(n_columns) * GROUPBY_OVERHEAD
+
+
+def iter_blocks(
+    data: pd.DataFrame, memory_limit: int, n_columns: int
+) -> typing.Iterator[pd.DataFrame]:
+    """Split a dataframe into blocks of rows that can be encoded within a budget.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param memory_limit: memory budget in bytes.
+    :type memory_limit: int
+
+    :param n_columns: number of columns used to group the rows (QI and SA).
+    :type n_columns: int
+
+    :return: blocks of rows of the dataframe.
+    :rtype: iterator of pandas dataframes
+    """
+    block_rows = max(memory_limit // estimate_memory(1, n_columns), MIN_BLOCK_ROWS)
+    for start in range(0, len(data), block_rows):
+        stop = start + block_rows
+        yield data.iloc[start:stop]
+
+
+def aggregate_spilled(
+    chunks: typing.Iterable[pd.DataFrame],
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray],
+    memory_limit: int,
+    weights: typing.Optional[str] = None,
+) -> typing.Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Aggregate the records by the QI and SA within a memory budget.
+
+    :param chunks: blocks of rows of the data under study.
+    :type chunks: iterable of pandas dataframes
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param memory_limit: memory budget in bytes for encoding, partitioning
+        and grouping the rows (see the description of the module).
+    :type memory_limit: int
+
+    :param weights: name of the column with the number of records
+        represented by each row. If None, each row is a record.
+    :type weights: string
+
+    :return: distinct combinations of values of the QI and SA (as
+        categoricals), number of records with each of them and equivalence
+        class of each one.
+    :rtype: pandas dataframe, numpy array and numpy array of ints.
+    """
+    quasi_ident = list(dict.fromkeys(np.asarray(quasi_ident).tolist()))
+    columns = list(dict.fromkeys(quasi_ident + list(sens_att)))
+    dictionaries: typing.List[typing.Optional[pd.Index]] = [None] * len(columns)
+    with tempfile.TemporaryDirectory(prefix="pycanon-") as tmp:
+        codes_file = f"{tmp}/codes.bin"
+        weights_file = f"{tmp}/weights.bin"
+        n_rows = 0
+        weights_dtype = np.dtype(np.int64)
+        with open(codes_file, "wb") as f_codes, open(weights_file, "wb") as f_weights:
+            for chunk in chunks:
+                codes = np.empty((len(chunk), len(columns)), dtype=np.int64)
+                for j, col in enumerate(columns):
+                    codes[:, j], dictionaries[j] = _encode(chunk[col], dictionaries[j])
+                codes.tofile(f_codes)
+                if weights is None:
+                    chunk_weights = np.ones(len(chunk))
+                else:
+                    chunk_weights = chunk[weights].to_numpy()
+                    if not np.issubdtype(chunk_weights.dtype, np.integer):
+                        weights_dtype = np.dtype(np.float64)
+                # the weights are summed as floats, and rounded back if ints
+                chunk_weights.astype(np.float64).tofile(f_weights)
+                n_rows += len(chunk)
+        if n_rows == 0:
+            raise ValueError("No data to aggregate.")
+
+        # the aggregated codes are kept with the smallest dtype
+        n_values = max(len(dictionary) for dictionary in dictionaries)
+        dtype = np.int32 if n_values < 2**31 else np.int64
+        budget = max(memory_limit, estimate_memory(MIN_BLOCK_ROWS, len(columns)))
+        n_ec = 0
+        files = {name: f"{tmp}/{name}.bin" for name in ["table", "count", "ec"]}
+        handles = {name: open(path, "wb") for name, path in files.items()}
+        try:
+            for part_codes, part_weights in _partition(
+                codes_file, weights_file, len(quasi_ident), len(columns), budget
+            ):
+                table, count, part_ec = _aggregate_partition(
+                    part_codes,
+                    part_weights,
+                    len(quasi_ident),
+                    len(columns),
+                    dtype,
+                    budget,
+                )
+                part_ec += n_ec
+                n_ec = int(part_ec.max(initial=n_ec - 1)) + 1
+                # the tables of the partitions are spilled too
+                table.tofile(handles["table"])
+                count.tofile(handles["count"])
+                part_ec.tofile(handles["ec"])
+        finally:
+            for handle in handles.values():
+                handle.close()
+        table = np.fromfile(files["table"], dtype=dtype).reshape(-1, len(columns))
+        count = np.fromfile(files["count"], dtype=np.float64)
+        ec_codes = np.fromfile(files["ec"], dtype=np.int64)
+
+    data = pd.DataFrame(
+        {
+            col: _sorted_categorical(table[:, j], dictionaries[j])
+            for j, col in enumerate(columns)
+        }
+    )
+    del table
+    if np.issubdtype(weights_dtype, np.integer):
+        count = np.rint(count).astype(np.int64)
+    return data, count, ec_codes
+
+
+def _row_bytes(n_columns: int) -> int:
+    # codes of the columns and weight of each row
+    return CODE_BYTES * (n_columns + 1)
+
+
+def _encode(
+    column: pd.Series, dictionary: typing.Optional[pd.Index]
+) -> typing.Tuple[np.ndarray, pd.Index]:
+    """Encode the values of a column, extending the dictionary if needed."""
+    codes, uniques = pd.factorize(column)
+    uniques = pd.Index(np.asarray(uniques))
+    if dictionary is None:
+        dictionary = uniques
+    else:
+        new = dictionary.get_indexer(uniques) < 0
+        if new.any():
+            dictionary = dictionary.append(uniques[new])
+    mapping = dictionary.get_indexer(uniques)
+    return np.where(codes >= 0, mapping[codes], -1), dictionary
+
+
+def _sorted_categorical(codes: np.ndarray, dictionary: pd.Index) -> pd.Categorical:
+    """Build a categorical with the categories sorted, as in pd.factorize.
+
+    The dictionaries are in order of appearance, but the models that depend
+    on the order of the values of the SA (e.g. the EMD of a numerical SA)
+    expect them to be sorted.
+    """
+    try:
+        order = dictionary.argsort()
+    except TypeError:
+        # values that cannot be compared are kept in order of appearance
+        return pd.Categorical.from_codes(codes, categories=dictionary)
+    rank = np.empty(len(order), dtype=codes.dtype)
+    rank[order] = np.arange(len(order))
+    codes = np.where(codes >= 0, rank[np.maximum(codes, 0)], -1)
+    return pd.Categorical.from_codes(codes, categories=dictionary[order])
+
+
+def _partition(
+    codes_file: str,
+    weights_file: str,
+    n_qi: int,
+    n_columns: int,
+    memory_limit: int,
+    level: int = 0,
+) -> typing.Iterator[typing.Tuple[str, str]]:
+    """Hash-partition the spilled rows by their QI until they fit the budget.
+
+    The files of each partition are yielded, and removed once they have been
+    aggregated (except the ones given).
+    """
+    n_rows = os.path.getsize(weights_file) // CODE_BYTES
+    n_partitions = math.ceil(estimate_memory(n_rows, n_columns) / memory_limit)
+    if n_partitions <= 1 or n_rows <= MIN_BLOCK_ROWS:
+        yield codes_file, weights_file
+        return
+    parts = _split(
+        codes_file, weights_file, n_qi, n_columns, min(n_partitions, MAX_FANOUT), level
+    )
+    for part_codes, part_weights, part_rows in parts:
+        if part_rows == n_rows:
+            # all the rows have the same hash, so they cannot be split
+            yield part_codes, part_weights
+        elif part_rows > 0:
+            yield from _partition(
+                part_codes, part_weights, n_qi, n_columns, memory_limit, level + 1
+            )
+        os.remove(part_codes)
+        os.remove(part_weights)
+
+
+def _split(
+    codes_file: str,
+    weights_file: str,
+    n_qi: int,
+    n_columns: int,
+    n_partitions: int,
+    seed: int,
+) -> typing.List[typing.Tuple[str, str, int]]:
+    """Split the spilled rows into files by the hash of their QI codes."""
+    codes = np.memmap(codes_file, dtype=np.int64, mode="r").reshape(-1, n_columns)
+    weights = np.memmap(weights_file, dtype=np.float64, mode="r")
+    # each block is read, split by partition and appended to its file
+    block_rows = max(len(codes) // n_partitions, MIN_BLOCK_ROWS)
+    names = [f"{codes_file}.{p}" for p in range(n_partitions)]
+    n_part_rows = np.zeros(n_partitions, dtype=np.int64)
+    handles = [open(name, "wb") for name in names]
+    weight_handles = [open(f"{name}.weights", "wb") for name in names]
+    try:
+        for start in range(0, len(codes), block_rows):
+            stop = start + block_rows
+            block = np.asarray(codes[start:stop])
+            part = _hash_rows(block[:, :n_qi], seed) % np.uint64(n_partitions)
+            order = np.argsort(part, kind="stable")
+            bounds = np.searchsorted(part[order], np.arange(n_partitions + 1))
+            block_weights = np.asarray(weights[start:stop])[order]
+            block = block[order]
+            for p in range(n_partitions):
+                lo, hi = bounds[p], bounds[p + 1]
+                block[lo:hi].tofile(handles[p])
+                block_weights[lo:hi].tofile(weight_handles[p])
+            n_part_rows += np.diff(bounds)
+    finally:
+        for handle in handles + weight_handles:
+            handle.close()
+    del codes, weights
+    return [
+        (name, f"{name}.weights", int(rows)) for name, rows in zip(names, n_part_rows)
+    ]
+
+
+def _hash_rows(codes: np.ndarray, seed: int = 0) -> np.ndarray:
+    """Mix the codes of each row into a 64-bit hash."""
+    h = np.full(len(codes), seed, dtype=np.uint64) * _HASH_MULTIPLIER
+    for j in range(codes.shape[1]):
+        h = (h ^ codes[:, j].astype(np.uint64)) * _HASH_MULTIPLIER
+        h ^= h >> np.uint64(29)
+    return h
+
+
+def _aggregate_partition(
+    codes_file: str,
+    weights_file: str,
+    n_qi: int,
+    n_columns: int,
+    dtype: type,
+    memory_limit: int,
+) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Aggregate the rows of a partition and find their equivalence classes.
+
+    The rows are read and aggregated in blocks that fit the budget, merging
+    the table of each block with the previous ones.
+    """
+    weights = np.memmap(weights_file, dtype=np.float64, mode="r")
+    codes = np.memmap(codes_file, dtype=np.int64, mode="r").reshape(-1, n_columns)
+    block_rows = max(memory_limit // estimate_memory(1, n_columns), MIN_BLOCK_ROWS)
+    table = np.empty((0, n_columns), dtype=dtype)
+    count = np.empty(0)
+    for start in range(0, len(codes), block_rows):
+        stop = start + block_rows
+        block_table, block_count = _group_sum(
+            np.asarray(codes[start:stop]), np.asarray(weights[start:stop]), dtype
+        )
+        if len(table) > 0:
+            block_table, block_count = _group_sum(
+                np.concatenate([table, block_table]),
+                np.concatenate([count, block_count]),
+                dtype,
+            )
+        table, count = block_table, block_count
+    del codes, weights
+    # the missing values (code -1) are a value of their own
+    ec = pd.DataFrame(table[:, :n_qi]).groupby(list(range(n_qi))).ngroup()
+    return table, count, ec.to_numpy(dtype=np.int64)
+
+
+def _group_sum(
+    codes: np.ndarray, weights: np.ndarray, dtype: type
+) -> typing.Tuple[np.ndarray, np.ndarray]:
+    """Sum the weights of the rows with the same codes."""
+    frame = pd.DataFrame(codes)
+    count = (
+        pd.Series(weights)
+        .groupby([frame[j] for j in range(codes.shape[1])], sort=False)
+        .sum()
+    )
+    table = count.index.to_frame(index=False).to_numpy(dtype=dtype)
+    return table, count.to_numpy(dtype=np.float64)
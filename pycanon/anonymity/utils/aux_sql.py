@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Evaluation of the privacy models over a table of a SQL database.
+
+The records are grouped in the database with GROUP BY/COUNT queries, and
+only the distinct combinations of values of the QI and SA (with their
+frequencies) are retrieved.
+"""
+
+import typing
+
+import numpy as np
+import pandas as pd
+
+from pycanon.anonymity.utils import aux_functions
+
+COUNT_COLUMN = "_pycanon_count"
+
+_engines: typing.Dict[str, typing.Any] = {}
+
+
+class SQLTable:
+    """Table of a SQL database, to be used instead of a dataframe.
+
+    It can be passed as the data to the privacy models and to
+    get_report_values, which then compute the models from the aggregated
+    frequencies returned by the database.
+
+    :param con: SQLAlchemy engine or connection, DB-API connection (e.g.
+        sqlite3), or database URL. An engine (with its connection pool) is
+        created and reused for each URL, which requires SQLAlchemy.
+    :type con: SQLAlchemy connectable, DB-API connection or string
+
+    :param table: name of the table (or view), optionally with its schema
+        as "schema.table".
+    :type table: string
+
+    The identifiers are quoted by the dialect of SQLAlchemy connections, and
+    with ANSI double quotes for DB-API connections.
+    """
+
+    def __init__(self, con: typing.Any, table: str):
+        """Store the connection and the table, no query is run."""
+        if isinstance(con, str):
+            con = _get_engine(con)
+        self.con = con
+        self.table = table
+        self._quote = _get_quote(con)
+        self._columns: typing.Optional[pd.Index] = None
+        self._aggregates: typing.Dict[tuple, tuple] = {}
+
+    @property
+    def columns(self) -> pd.Index:
+        """Get the columns of the table."""
+        if self._columns is None:
+            query = f"SELECT * FROM {self._quote_table()} WHERE 1 = 0"
+            self._columns = pd.read_sql_query(query, self.con).columns
+        return self._columns
+
+    def aggregate(
+        self,
+        columns: typing.Union[typing.List, np.ndarray],
+        weights: typing.Optional[str] = None,
+    ) -> typing.Tuple[pd.DataFrame, np.ndarray]:
+        """Get the distinct combinations of values of the columns and their counts.
+
+        :param columns: list with the name of the columns to group by.
+        :type columns: list of strings
+
+        :param weights: name of the column with the number of records
+            represented by each row, which is summed instead of counting the
+            rows. If None, each row is a record.
+        :type weights: string
+
+        :return: distinct combinations of values of the columns and number of
+            records with each of them.
+        :rtype: pandas dataframe and numpy array of ints.
+        """
+        columns = list(dict.fromkeys(np.asarray(columns).tolist()))
+        key = (tuple(columns), weights)
+        if key not in self._aggregates:
+            self._aggregates[key] = self._query_aggregate(columns, weights)
+        return self._aggregates[key]
+
+    def _query_aggregate(
+        self, columns: list, weights: typing.Optional[str]
+    ) -> typing.Tuple[pd.DataFrame, np.ndarray]:
+        quote = self._quote
+        names = ", ".join(quote(str(col)) for col in columns)
+        count = "COUNT(*)" if weights is None else f"SUM({quote(str(weights))})"
+        query = (
+            f"SELECT {names}, {count} AS {quote(COUNT_COLUMN)} "
+            f"FROM {self._quote_table()} GROUP BY {names}"
+        )
+        data = pd.read_sql_query(query, self.con)
+        counts = data.pop(COUNT_COLUMN).to_numpy(dtype=np.int64)
+        data.columns = columns
+        return data, counts
+
+    def _quote_table(self) -> str:
+        return ".".join(self._quote(part) for part in self.table.split("."))
+
+
+def get_aggregates(
+    table: SQLTable,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
+) -> typing.Tuple[pd.DataFrame, np.ndarray]:
+    """Check the QI and SA and group the records of the table in the database.
+
+    :param table: table of the database.
+    :type table: SQLTable
+
+    :param quasi_ident: list with the name of the columns of the table
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the table
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param weights: name of the column with the number of records
+        represented by each row. If None, each row is a record.
+    :type weights: string
+
+    :return: distinct combinations of values of the QI and SA and number of
+        records with each of them.
+    :rtype: pandas dataframe and numpy array of ints.
+    """
+    columns = pd.DataFrame(columns=table.columns)
+    aux_functions.check_qi(columns, quasi_ident)
+    aux_functions.check_sa(columns, sens_att)
+    if weights is not None and weights not in columns:
+        raise ValueError(f"Value not defined: {weights}. Cannot be the weights")
+    return table.aggregate(list(quasi_ident) + list(sens_att), weights)
+
+
+def _get_engine(url: str) -> typing.Any:
+    """Get the SQLAlchemy engine for the URL, creating it only once."""
+    if url not in _engines:
+        import sqlalchemy
+
+        _engines[url] = sqlalchemy.create_engine(url)
+    return _engines[url]
+
+
+def _get_quote(con: typing.Any) -> typing.Callable[[str], str]:
+    """Get the function quoting the identifiers for the connection.
+
+    SQLAlchemy engines and connections quote them with the preparer of their
+    dialect (e.g. backquotes for MySQL), DB-API connections, which do not
+    expose their dialect, with the ANSI double quotes.
+    """
+    dialect = getattr(con, "dialect", None)
+    if dialect is not None:
+        return dialect.identifier_preparer.quote
+    return _quote_ansi
+
+
+def _quote_ansi(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
@@ -24,44 +24,132 @@ import typer
 
 import pycanon
 from pycanon import anonymity
+from pycanon.anonymity.utils import aux_cache
 from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_index
+from pycanon.anonymity.utils import aux_results
+from pycanon.report import base as report_base
+from pycanon.report import planner
 
 app = typer.Typer()
+index_app = typer.Typer(help="Build indexes of the equivalence classes.")
+app.add_typer(index_app, name="index")
 
+_options: typing.Dict[str, typing.Any] = {
+    "cache_dir": None,
+    "memory_limit": None,
+    "explain": False,
+}
 
-@app.command()
-def k_anonymity(
-    filename: pathlib.Path = typer.Argument(
+
+def _file_argument():
+    """Get the argument with the input file of a command."""
+    return typer.Argument(
         ...,
-        exists=True,
         file_okay=True,
-        dir_okay=False,
+        dir_okay=True,
         writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+        help="File with the data, or directory with an index of the "
+        "equivalence classes built with 'pycanon index build'. Csv files can "
+        "be compressed (gz, bz2, xz, zst); use - to read a csv file from the "
+        "standard input.",
+    )
+
+
+def _worst_option():
+    """Get the option with the number of worst equivalence classes to show."""
+    return typer.Option(
+        None,
+        min=1,
+        help="Number of equivalence classes with the worst value for the "
+        "model to be shown (none by default).",
+    )
+
+
+def _read_file(filename, qi, sa=None):
+    """Read only the QI and SA columns of the file, with compact dtypes."""
+    if str(filename) != aux_functions.STDIN and filename.is_dir():
+        try:
+            return aux_index.load_index(filename)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="'FILENAME'")
+    if str(filename) != aux_functions.STDIN and not filename.is_file():
+        raise typer.BadParameter(
+            f"File '{filename}' does not exist.", param_hint="'FILENAME'"
+        )
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        engine = None
+    else:
+        engine = "pyarrow" if ".csv" in filename.suffixes else None
+    try:
+        return aux_functions.read_file(
+            filename,
+            quasi_ident=qi,
+            sens_att=sa,
+            engine=engine,
+            compact_dtypes=True,
+            # without pyarrow, only the results are cached
+            cache_dir=_options["cache_dir"] if aux_cache.AVAILABLE else None,
+        )
+    except ValueError as e:
+        raise typer.BadParameter(str(e))
+
+
+def _echo_result(value):
+    """Print the result of a model and whether it was found in the cache."""
+    typer.echo(value)
+    _echo_cache_status()
+
+
+def _echo_cache_status():
+    """Print to stderr if the last result was a hit or miss of the cache."""
+    status = aux_results.info()["last"]
+    if status is not None:
+        typer.echo(f"Result cache {status}", err=True)
+
+
+def _explain(dataset, qi, sa=None, models=None, gen=True):
+    """Print the execution plan instead of evaluating the models, if asked."""
+    if _options["explain"]:
+        typer.echo(
+            planner.explain(dataset, qi, sa, models, gen, _options["memory_limit"])
+        )
+        raise typer.Exit()
+
+
+def _echo_worst(dataset, qi, sa, model, n):
+    """Print the equivalence classes with the worst value for a model."""
+    worst = anonymity.worst_equiv_classes(
+        dataset, qi, sa, model=model, n=n, memory_limit=_options["memory_limit"]
+    )
+    typer.echo(tabulate.tabulate(worst, headers="keys", showindex=False))
+
+
+@app.command()
+def k_anonymity(
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
         "quasi-identifiers (QI).",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate k-anonymity."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.k_anonymity(dataset, qi))
+    dataset = _read_file(filename, qi)
+    _explain(dataset, qi, None, "k_anonymity")
+    _echo_result(
+        anonymity.k_anonymity(dataset, qi, memory_limit=_options["memory_limit"])
+    )
+    if worst:
+        _echo_worst(dataset, qi, None, "k_anonymity", worst)
 
 
 @app.command()
 def alpha_k_anonymity(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -78,23 +166,23 @@ def alpha_k_anonymity(
         "multiple SA: If true, generalization approach is applied, "
         "if False, the set of QI is updated for each SA.",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate (alpha,k)-anonymity."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.alpha_k_anonymity(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "alpha_k_anonymity", gen)
+    _echo_result(
+        anonymity.alpha_k_anonymity(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
+    if worst:
+        _echo_worst(dataset, qi, sa, "alpha_k_anonymity", worst)
 
 
 @app.command()
 def l_diversity(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -111,23 +199,23 @@ def l_diversity(
         "multiple SA: If true, generalization approach is applied, "
         "if False, the set of QI is updated for each SA.",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate l-diversity."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.l_diversity(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "l_diversity", gen)
+    _echo_result(
+        anonymity.l_diversity(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
+    if worst:
+        _echo_worst(dataset, qi, sa, "l_diversity", worst)
 
 
 @app.command()
 def entropy_l_diversity(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -144,23 +232,23 @@ def entropy_l_diversity(
         "multiple SA: If true, generalization approach is applied, "
         "if False, the set of QI is updated for each SA.",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate entropy l-diversity."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.entropy_l_diversity(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "entropy_l_diversity", gen)
+    _echo_result(
+        anonymity.entropy_l_diversity(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
+    if worst:
+        _echo_worst(dataset, qi, sa, "entropy_l_diversity", worst)
 
 
 @app.command()
 def recursive_c_l_diversity(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -179,21 +267,18 @@ def recursive_c_l_diversity(
     ),
 ):
     """Calculate recursive (c,l)-diversity."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.recursive_c_l_diversity(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "recursive_c_l_diversity", gen)
+    _echo_result(
+        anonymity.recursive_c_l_diversity(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
 
 
 @app.command()
 def basic_beta_likeness(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -210,23 +295,23 @@ def basic_beta_likeness(
         "multiple SA: If true, generalization approach is applied, "
         "if False, the set of QI is updated for each SA.",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate basic beta-likeness."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.basic_beta_likeness(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "basic_beta_likeness", gen)
+    _echo_result(
+        anonymity.basic_beta_likeness(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
+    if worst:
+        _echo_worst(dataset, qi, sa, "basic_beta_likeness", worst)
 
 
 @app.command()
 def enhanced_beta_likeness(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -243,23 +328,23 @@ def enhanced_beta_likeness(
         "multiple SA: If true, generalization approach is applied, "
         "if False, the set of QI is updated for each SA.",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate enhanced beta-likeness."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.enhanced_beta_likeness(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "enhanced_beta_likeness", gen)
+    _echo_result(
+        anonymity.enhanced_beta_likeness(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
+    if worst:
+        _echo_worst(dataset, qi, sa, "enhanced_beta_likeness", worst)
 
 
 @app.command()
 def t_closeness(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -276,23 +361,23 @@ def t_closeness(
         "multiple SA: If true, generalization approach is applied, "
         "if False, the set of QI is updated for each SA.",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate t-closeness."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.t_closeness(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "t_closeness", gen)
+    _echo_result(
+        anonymity.t_closeness(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
+    if worst:
+        _echo_worst(dataset, qi, sa, "t_closeness", worst)
 
 
 @app.command()
 def delta_disclosure(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -309,23 +394,23 @@ def delta_disclosure(
         "multiple SA: If true, generalization approach is applied, "
         "if False, the set of QI is updated for each SA.",
     ),
+    worst: typing.Optional[int] = _worst_option(),
 ):
     """Calculate delta-disclosure."""
-    dataset = aux_functions.read_file(filename)
-    typer.echo(anonymity.delta_disclosure(dataset, qi, sa, gen))
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, "delta_disclosure", gen)
+    _echo_result(
+        anonymity.delta_disclosure(
+            dataset, qi, sa, gen, memory_limit=_options["memory_limit"]
+        )
+    )
+    if worst:
+        _echo_worst(dataset, qi, sa, "delta_disclosure", worst)
 
 
 @app.command()
 def report(
-    filename: pathlib.Path = typer.Argument(
-        ...,
-        exists=True,
-        file_okay=True,
-        dir_okay=False,
-        writable=False,
-        readable=True,
-        resolve_path=True,
-    ),
+    filename: pathlib.Path = _file_argument(),
     qi: typing.List[str] = typer.Option(
         ...,
         help="Quasi-identifier, pass it multiple times to define multiple "
@@ -344,21 +429,24 @@ def report(
     ),
 ):
     """Generate a complete privacy report."""
-    dataset = aux_functions.read_file(filename)
+    dataset = _read_file(filename, qi, sa)
+    _explain(dataset, qi, sa, planner.REPORT_MODELS, gen)
 
     headers = ["Technique", "Values"]
 
-    k_anon = anonymity.k_anonymity(dataset, qi)
-    alpha, alpha_k = anonymity.alpha_k_anonymity(dataset, qi, sa, gen=gen)
-    l_div = anonymity.l_diversity(dataset, qi, sa, gen=gen)
-    entropy_l = anonymity.entropy_l_diversity(dataset, qi, sa, gen=gen)
-    c_div, l_c_div = anonymity.recursive_c_l_diversity(
-        dataset, qi, sa, imp=False, gen=gen
+    (
+        k_anon,
+        (alpha, alpha_k),
+        l_div,
+        entropy_l,
+        (c_div, l_c_div),
+        basic_beta,
+        enhanced_beta,
+        delta_disc,
+        t_clos,
+    ) = report_base.get_report_values(
+        dataset, qi, sa, gen=gen, memory_limit=_options["memory_limit"]
     )
-    basic_beta = anonymity.basic_beta_likeness(dataset, qi, sa, gen=gen)
-    enhanced_beta = anonymity.enhanced_beta_likeness(dataset, qi, sa, gen=gen)
-    delta_disc = anonymity.delta_disclosure(dataset, qi, sa, gen=gen)
-    t_clos = anonymity.t_closeness(dataset, qi, sa, gen=gen)
 
     vals = [
         ["k-anonymity", f"k = {k_anon}"],
@@ -373,6 +461,50 @@ def report(
     ]
 
     typer.echo(tabulate.tabulate(vals, headers=headers))
+    _echo_cache_status()
+
+
+@index_app.command("build")
+def build_index(
+    filename: pathlib.Path = typer.Argument(
+        ...,
+        file_okay=True,
+        dir_okay=False,
+        help="File with the data. Csv files can be compressed (gz, bz2, xz, "
+        "zst); use - to read a csv file from the standard input.",
+    ),
+    output: pathlib.Path = typer.Option(
+        ...,
+        file_okay=False,
+        help="Directory where the index is saved.",
+    ),
+    qi: typing.List[str] = typer.Option(
+        ...,
+        help="Quasi-identifier, pass it multiple times to define multiple "
+        "quasi-identifiers (QI).",
+    ),
+    sa: typing.List[str] = typer.Option(
+        [],
+        help="Sensitive attribute, pass it multiple times to define "
+        "multiple sensitive attributes (SA).",
+    ),
+    extended: bool = typer.Option(
+        False,
+        help="Whether to also save the classes needed to evaluate the models "
+        "with several SA without the generalization approach (--no-gen).",
+    ),
+):
+    """Build an index of the equivalence classes to evaluate the models.
+
+    The directory can then be given instead of the file to the rest of
+    commands.
+    """
+    dataset = _read_file(filename, qi, sa)
+    index = aux_index.build_index(dataset, qi, output, sa, extended=extended)
+    typer.echo(
+        f"Index of {index.n_ec} equivalence classes of {index.n_records} "
+        f"records saved in {output}"
+    )
 
 
 def version_callback(version: bool):
@@ -390,10 +522,40 @@ def main(
         help="Print version and exit",
         callback=version_callback,
         is_eager=True,
-    )
+    ),
+    cache_dir: typing.Optional[pathlib.Path] = typer.Option(
+        None,
+        envvar="PYCANON_CACHE_DIR",
+        file_okay=False,
+        help="Directory where the parsed input files (requires pyarrow) and "
+        "the results are cached, so that repeated runs over the same file "
+        "are faster.",
+    ),
+    memory_limit: typing.Optional[str] = typer.Option(
+        None,
+        envvar="PYCANON_MEMORY_LIMIT",
+        help="Memory budget for grouping the records (e.g. 512MB). If it "
+        "would be exceeded, the records are grouped by partitions spilled to "
+        "temporary files.",
+    ),
+    explain: bool = typer.Option(
+        False,
+        "--explain",
+        help="Print the execution plan chosen for the data (engine, threads "
+        "and estimated cost of each step) instead of evaluating the models.",
+    ),
 ):
     """Check the level of anonymity of a dataset."""
-    pass
+    _options["cache_dir"] = cache_dir
+    _options["memory_limit"] = memory_limit
+    _options["explain"] = explain
+    if cache_dir is not None:
+        aux_results.enable(cache_dir)
+        if not aux_cache.AVAILABLE:
+            typer.echo(
+                "pyarrow is not installed, the parsed input files are not cached",
+                err=True,
+            )
 
 
 if __name__ == "__main__":
@@ -17,19 +17,35 @@
 from ._utility_metrics import average_ecsize
 from ._utility_metrics import classification_metric
 from ._utility_metrics import discernability_metric
+from ._utility_metrics import utility_metrics
 from ._attribute_statistics import sizes_ec
 from ._attribute_statistics import stats_quasi_ident
+from ._attribute_statistics import stats_quasi_idents
 from ._reidentification_metrics import average_rir
 from ._reidentification_metrics import max_rir
+from ._reidentification_metrics import record_rir
+from ._reidentification_metrics import rir_summary
+from ._reidentification_metrics import linkage_attack
 from ._disclosure_metrics import sa_entropy
+from ._disclosure_metrics import sa_entropies
+from ._disclosure_metrics import ec_sa_entropies
+from ._bootstrap import bootstrap_metrics
 
 __all__ = [
     "average_ecsize",
     "classification_metric",
     "discernability_metric",
+    "utility_metrics",
     "sizes_ec",
     "stats_quasi_ident",
+    "stats_quasi_idents",
     "average_rir",
     "max_rir",
+    "record_rir",
+    "rir_summary",
+    "linkage_attack",
     "sa_entropy",
+    "sa_entropies",
+    "ec_sa_entropies",
+    "bootstrap_metrics",
 ]
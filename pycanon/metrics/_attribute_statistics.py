@@ -15,13 +15,16 @@
 # under the License.
 
 import typing
+from concurrent import futures
 import numpy as np
 import pandas as pd
-from pycanon.anonymity.utils import aux_anonymity
+from pycanon.anonymity.utils import aux_anonymity, aux_functions
 
 
 def sizes_ec(
-    data: pd.DataFrame, quasi_ident: typing.Union[typing.List, np.ndarray]
+    data: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
 ) -> dict:
     """Calculate statistics associated to the equivalence classes.
 
@@ -31,20 +34,30 @@ def sizes_ec(
     :param quasi_ident: list with the name of the columns of the dataframe
             that are quasi-identifiers.
     :type quasi_ident: list of strings
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
     """
-    equiv_class = aux_anonymity.get_equiv_class(data, quasi_ident)
-    len_ec = [len(ec) for ec in equiv_class]
+    equiv = aux_anonymity.get_equiv_classes(data, quasi_ident, weights=weights)
+    return _sizes_ec(equiv.sizes)
+
+
+def _sizes_ec(sizes: np.ndarray) -> dict:
     stats_ec = {
-        "n_ec": len(equiv_class),
-        "min_ec": min(len_ec),
-        "max_ec": max(len_ec),
-        "mean_ec": np.mean(len_ec),
-        "median_ec": np.median(len_ec),
+        "n_ec": len(sizes),
+        "min_ec": int(sizes.min()),
+        "max_ec": int(sizes.max()),
+        "mean_ec": np.mean(sizes),
+        "median_ec": np.median(sizes),
     }
     return stats_ec
 
 
-def stats_quasi_ident(data: pd.DataFrame, quasi_ident: str) -> dict:
+def stats_quasi_ident(
+    data: pd.DataFrame, quasi_ident: str, weights: typing.Optional[str] = None
+) -> dict:
     """Calculate statistics associated to a given quasi-identifier.
 
     :param data: dataframe with the data anonymized.
@@ -52,6 +65,11 @@ def stats_quasi_ident(data: pd.DataFrame, quasi_ident: str) -> dict:
 
     :param quasi_ident: name of the QI to be analyzed.
     :type quasi_ident: string
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
     """
     if quasi_ident not in data.columns:
         raise ValueError(f"""
@@ -59,24 +77,159 @@ def stats_quasi_ident(data: pd.DataFrame, quasi_ident: str) -> dict:
             Available columns are: {data.columns.tolist()}
             """)
 
-    qi_values = data[quasi_ident].values
-    if len(qi_values) == 0:
-        return {}
+    return stats_quasi_idents(data, [quasi_ident], weights=weights)[quasi_ident]
 
-    values, counts = np.unique(qi_values, return_counts=True)
 
-    max_idx = np.argmax(counts)
-    min_idx = np.argmin(counts)
+class _ColumnAccumulator:
+    """Frequencies and moments of a column, accumulated chunk by chunk."""
 
-    stats_qi = {
-        "max_freq_value": values[max_idx],
-        "max_freq": max(counts),
-        "min_freq_value": values[min_idx],
-        "min_freq": min(counts),
-    }
-    if np.issubdtype(qi_values.dtype, np.number):
-        stats_qi["mean"] = np.mean(qi_values)
-        stats_qi["median"] = np.median(qi_values)
-        stats_qi["std"] = np.std(qi_values)
-        stats_qi["var"] = np.var(qi_values)
-    return stats_qi
+    def __init__(self, moments=True):
+        self.moments = moments
+        self.freq: typing.Optional[pd.Series] = None
+        self.numeric = False
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(
+        self, column: pd.Series, weights: typing.Optional[np.ndarray] = None
+    ) -> None:
+        if len(column) == 0:
+            return
+        codes, uniques = pd.factorize(column, use_na_sentinel=False)
+        counts = aux_anonymity.get_equiv_class_sizes(codes, weights)
+        freq = pd.Series(np.pad(counts, (0, len(uniques) - len(counts))), index=uniques)
+        if self.freq is None:
+            self.freq = freq
+        else:
+            self.freq = (
+                pd.concat([self.freq, freq])
+                .groupby(level=0, dropna=False, sort=False)
+                .sum()
+            )
+        self.numeric = pd.api.types.is_numeric_dtype(
+            column
+        ) and not pd.api.types.is_bool_dtype(column)
+        if self.numeric and self.moments:
+            values = column.to_numpy(dtype=np.float64)
+            if weights is None:
+                n_b = len(values)
+                mean_b = values.mean()
+                m2_b = np.sum((values - mean_b) ** 2)
+            else:
+                n_b = int(weights.sum())
+                mean_b = np.sum(weights * values) / n_b
+                m2_b = np.sum(weights * (values - mean_b) ** 2)
+            # Chan et al. parallel update of the mean and the sum of squares
+            n = self.n + n_b
+            delta = mean_b - self.mean
+            self.mean += delta * n_b / n
+            self.m2 += m2_b + delta**2 * self.n * n_b / n
+            self.n = n
+
+    def stats(self, freq=False) -> dict:
+        if self.freq is None:
+            return {}
+        counts = self.freq.sort_index()
+        values = counts.index.to_numpy()
+        counts_np = counts.to_numpy()
+        max_idx = np.argmax(counts_np)
+        min_idx = np.argmin(counts_np)
+        stats_qi = {
+            "max_freq_value": values[max_idx],
+            "max_freq": counts_np[max_idx],
+            "min_freq_value": values[min_idx],
+            "min_freq": counts_np[min_idx],
+        }
+        if self.numeric:
+            stats_qi["mean"] = self.mean
+            stats_qi["median"] = _median_from_counts(values, counts_np)
+            stats_qi["std"] = np.sqrt(self.m2 / self.n)
+            stats_qi["var"] = self.m2 / self.n
+        if freq:
+            stats_qi["freq"] = counts
+        return stats_qi
+
+
+def _median_from_counts(values: np.ndarray, counts: np.ndarray) -> float:
+    values = values.astype(np.float64)
+    if np.isnan(values).any():
+        return np.nan
+    cum_counts = np.cumsum(counts)
+    n = cum_counts[-1]
+    low = values[np.searchsorted(cum_counts, (n - 1) // 2, side="right")]
+    high = values[np.searchsorted(cum_counts, n // 2, side="right")]
+    return (low + high) / 2
+
+
+def stats_quasi_idents(
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    freq=False,
+    n_jobs: int = 1,
+    weights: typing.Optional[str] = None,
+) -> dict:
+    """Calculate statistics associated to several quasi-identifiers at once.
+
+    Each column is factorized and its frequencies and moments are accumulated
+    in a single pass. The data can also be given as an iterable of
+    dataframes (chunks), which are processed one at a time.
+
+    :param data: dataframe with the data anonymized, or iterable of dataframes
+        with chunks of the data.
+    :type data: pandas dataframe or iterable of pandas dataframes
+
+    :param quasi_ident: list with the name of the QIs to be analyzed.
+    :type quasi_ident: list of strings
+
+    :param freq: boolean, default to False. If True, the frequency of each
+        value is also returned (as a pandas series).
+    :type freq: boolean
+
+    :param n_jobs: number of threads used to process the columns in parallel.
+    :type n_jobs: int
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :return: statistics of each quasi-identifier, with the same keys as
+        stats_quasi_ident.
+    :rtype: dict
+    """
+    accumulators = _accumulate_columns(data, quasi_ident, n_jobs, weights=weights)
+    return {qi: acc.stats(freq) for qi, acc in accumulators.items()}
+
+
+def _accumulate_columns(
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    columns: typing.Union[typing.List, np.ndarray],
+    n_jobs: int = 1,
+    moments=True,
+    weights: typing.Optional[str] = None,
+) -> typing.Dict[str, _ColumnAccumulator]:
+    if isinstance(columns, np.ndarray):
+        columns = columns.tolist()
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    accumulators = {col: _ColumnAccumulator(moments) for col in columns}
+    with futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        for chunk in chunks:
+            for col in columns:
+                if col not in chunk.columns:
+                    raise ValueError(f"""
+                        '{col}' is not a column in the dataframe.
+                        Available columns are: {chunk.columns.tolist()}
+                        """)
+            chunk_weights = (
+                None if weights is None else aux_functions.check_weights(chunk, weights)
+            )
+            list(
+                executor.map(
+                    lambda col: accumulators[col].update(
+                        chunk[col], chunk_weights  # noqa: B023
+                    ),
+                    columns,
+                )
+            )
+    return accumulators
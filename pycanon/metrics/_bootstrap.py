@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2026 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import typing
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+
+from pycanon.anonymity._beta_likeness import _basic_beta_likeness_equiv
+from pycanon.anonymity._beta_likeness import _enhanced_beta_likeness_equiv
+from pycanon.anonymity._delta_disclosure import _delta_disclosure_equiv
+from pycanon.anonymity._k_anonymity import _alpha_k_anonymity_equiv
+from pycanon.anonymity._k_anonymity import _k_anonymity_equiv
+from pycanon.anonymity._l_diversity import _entropy_l_diversity_equiv
+from pycanon.anonymity._l_diversity import _l_diversity_equiv
+from pycanon.anonymity._t_closeness import _t_closeness_equiv
+from pycanon.anonymity.utils import aux_anonymity
+
+COUNT_COLUMN = "_pycanon_count"
+
+
+def _average_rir(equiv: aux_anonymity.EquivClasses, sens_att: list, gen) -> float:
+    return float(np.mean(1 / equiv.sizes))
+
+
+def _max_rir(equiv: aux_anonymity.EquivClasses, sens_att: list, gen) -> float:
+    return float(1 / equiv.sizes.min())
+
+
+def _sa_entropy(equiv: aux_anonymity.EquivClasses, sens_att: list, gen) -> float:
+    if len(sens_att) != 1:
+        raise ValueError("The SA entropy needs a single sensitive attribute.")
+    p = equiv.sa_counts(sens_att[0]).p
+    return float(aux_anonymity.grouped_entropy(np.zeros(len(p), dtype=int), p, 1)[0])
+
+
+def _k_anonymity(equiv: aux_anonymity.EquivClasses, sens_att: list, gen) -> int:
+    return _k_anonymity_equiv(equiv)
+
+
+def _alpha(equiv: aux_anonymity.EquivClasses, sens_att: list, gen) -> float:
+    return _alpha_k_anonymity_equiv(equiv, sens_att, gen)[0]
+
+
+METRICS: typing.Dict[str, typing.Callable] = {
+    "average_rir": _average_rir,
+    "max_rir": _max_rir,
+    "sa_entropy": _sa_entropy,
+    "k_anonymity": _k_anonymity,
+    "alpha_k_anonymity": _alpha,
+    "l_diversity": _l_diversity_equiv,
+    "entropy_l_diversity": _entropy_l_diversity_equiv,
+    "basic_beta_likeness": _basic_beta_likeness_equiv,
+    "enhanced_beta_likeness": _enhanced_beta_likeness_equiv,
+    "delta_disclosure": _delta_disclosure_equiv,
+    "t_closeness": _t_closeness_equiv,
+}
+
+
+def bootstrap_metrics(
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    metrics: typing.Union[str, typing.List[str]],
+    sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+    n_replicates: int = 1000,
+    confidence: float = 0.95,
+    seed: typing.Optional[int] = None,
+    n_jobs: int = 1,
+    gen=True,
+    weights: typing.Optional[str] = None,
+) -> dict:
+    """Calculate bootstrap confidence intervals of privacy and utility metrics.
+
+    The data is reduced to the number of records with each combination of
+    values of the QI and SA, and each replicate draws these counts from a
+    multinomial distribution, so its cost depends on the number of distinct
+    combinations instead of the number of records. The replicates use
+    independent random streams derived from the seed, so the results do not
+    depend on the number of threads. Note that the resampled records are
+    duplicated, so the metrics that depend on the smallest equivalence classes
+    (k-anonymity and re-identification risk) are biased in the replicates;
+    the estimated bias is returned together with the intervals.
+
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param metrics: name of the metric (or list of names), among
+        "average_rir", "max_rir", "sa_entropy" (with a single SA),
+        "k_anonymity", "alpha_k_anonymity" (alpha), "l_diversity",
+        "entropy_l_diversity", "basic_beta_likeness", "enhanced_beta_likeness",
+        "delta_disclosure" and "t_closeness".
+    :type metrics: string or list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes. Not needed for the metrics of
+        the equivalence classes (k-anonymity and re-identification risk).
+    :type sens_att: list of strings
+
+    :param n_replicates: number of bootstrap replicates. Default to 1000.
+    :type n_replicates: int
+
+    :param confidence: confidence level of the intervals. Default to 0.95.
+    :type confidence: float
+
+    :param seed: seed of the random numbers, for reproducible results.
+    :type seed: int
+
+    :param n_jobs: number of threads used to evaluate the replicates.
+    :type n_jobs: int
+
+    :param gen: default to true. If true it is generalized for the case of
+        multiple SA, if False, the set of QI is updated for each SA.
+    :type gen: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :return: for each metric, its value, percentile confidence interval,
+        bootstrap standard error and bias.
+    :rtype: dict
+    """
+    names = [metrics] if isinstance(metrics, str) else list(metrics)
+    for name in names:
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric: {name}. Use one of {list(METRICS)}")
+    if not 0 < confidence < 1:
+        raise ValueError(f"The confidence must be in (0, 1): {confidence}")
+    quasi_ident = list(np.asarray(quasi_ident).tolist())
+    sens_att = [] if sens_att is None else list(np.asarray(sens_att).tolist())
+    equiv = aux_anonymity.get_equiv_classes(data, quasi_ident, sens_att, weights)
+
+    # contingency table of the QI and SA
+    columns = quasi_ident + sens_att
+    counts = 1 if equiv.weights is None else equiv.weights
+    table, counts = aux_anonymity.aggregate_chunks(
+        [equiv.data[columns].assign(**{COUNT_COLUMN: counts})],
+        columns,
+        weights=COUNT_COLUMN,
+    )
+    equiv = aux_anonymity.EquivClasses(table, quasi_ident, counts)
+    estimate = _evaluate(equiv, names, sens_att, gen)
+
+    n_records = int(counts.sum())
+    p = counts / n_records
+
+    def replicate(seed_seq: np.random.SeedSequence) -> list:
+        rep_counts = np.random.default_rng(seed_seq).multinomial(n_records, p)
+        mask = rep_counts > 0
+        codes = equiv.codes[mask]
+        # renumber the classes present in the replicate, -1 stays as -1
+        present = np.bincount(codes[codes >= 0], minlength=equiv.n_ec) > 0
+        renumber = np.append(np.cumsum(present) - 1, -1)
+        rep_equiv = aux_anonymity.EquivClasses(
+            table[mask].reset_index(drop=True),
+            quasi_ident,
+            rep_counts[mask],
+            codes=renumber[codes],
+        )
+        return _evaluate(rep_equiv, names, sens_att, gen)
+
+    seeds = np.random.SeedSequence(seed).spawn(n_replicates)
+    with futures.ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        replicates = np.array(list(executor.map(replicate, seeds)), dtype=np.float64)
+    replicates = replicates.reshape(-1, len(names))
+    intervals = percentile_intervals(replicates, confidence)
+    return {
+        name: {
+            "estimate": estimate[i],
+            "ci": list(intervals[i]),
+            "std": float(np.nanstd(replicates[:, i], ddof=1)),
+            "bias": float(np.nanmean(replicates[:, i]) - estimate[i]),
+        }
+        for i, name in enumerate(names)
+    }
+
+
+def _evaluate(
+    equiv: aux_anonymity.EquivClasses, names: list, sens_att: list, gen
+) -> list:
+    return [float(METRICS[name](equiv, sens_att, gen)) for name in names]
+
+
+def percentile_intervals(
+    replicates: np.ndarray, confidence: float
+) -> typing.List[typing.Tuple[float, float]]:
+    """Calculate percentile confidence intervals from bootstrap replicates.
+
+    :param replicates: value of each statistic (column) in each replicate
+        (row). Missing values are ignored.
+    :type replicates: numpy array of floats
+
+    :param confidence: confidence level of the intervals.
+    :type confidence: float
+
+    :return: lower and upper bound of the interval of each statistic.
+    :rtype: list of tuples of floats
+    """
+    alpha = 1 - confidence
+    intervals = []
+    for column in replicates.T:
+        column = column[~np.isnan(column)]
+        if len(column) == 0:
+            intervals.append((np.nan, np.nan))
+        else:
+            lo, hi = np.percentile(column, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+            intervals.append((float(lo), float(hi)))
+    return intervals
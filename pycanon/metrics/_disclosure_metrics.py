@@ -14,13 +14,16 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import typing
 import numpy as np
 import pandas as pd
-from scipy.stats import entropy
-from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_anonymity, aux_functions
+from pycanon.metrics._attribute_statistics import _accumulate_columns
 
 
-def sa_entropy(data_anon: pd.DataFrame, sens_attr: str) -> float:
+def sa_entropy(
+    data_anon: pd.DataFrame, sens_attr: str, weights: typing.Optional[str] = None
+) -> float:
     """Calculate Shannon Entropy for a sensitive attribute.
 
     :param data_anon: dataframe with the data anonymized.
@@ -29,12 +32,92 @@ def sa_entropy(data_anon: pd.DataFrame, sens_attr: str) -> float:
     :param sens_attr: string with the senstive attribute for calculating the entropy.
     :type sens_attr: string
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+
     :return: Shannon entropy for the sensitive attribute.
     :rtype: float
     """
     aux_functions.check_sa(data_anon, [sens_attr])
-    pk = []
-    n_records = len(data_anon)
-    for value in np.unique(data_anon[sens_attr].values):
-        pk.append(len(data_anon[data_anon[sens_attr] == value]) / n_records)
-    return entropy(pk)
+    return sa_entropies(data_anon, [sens_attr], weights=weights)[sens_attr]
+
+
+def sa_entropies(
+    data_anon: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    sens_att: typing.Union[typing.List, np.ndarray],
+    n_jobs: int = 1,
+    weights: typing.Optional[str] = None,
+) -> dict:
+    """Calculate Shannon Entropy for several sensitive attributes.
+
+    The entropy is obtained from the frequency of each value, which can be
+    accumulated over an iterable of dataframes (chunks).
+
+    :param data_anon: dataframe with the data anonymized, or iterable of
+        dataframes with chunks of the data.
+    :type data_anon: pandas dataframe or iterable of pandas dataframes
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param n_jobs: number of threads used to process the columns in parallel.
+    :type n_jobs: int
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :return: Shannon entropy for each sensitive attribute.
+    :rtype: dict
+    """
+    if isinstance(data_anon, pd.DataFrame):
+        aux_functions.check_sa(data_anon, sens_att)
+    accumulators = _accumulate_columns(
+        data_anon, sens_att, n_jobs, moments=False, weights=weights
+    )
+    entropies = {}
+    for sa, acc in accumulators.items():
+        freq = acc.freq if acc.freq is not None else pd.Series(dtype=np.int64)
+        counts = freq[freq.index.notna()].to_numpy()
+        entropy = aux_anonymity.grouped_entropy(
+            np.zeros(len(counts), dtype=np.int64), counts, 1
+        )
+        entropies[sa] = float(entropy[0])
+    return entropies
+
+
+def ec_sa_entropies(
+    data_anon: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
+) -> dict:
+    """Calculate Shannon Entropy of several SA in each equivalence class.
+
+    :param data_anon: dataframe with the data anonymized.
+    :type data_anon: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+            that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :return: for each sensitive attribute, array with the entropy in each
+        equivalence class.
+    :rtype: dict
+    """
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, sens_att, weights)
+    return {sa: aux_anonymity.ec_entropy(equiv, sa) for sa in sens_att}
@@ -21,7 +21,9 @@ from pycanon.anonymity.utils import aux_anonymity, aux_functions
 
 
 def average_rir(
-    data_anon: pd.DataFrame, quasi_ident: typing.Union[typing.List, np.ndarray]
+    data_anon: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
 ) -> float:
     """Calculate the average re-identification risk metric.
 
@@ -32,17 +34,25 @@ def average_rir(
             that are quasi-identifiers.
     :type quasi_ident: list of strings
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
     :return: average re-identification risk.
     :rtype: float
     """
-    aux_functions.check_qi(data_anon, quasi_ident)
-    equiv_class = aux_anonymity.get_equiv_class(data_anon, quasi_ident)
-    avg_rir = np.mean([1 / len(ec) for ec in equiv_class])
+    sizes = aux_anonymity.get_equiv_classes(
+        data_anon, quasi_ident, weights=weights
+    ).sizes
+    avg_rir = np.mean(1 / sizes)
     return avg_rir
 
 
 def max_rir(
-    data_anon: pd.DataFrame, quasi_ident: typing.Union[typing.List, np.ndarray]
+    data_anon: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
 ) -> float:
     """Calculate the maximum re-identification risk (worst case).
 
@@ -53,10 +63,209 @@ def max_rir(
             that are quasi-identifiers.
     :type quasi_ident: list of strings
 
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
     :return: maximum re-identification risk.
     :rtype: float
     """
-    aux_functions.check_qi(data_anon, quasi_ident)
-    equiv_class = aux_anonymity.get_equiv_class(data_anon, quasi_ident)
-    min_ec = min([len(ec) for ec in equiv_class])
+    sizes = aux_anonymity.get_equiv_classes(
+        data_anon, quasi_ident, weights=weights
+    ).sizes
+    min_ec = int(min(sizes))
     return 1 / min_ec
+
+
+def _population_sizes(
+    equiv: aux_anonymity.EquivClasses,
+    population: pd.DataFrame,
+    weights: typing.Optional[str] = None,
+) -> np.ndarray:
+    """Size in the population of the equivalence class of each record."""
+    aux_functions.check_qi(population, equiv.quasi_ident)
+    pop_weights = (
+        None if weights is None else aux_functions.check_weights(population, weights)
+    )
+    keys, pop_keys = aux_anonymity.get_common_codes(
+        [equiv.data, population], equiv.quasi_ident
+    )
+    mask = equiv.codes >= 0
+    ec_keys = np.zeros(equiv.n_ec, dtype=np.int64)
+    ec_keys[equiv.codes[mask]] = keys[mask]
+    pop_codes, pop_uniques = pd.factorize(pop_keys)
+    pop_counts = aux_anonymity.get_equiv_class_sizes(pop_codes, pop_weights)
+    pop_counts = np.pad(pop_counts, (0, len(pop_uniques) - len(pop_counts)))
+    idx = pd.Index(pop_uniques).get_indexer(ec_keys)
+    # Classes not found in the population are at least as large as in the sample
+    ec_pop_sizes = np.where(idx >= 0, pop_counts[idx], 0)
+    return np.maximum(ec_pop_sizes, equiv.sizes)
+
+
+def _record_rir_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    population: typing.Optional[pd.DataFrame] = None,
+    weights: typing.Optional[str] = None,
+) -> np.ndarray:
+    if population is None:
+        sizes = equiv.sizes
+    else:
+        sizes = _population_sizes(equiv, population, weights)
+    risk = np.full(len(equiv.codes), np.nan)
+    mask = equiv.codes >= 0
+    risk[mask] = 1 / sizes[equiv.codes[mask]]
+    return risk
+
+
+def record_rir(
+    data_anon: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    population: typing.Optional[pd.DataFrame] = None,
+    weights: typing.Optional[str] = None,
+) -> np.ndarray:
+    """Calculate the re-identification risk of each record.
+
+    Without a population the prosecutor risk is returned (1 over the size of
+    the equivalence class of the record). If a population is given, the
+    journalist risk is returned instead (1 over the number of individuals of
+    the population sharing the values of the QI of the record).
+
+    :param data_anon: dataframe with the data anonymized.
+    :type data_anon: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+            that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param population: dataframe with the population from which the data was
+        sampled, containing (at least) the quasi-identifiers.
+    :type population: pandas dataframe
+
+    :param weights: name of the column with the number of records
+        represented by each row, in the data and in the population (e.g.
+        for pre-aggregated data). If None, each row is a record.
+    :type weights: string
+
+    :return: re-identification risk of each record (row), aligned with the
+        rows of data_anon.
+    :rtype: numpy array of floats
+    """
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, weights=weights)
+    return _record_rir_equiv(equiv, population, weights)
+
+
+def rir_summary(
+    data_anon: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    population: typing.Optional[pd.DataFrame] = None,
+    weights: typing.Optional[str] = None,
+) -> dict:
+    """Calculate the re-identification risk metrics from a single grouping.
+
+    :param data_anon: dataframe with the data anonymized.
+    :type data_anon: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+            that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param population: dataframe with the population from which the data was
+        sampled, containing (at least) the quasi-identifiers. If given, the
+        journalist risk is also calculated and the marketer risk is
+        calculated with respect to the population.
+    :type population: pandas dataframe
+
+    :param weights: name of the column with the number of records
+        represented by each row, in the data and in the population (e.g.
+        for pre-aggregated data). If None, each row is a record.
+    :type weights: string
+
+    :return: average and maximum (prosecutor) re-identification risk, marketer
+        risk (expected proportion of records re-identified, i.e. the mean of
+        the risk of each record) and, if a population is given, maximum
+        journalist risk.
+    :rtype: dict
+    """
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, weights=weights)
+    summary = {
+        "average_rir": np.mean(1 / equiv.sizes),
+        "max_rir": 1 / int(min(equiv.sizes)),
+    }
+    if population is None:
+        summary["marketer_rir"] = equiv.n_ec / equiv.n_records
+    else:
+        risk = _record_rir_equiv(equiv, population, weights)
+        expected = risk if equiv.weights is None else risk * equiv.weights
+        summary["marketer_rir"] = np.nansum(expected) / equiv.n_records
+        summary["journalist_max_rir"] = np.nanmax(risk)
+    return summary
+
+
+def linkage_attack(
+    data_anon: pd.DataFrame,
+    external: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+) -> dict:
+    """Simulate a linkage attack against an external identified dataset.
+
+    Each record of the anonymized data is linked to the records of the
+    external data sharing the values of its quasi-identifiers. The values of
+    the external data are encoded with the dictionary of the anonymized data
+    and joined on the integer codes of the QI, so the external data can be
+    given as an iterable of dataframes (chunks) and processed one chunk at a
+    time.
+
+    :param data_anon: dataframe with the data anonymized.
+    :type data_anon: pandas dataframe
+
+    :param external: dataframe with the external (identified) data, containing
+        the quasi-identifiers, or iterable of dataframes with chunks of it.
+    :type external: pandas dataframe or iterable of pandas dataframes
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+            that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :return: number of external records matching each anonymized record
+        ("match_count"), probability of a correct match for each record
+        ("match_probability"), number of anonymized records for each number of
+        matches ("match_count_distribution"), number of records with a single
+        match ("unique_matches") and expected number of records re-identified
+        ("expected_reidentifications").
+    :rtype: dict
+    """
+    if isinstance(quasi_ident, np.ndarray):
+        quasi_ident = quasi_ident.tolist()
+    aux_functions.check_qi(data_anon, quasi_ident)
+    equiv = aux_anonymity.EquivClasses(data_anon, quasi_ident)
+    dictionaries, ec_codes = [], []
+    for qi in quasi_ident:
+        codes, uniques = pd.factorize(data_anon[qi])
+        dictionaries.append(pd.Index(uniques))
+        ec_codes.append(codes[equiv.first])
+    ec_keys = pd.MultiIndex.from_arrays(ec_codes)
+
+    chunks = [external] if isinstance(external, pd.DataFrame) else external
+    ec_matches = np.zeros(equiv.n_ec, dtype=np.int64)
+    for chunk in chunks:
+        aux_functions.check_qi(chunk, quasi_ident)
+        codes = [d.get_indexer(chunk[qi]) for d, qi in zip(dictionaries, quasi_ident)]
+        valid = np.logical_and.reduce([c >= 0 for c in codes])
+        keys = pd.MultiIndex.from_arrays([c[valid] for c in codes])
+        idx = ec_keys.get_indexer(keys)
+        ec_matches += np.bincount(idx[idx >= 0], minlength=equiv.n_ec)
+
+    mask = equiv.codes >= 0
+    match_count = np.zeros(len(data_anon), dtype=np.int64)
+    match_count[mask] = ec_matches[equiv.codes[mask]]
+    match_probability = np.zeros(len(data_anon))
+    matched = match_count > 0
+    match_probability[matched] = 1 / match_count[matched]
+    return {
+        "match_count": match_count,
+        "match_probability": match_probability,
+        "match_count_distribution": pd.Series(match_count).value_counts().sort_index(),
+        "unique_matches": int(np.sum(match_count == 1)),
+        "expected_reidentifications": float(np.sum(match_probability)),
+    }
@@ -17,8 +17,65 @@
 import typing
 import numpy as np
 import pandas as pd
-from pycanon import anonymity
-from pycanon.anonymity.utils import aux_anonymity
+from pycanon.anonymity.utils import aux_anonymity, aux_functions
+
+
+def _n_records(data: pd.DataFrame, weights: typing.Optional[str] = None) -> int:
+    if weights is None:
+        return len(data)
+    return int(aux_functions.check_weights(data, weights).sum())
+
+
+def _integral(value: typing.Any, sizes: np.ndarray) -> typing.Union[int, float]:
+    """Convert a sum over the classes to int, unless the weights are fractional."""
+    if np.issubdtype(sizes.dtype, np.integer):
+        return int(value)
+    return float(value)
+
+
+def _average_ecsize(n_records: int, sizes: np.ndarray) -> float:
+    return float(n_records / (len(sizes) * sizes.min()))
+
+
+def _classification_metric(
+    n_raw: int, n_anon: int, sizes: np.ndarray, penalty: np.ndarray
+) -> float:
+    cm = n_raw - n_anon + _integral(np.sum(penalty), sizes)
+    return cm / n_raw
+
+
+def _ec_penalty(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+) -> np.ndarray:
+    """Count the values of the SA that are not the most frequent in each class.
+
+    The values of all the SA are pooled, and all the values tied as the most
+    frequent one are not penalized.
+    """
+    counts = [equiv.sa_counts(sa) for sa in sens_att]
+    values = pd.Index(np.concatenate([c.values for c in counts])).unique()
+    m = max(len(values), 1)
+    pairs = np.concatenate(
+        [c.ec * m + values.get_indexer(c.values)[c.value] for c in counts]
+    )
+    pairs, inverse = np.unique(pairs, return_inverse=True)
+    count = np.bincount(inverse, weights=np.concatenate([c.count for c in counts]))
+    ec = pairs // m
+    max_count = np.zeros(equiv.n_ec)
+    np.maximum.at(max_count, ec, count)
+    penalized = count != max_count[ec]
+    return np.bincount(ec[penalized], count[penalized], minlength=equiv.n_ec)
+
+
+def _discernability_metric(
+    n_raw: int, n_anon: int, sizes: np.ndarray
+) -> typing.Union[int, float]:
+    if np.issubdtype(sizes.dtype, np.integer):
+        sizes = sizes.astype(np.int64)
+    dm = _integral(np.sum(sizes**2), sizes)
+    dm += (n_raw - n_anon) * n_raw
+    return dm
 
 
 def average_ecsize(
@@ -26,6 +83,7 @@ def average_ecsize(
     data_anon: pd.DataFrame,
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sup=True,
+    weights: typing.Optional[str] = None,
 ) -> float:
     """Calculate the metric average equivalence class size.
 
@@ -43,14 +101,18 @@ def average_ecsize(
         original dataset (some records may have been deleted).
     :type  sup: boolean
 
+    :param weights: name of the column with the number of records
+        represented by each row, in both datasets (e.g. for pre-aggregated
+        data). If None, each row is a record.
+    :type weights: string
+
     :return: average equivalence class size.
     :rtype: float
     """
-    equiv_class = aux_anonymity.get_equiv_class(data_anon, quasi_ident)
-    k = anonymity.k_anonymity(data_anon, quasi_ident)
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, weights=weights)
     if sup:
-        return len(data_anon) / (len(equiv_class) * k)
-    return len(data_raw) / (len(equiv_class) * k)
+        return _average_ecsize(equiv.n_records, equiv.sizes)
+    return _average_ecsize(_n_records(data_raw, weights), equiv.sizes)
 
 
 def classification_metric(
@@ -58,9 +120,14 @@ def classification_metric(
     data_anon: pd.DataFrame,
     quasi_ident: typing.Union[typing.List, np.ndarray],
     sens_att: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
 ) -> float:
     """Calculate the classification metric.
 
+    In each equivalence class, the values of the sensitive attributes
+    (pooled) that are not the most frequent one are penalized, as well as
+    each suppressed record.
+
     :param data_raw: dataframe with the data raw under study.
     :type data_raw: pandas dataframe
 
@@ -75,24 +142,25 @@ def classification_metric(
         that are the sensitive attributes.
     :type sens_att: list of strings
 
+    :param weights: name of the column with the number of records
+        represented by each row, in both datasets (e.g. for pre-aggregated
+        data). If None, each row is a record.
+    :type weights: string
+
     :return: classification metric.
     :rtype: float
     """
-    equiv_class = aux_anonymity.get_equiv_class(data_anon, quasi_ident)
-    cm = len(data_raw) - len(data_anon)
-    for ec in equiv_class:
-        sa_ec = data_anon.iloc[ec, :][sens_att].values
-        _, counts = np.unique(sa_ec, return_counts=True)
-        for i in counts:
-            if i != max(counts):
-                cm += i
-    return cm / len(data_raw)
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, sens_att, weights)
+    penalty = _ec_penalty(equiv, sens_att)
+    n_raw = _n_records(data_raw, weights)
+    return _classification_metric(n_raw, equiv.n_records, equiv.sizes, penalty)
 
 
 def discernability_metric(
     data_raw: pd.DataFrame,
     data_anon: pd.DataFrame,
     quasi_ident: typing.Union[typing.List, np.ndarray],
+    weights: typing.Optional[str] = None,
 ) -> float:
     """Calculate the discernability metric.
 
@@ -108,11 +176,71 @@ def discernability_metric(
                 that are quasi-identifiers.
     :type quasi_ident: list of strings
 
+    :param weights: name of the column with the number of records
+        represented by each row, in both datasets (e.g. for pre-aggregated
+        data). If None, each row is a record.
+    :type weights: string
+
     :return: discernability metric.
     :rtype: float
     """
-    equiv_class = aux_anonymity.get_equiv_class(data_anon, quasi_ident)
-    dm = sum(len(ec) ** 2 for ec in equiv_class)
-    supp_rec = len(data_raw) - len(data_anon)
-    dm += supp_rec * len(data_raw)
-    return dm
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, weights=weights)
+    n_raw = _n_records(data_raw, weights)
+    return _discernability_metric(n_raw, equiv.n_records, equiv.sizes)
+
+
+def utility_metrics(
+    data_raw: pd.DataFrame,
+    data_anon: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray],
+    sup=True,
+    weights: typing.Optional[str] = None,
+) -> dict:
+    """Calculate all the utility metrics grouping the anonymized data only once.
+
+    :param data_raw: dataframe with the data raw under study.
+    :type data_raw: pandas dataframe
+
+    :param data_anon: dataframe with the data anonymized.
+    :type data_anon: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+            that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param sup: boolean, default to True. If true, suppression has been applied to the
+        original dataset (some records may have been deleted).
+    :type  sup: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row, in both datasets (e.g. for pre-aggregated
+        data). If None, each row is a record.
+    :type weights: string
+
+    :return: average equivalence class size, classification metric and
+        discernability metric.
+    :rtype: dict
+    """
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, sens_att, weights)
+    return _utility_metrics_equiv(equiv, _n_records(data_raw, weights), sens_att, sup)
+
+
+def _utility_metrics_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    n_raw: int,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    sup=True,
+) -> dict:
+    sizes = equiv.sizes
+    penalty = _ec_penalty(equiv, sens_att)
+    n_anon = equiv.n_records
+    return {
+        "average_ecsize": _average_ecsize(n_anon if sup else n_raw, sizes),
+        "classification_metric": _classification_metric(n_raw, n_anon, sizes, penalty),
+        "discernability_metric": _discernability_metric(n_raw, n_anon, sizes),
+    }
@@ -18,12 +18,17 @@
 
 import pandas as pd
 
-from pycanon.report.base import get_report_values  # noqa(F401)
-from pycanon.report.json import get_json_report  # noqa(F401)
+from pycanon.report.approximate import get_approximate_report_values  # noqa: F401
+from pycanon.report.base import get_anonymity_utility_values  # noqa: F401
+from pycanon.report.base import get_report_values  # noqa: F401
+from pycanon.report.json import get_json_report  # noqa: F401
+from pycanon.report.json import get_json_utility_report  # noqa: F401
+from pycanon.report.planner import evaluate_models  # noqa: F401
+from pycanon.report.planner import explain  # noqa: F401
 
 try:
-    from pycanon.report.pdf import get_pdf_report  # noqa(F401)
-    from pycanon.report.pdf_utility_report import get_pdf_utility_report  # noqa(F401)
+    from pycanon.report.pdf import get_pdf_report  # noqa: F401
+    from pycanon.report.pdf_utility_report import get_pdf_utility_report  # noqa: F401
 except ImportError:
     __all_pdf__ = []
 else:
@@ -32,6 +37,15 @@ else:
         "get_pdf_utility_report",
     ]
 
+try:
+    from pycanon.report.export import export_equiv_classes  # noqa: F401
+except ImportError:
+    __all_export__ = []
+else:
+    __all_export__ = [
+        "export_equiv_classes",
+    ]
+
 
 def print_report(
     data: pd.DataFrame, quasi_ident: list, sens_att: list, gen=True
@@ -80,5 +94,11 @@ def print_report(
 __all__ = [
     "print_report",
     "get_json_report",
+    "get_json_utility_report",
     "get_report_values",
+    "get_approximate_report_values",
+    "get_anonymity_utility_values",
+    "evaluate_models",
+    "explain",
 ] + __all_pdf__
+__all__ += __all_export__
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Get approximate report values evaluated over a random sample of the data.
+
+The privacy models are evaluated with the same functions as in
+get_report_values over a Bernoulli or stratified sample, in which each
+record is weighted by the inverse of its inclusion probability. The
+confidence intervals are obtained with a Poisson bootstrap of the sample.
+"""
+
+import typing
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from pycanon.anonymity.utils import aux_anonymity
+from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_sql
+from pycanon.metrics import _bootstrap
+from pycanon.report import base
+
+METHODS = ["bernoulli", "stratified"]
+COUNT_COLUMN = "_pycanon_count"
+DESIGN_COLUMN = "_pycanon_design_weight"
+
+
+def sample_data(
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    columns: typing.Union[typing.List, np.ndarray],
+    fraction: float,
+    method: str = "bernoulli",
+    strata: typing.Union[typing.List, np.ndarray, None] = None,
+    seed: typing.Union[int, np.random.Generator, None] = None,
+    weights: typing.Optional[str] = None,
+) -> typing.Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """Draw a reproducible random sample of the records of the dataset.
+
+    With the Bernoulli method each record is included independently with
+    probability fraction, so the data can be given in chunks. With the
+    stratified method, a fraction of the records of each stratum (at least
+    one) is drawn without replacement.
+
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table) or iterable of dataframes
+        with chunks of the data (only with the Bernoulli method).
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, or iterable of pandas dataframes
+
+    :param columns: list with the name of the columns to be kept.
+    :type columns: list of strings
+
+    :param fraction: sampling fraction, between 0 and 1.
+    :type fraction: float
+
+    :param method: sampling method, "bernoulli" or "stratified". Default to
+        "bernoulli".
+    :type method: string
+
+    :param strata: list with the name of the columns that define the strata
+        (needed with the stratified method).
+    :type strata: list of strings
+
+    :param seed: seed (or generator) of the random numbers.
+    :type seed: int or numpy Generator
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data), only with the
+        Bernoulli method. If None, each row is a record.
+    :type weights: string
+
+    :return: distinct combinations of values of the columns in the sample,
+        number of sampled records with each of them and inverse of their
+        inclusion probability.
+    :rtype: pandas dataframe, numpy array of ints and numpy array of floats.
+    """
+    if not 0 < fraction <= 1:
+        raise ValueError(f"The sampling fraction must be in (0, 1]: {fraction}")
+    if method not in METHODS:
+        raise ValueError(f"Unknown sampling method: {method}. Use one of {METHODS}")
+    if isinstance(data, aux_sql.SQLTable):
+        raise ValueError("Tables of a SQL database cannot be sampled.")
+    columns = list(dict.fromkeys(np.asarray(columns).tolist()))
+    rng = np.random.default_rng(seed)
+    if aux_functions.is_arrow_like(data):
+        extra = [] if strata is None else list(strata)
+        extra += [] if weights is None else [weights]
+        data = aux_functions.from_arrow(data, list(dict.fromkeys(columns + extra)))
+
+    if method == "bernoulli":
+        chunks = [data] if isinstance(data, pd.DataFrame) else data
+        sampled = _bernoulli_chunks(chunks, columns, fraction, rng, weights)
+        design = 1 / fraction
+    else:
+        if not isinstance(data, pd.DataFrame):
+            raise ValueError("The stratified method needs a dataframe.")
+        if strata is None or len(strata) == 0:
+            raise ValueError("The strata are needed for the stratified method.")
+        if weights is not None:
+            raise ValueError("Weights are only supported with the Bernoulli method.")
+        aux_functions.check_qi(data, columns + list(strata))
+        sampled = [_stratified_sample(data, columns, list(strata), fraction, rng)]
+        design = None
+
+    sample, counts = aux_anonymity.aggregate_chunks(
+        sampled, columns + [DESIGN_COLUMN], weights=COUNT_COLUMN
+    )
+    if len(sample) == 0:
+        raise ValueError("The sample is empty, increase the sampling fraction.")
+    design_weights = sample.pop(DESIGN_COLUMN).to_numpy(dtype=np.float64)
+    if design is not None:
+        design_weights = np.full(len(sample), design)
+    return sample, counts, design_weights
+
+
+def _bernoulli_chunks(
+    chunks: typing.Iterable[pd.DataFrame],
+    columns: list,
+    fraction: float,
+    rng: np.random.Generator,
+    weights: typing.Optional[str],
+) -> typing.Iterator[pd.DataFrame]:
+    for chunk in chunks:
+        aux_functions.check_qi(chunk, columns)
+        if weights is None:
+            counts = (rng.random(len(chunk)) < fraction).astype(np.int64)
+        else:
+            counts = rng.binomial(aux_functions.check_weights(chunk, weights), fraction)
+        mask = counts > 0
+        yield chunk.loc[mask, columns].assign(
+            **{COUNT_COLUMN: counts[mask], DESIGN_COLUMN: 1 / fraction}
+        )
+
+
+def _stratified_sample(
+    data: pd.DataFrame,
+    columns: list,
+    strata: list,
+    fraction: float,
+    rng: np.random.Generator,
+) -> pd.DataFrame:
+    codes = (
+        data.groupby(by=strata, dropna=False, observed=True)
+        .ngroup()
+        .to_numpy(dtype=np.int64)
+    )
+    sizes = np.bincount(codes)
+    n_sample = np.maximum(np.rint(sizes * fraction), 1).astype(np.int64)
+    # random order within each stratum, the first n_sample records are drawn
+    order = np.lexsort((rng.random(len(codes)), codes))
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    rank = np.arange(len(codes)) - offsets[codes[order]]
+    selected = np.sort(order[rank < n_sample[codes[order]]])
+    design = sizes / n_sample
+    return data.iloc[selected][columns].assign(
+        **{COUNT_COLUMN: 1, DESIGN_COLUMN: design[codes[selected]]}
+    )
+
+
+def get_approximate_report_values(
+    data: typing.Union[pd.DataFrame, typing.Iterable[pd.DataFrame]],
+    quasi_ident: list,
+    sens_att: list,
+    fraction: float = 0.01,
+    method: str = "bernoulli",
+    strata: typing.Union[typing.List, np.ndarray, None] = None,
+    k: typing.Optional[int] = None,
+    confidence: float = 0.95,
+    n_replicates: int = 50,
+    seed: typing.Optional[int] = None,
+    gen=True,
+    weights: typing.Optional[str] = None,
+) -> dict:
+    """Estimate the parameters of each anonymity check from a random sample.
+
+    The models are evaluated over the sample, weighting each record by the
+    inverse of its inclusion probability, and their confidence intervals are
+    obtained with a Poisson bootstrap of the sampled records. The size of
+    each equivalence class in the sample is extrapolated with an exact
+    binomial interval, and the number of classes and population uniques not
+    seen in the sample are estimated from the number of classes with one and
+    two sampled records (Chao1 and Skinner-Elliot estimators). Note that the
+    values of l and the number of equivalence classes in the sample are lower
+    bounds of the ones of the whole dataset.
+
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table) or iterable of dataframes
+        with chunks of the data (only with the Bernoulli method).
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, or iterable of pandas dataframes
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param fraction: sampling fraction, between 0 and 1. Default to 0.01.
+    :type fraction: float
+
+    :param method: sampling method, "bernoulli" or "stratified". Default to
+        "bernoulli".
+    :type method: string
+
+    :param strata: list with the name of the columns that define the strata
+        (needed with the stratified method).
+    :type strata: list of strings
+
+    :param k: if given, the equivalence classes that might have less than k
+        records (the lower bound of their size is below k) are returned.
+    :type k: int
+
+    :param confidence: confidence level of the intervals. Default to 0.95.
+    :type confidence: float
+
+    :param n_replicates: number of bootstrap replicates. Default to 50.
+    :type n_replicates: int
+
+    :param seed: seed of the random numbers, for reproducible results.
+    :type seed: int
+
+    :param gen: default to true. If true it is generalized for the case of
+        multiple SA, if False, the set of QI is updated for each SA.
+    :type gen: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data), only with the
+        Bernoulli method. If None, each row is a record.
+    :type weights: string
+
+    :return: for each model (with the keys of get_json_report), estimate
+        and confidence interval of its parameters, together with a summary
+        of the sample and the equivalence classes and, if k is given, the
+        classes that might not verify k-anonymity.
+    :rtype: dict
+    """
+    if not 0 < confidence < 1:
+        raise ValueError(f"The confidence must be in (0, 1): {confidence}")
+    quasi_ident = list(quasi_ident)
+    sens_att = list(sens_att)
+    rng = np.random.default_rng(seed)
+    sample, counts, design = sample_data(
+        data, quasi_ident + sens_att, fraction, method, strata, rng, weights
+    )
+    equiv = aux_anonymity.EquivClasses(sample, quasi_ident, design * counts)
+    estimate = _flatten(base._get_report_values_equiv(equiv, sens_att, gen))
+
+    replicates = []
+    for _ in range(n_replicates):
+        rep_counts = rng.poisson(counts)
+        mask = rep_counts > 0
+        rep_equiv = aux_anonymity.EquivClasses(
+            sample[mask].reset_index(drop=True),
+            quasi_ident,
+            design[mask] * rep_counts[mask],
+        )
+        replicates.append(
+            _flatten(base._get_report_values_equiv(rep_equiv, sens_att, gen))
+        )
+    intervals = _bootstrap.percentile_intervals(
+        np.array(replicates, dtype=np.float64).reshape(-1, len(estimate)), confidence
+    )
+
+    # extrapolated size of each equivalence class
+    sample_sizes = aux_anonymity.get_equiv_class_sizes(equiv.codes, counts)
+    alpha = 1 - confidence
+    # exact binomial interval, inverted with the negative binomial distribution
+    incl_prob = np.minimum(sample_sizes / equiv.sizes, 1)
+    size_low = sample_sizes + stats.nbinom.ppf(alpha / 2, sample_sizes, incl_prob)
+    size_high = sample_sizes + stats.nbinom.ppf(
+        1 - alpha / 2, sample_sizes + 1, incl_prob
+    )
+    k_estimate = float(equiv.sizes.min())
+    estimate[0] = estimate[2] = k_estimate
+    intervals[0] = intervals[2] = (float(size_low.min()), float(size_high.min()))
+
+    values = [
+        {"estimate": e, "ci": [lo, hi]} for e, (lo, hi) in zip(estimate, intervals)
+    ]
+    report = base._report_dict(quasi_ident, sens_att, _nest(values))
+    n_sample = int(counts.sum())
+    report["sample"] = {
+        "method": method,
+        "fraction": fraction,
+        "n_sample": n_sample,
+        "n_records": equiv.n_records,
+        "confidence": confidence,
+        "seed": seed,
+    }
+    report["equivalence_classes"] = _frequency_estimates(
+        sample_sizes, n_sample / equiv.n_records
+    )
+    if k is not None:
+        under_k = size_low < k
+        classes = sample.iloc[equiv.first[under_k]][quasi_ident]
+        classes = classes.reset_index(drop=True).assign(
+            sample_size=sample_sizes[under_k],
+            estimated_size=equiv.sizes[under_k],
+            ci_low=size_low[under_k],
+            ci_high=size_high[under_k],
+        )
+        report["classes_under_k"] = classes.sort_values(
+            "estimated_size", ignore_index=True
+        )
+        report["equivalence_classes"]["possibly_under_k"] = int(under_k.sum())
+    return report
+
+
+def _frequency_estimates(sample_sizes: np.ndarray, fraction: float) -> dict:
+    """Estimate the unseen classes from the classes with one and two records."""
+    n_ec = len(sample_sizes)
+    f1 = int(np.sum(sample_sizes == 1))
+    f2 = int(np.sum(sample_sizes == 2))
+    # Chao1 estimator of the number of classes, with the correction of Chao
+    # and Lin (2012) for the sampling fraction
+    if fraction >= 1 or f1 == 0:
+        unseen = 0.0
+    else:
+        unseen = f1**2 / (2 * f2 + fraction / (1 - fraction) * f1)
+    # Skinner-Elliot estimator of the probability of a sample unique being a
+    # population unique
+    if f1 > 0:
+        unique_prob = fraction * f1 / (fraction * f1 + 2 * (1 - fraction) * f2)
+    else:
+        unique_prob = 0.0
+    return {
+        "n_ec_sample": n_ec,
+        "n_ec_estimate": n_ec + unseen,
+        "sample_uniques": f1,
+        "sample_pairs": f2,
+        "population_uniques": f1 * unique_prob / fraction,
+        "unique_probability": unique_prob,
+    }
+
+
+def _flatten(values: tuple) -> list:
+    k_anon, (alpha, alpha_k), l_div, entropy_l, (c_div, l_c_div), *others = values
+    return [k_anon, alpha, alpha_k, l_div, entropy_l, c_div, l_c_div] + others
+
+
+def _nest(values: list) -> tuple:
+    k_anon, alpha, alpha_k, l_div, entropy_l, c_div, l_c_div, *others = values
+    return (k_anon, (alpha, alpha_k), l_div, entropy_l, (c_div, l_c_div), *others)
@@ -16,22 +16,45 @@
 
 """Get report values for all privacy models."""
 
-from typing import Tuple, Any
+from typing import Any, Iterable, Tuple, Union
 
+import numpy as np
 import pandas as pd
 
-from pycanon import anonymity
+from pycanon.anonymity._beta_likeness import _basic_beta_likeness_equiv
+from pycanon.anonymity._beta_likeness import _enhanced_beta_likeness_equiv
+from pycanon.anonymity._delta_disclosure import _delta_disclosure_equiv
+from pycanon.anonymity._k_anonymity import _alpha_k_anonymity_equiv
+from pycanon.anonymity._k_anonymity import _k_anonymity_equiv
+from pycanon.anonymity._l_diversity import _entropy_l_diversity_equiv
+from pycanon.anonymity._l_diversity import _l_diversity_equiv
+from pycanon.anonymity._l_diversity import _recursive_c_l_diversity_equiv
+from pycanon.anonymity._t_closeness import _t_closeness_equiv
+from pycanon.anonymity.utils import aux_anonymity
+from pycanon.anonymity.utils import aux_results
+from pycanon.metrics._attribute_statistics import _sizes_ec
+from pycanon.metrics._utility_metrics import _n_records
+from pycanon.metrics._utility_metrics import _utility_metrics_equiv
 
 
+@aux_results.cached
 def get_report_values(
-    data: pd.DataFrame, quasi_ident: list, sens_att: list, gen=True
+    data: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+    quasi_ident: list,
+    sens_att: list,
+    gen=True,
+    weights: Union[str, None] = None,
+    memory_limit: Union[int, str, None] = None,
 ) -> Tuple[
     int, Tuple[float, int], int, float, Tuple[Any, int], float, float, float, float
 ]:
     """Generate a report with the parameters obtained for each anonymity check.
 
-    :param data: dataframe with the data under study.
-    :type data: pandas dataframe
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, or table of a SQL database.
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes or aux_sql.SQLTable
 
     :param quasi_ident: list with the name of the columns of the dataframe
         that are quasi-identifiers.
@@ -44,16 +67,39 @@ def get_report_values(
     :param gen: default to true. If true it is generalized for the case of
         multiple SA, if False, the set of QI is updated for each SA.
     :type gen: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget for grouping the records, in bytes or
+        as a string with a unit (e.g. "512MB"). If it would be exceeded, the
+        records are grouped by partitions spilled to disk. If None (default),
+        they are grouped in memory.
+    :type memory_limit: int or string
     """
-    k_anon = anonymity.k_anonymity(data, quasi_ident)
-    alpha, alpha_k = anonymity.alpha_k_anonymity(data, quasi_ident, sens_att, gen)
-    l_div = anonymity.l_diversity(data, quasi_ident, sens_att, gen)
-    entropy_l = anonymity.entropy_l_diversity(data, quasi_ident, sens_att, gen)
-    c_div, l_c_div = anonymity.recursive_c_l_diversity(data, quasi_ident, sens_att, gen)
-    basic_beta = anonymity.basic_beta_likeness(data, quasi_ident, sens_att, gen)
-    enhanced_beta = anonymity.enhanced_beta_likeness(data, quasi_ident, sens_att, gen)
-    delta_disc = anonymity.delta_disclosure(data, quasi_ident, sens_att, gen)
-    t_clos = anonymity.t_closeness(data, quasi_ident, sens_att, gen)
+    equiv = aux_anonymity.get_equiv_classes(
+        data, quasi_ident, sens_att, weights, memory_limit
+    )
+    return _get_report_values_equiv(equiv, sens_att, gen)
+
+
+def _get_report_values_equiv(
+    equiv: aux_anonymity.EquivClasses, sens_att: list, gen=True
+) -> Tuple[
+    int, Tuple[float, int], int, float, Tuple[Any, int], float, float, float, float
+]:
+    sens_att = np.array(sens_att)
+    k_anon = _k_anonymity_equiv(equiv)
+    alpha, alpha_k = _alpha_k_anonymity_equiv(equiv, sens_att, gen)
+    l_div = _l_diversity_equiv(equiv, sens_att, gen)
+    entropy_l = _entropy_l_diversity_equiv(equiv, sens_att, gen)
+    c_div, l_c_div = _recursive_c_l_diversity_equiv(equiv, sens_att, gen=gen)
+    basic_beta = _basic_beta_likeness_equiv(equiv, sens_att, gen)
+    enhanced_beta = _enhanced_beta_likeness_equiv(equiv, sens_att, gen)
+    delta_disc = _delta_disclosure_equiv(equiv, sens_att, gen)
+    t_clos = _t_closeness_equiv(equiv, sens_att, gen)
 
     return (
         k_anon,
@@ -66,3 +112,85 @@ def get_report_values(
         delta_disc,
         t_clos,
     )
+
+
+def _report_dict(quasi_ident: list, sens_att: list, values: tuple) -> dict:
+    (
+        k_anon,
+        (alpha, alpha_k),
+        l_div,
+        entropy_l,
+        (c_div, l_c_div),
+        basic_beta,
+        enhanced_beta,
+        delta_disc,
+        t_clos,
+    ) = values
+    return {
+        "data": {"quasi-identifiers": quasi_ident, "sensitive attributes": sens_att},
+        "k_anonymity": {"k": k_anon},
+        "alpha_k_anonymity": {"alpha": alpha, "k": alpha_k},
+        "l_diversity": {"l": l_div},
+        "entropy_l_diversity": {"l": entropy_l},
+        "recursive_c_l_diversity": {"c": c_div, "l": l_c_div},
+        "basic_beta_likeness": {"beta": basic_beta},
+        "enhanced_beta_likeness": {"beta": enhanced_beta},
+        "t_closeness": {"t": t_clos},
+        "delta_disclosure": {"delta": delta_disc},
+    }
+
+
+def get_anonymity_utility_values(
+    data_raw: pd.DataFrame,
+    data_anon: pd.DataFrame,
+    quasi_ident: list,
+    sens_att: list,
+    sup=True,
+    gen=True,
+    weights: Union[str, None] = None,
+) -> dict:
+    """Evaluate the privacy models and the utility metrics of an anonymized dataset.
+
+    The anonymized data is grouped only once and the equivalence classes are
+    shared between the privacy models, the utility metrics and the statistics
+    of the equivalence classes.
+
+    :param data_raw: dataframe with the data raw under study.
+    :type data_raw: pandas dataframe
+
+    :param data_anon: dataframe with the data anonymized.
+    :type data_anon: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: is a list of strings
+
+    :param sup: boolean, default to True. If true, suppression has been applied to the
+        original dataset (some records may have been deleted).
+    :type  sup: boolean
+
+    :param gen: default to true. If true it is generalized for the case of
+        multiple SA, if False, the set of QI is updated for each SA.
+    :type gen: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row in both datasets. If None, each row is a
+        record.
+    :type weights: string
+
+    :return: values of each privacy model (with the same structure as the JSON
+        report), of the utility metrics ("utility") and statistics of the
+        equivalence classes ("equivalence_classes").
+    :rtype: dict
+    """
+    equiv = aux_anonymity.get_equiv_classes(data_anon, quasi_ident, sens_att, weights)
+    values = _get_report_values_equiv(equiv, sens_att, gen)
+    report = _report_dict(quasi_ident, sens_att, values)
+    n_raw = _n_records(data_raw, weights)
+    report["utility"] = _utility_metrics_equiv(equiv, n_raw, sens_att, sup)
+    report["equivalence_classes"] = _sizes_ec(equiv.sizes)
+    return report
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2026 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Export the values of the privacy models for each equivalence class."""
+
+import os
+import typing
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+import pyarrow.parquet
+
+from pycanon.anonymity.utils import aux_anonymity
+from pycanon.anonymity.utils import aux_functions
+
+_FORMATS = {
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+}
+
+
+def _ec_statistics(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+) -> typing.Dict[str, np.ndarray]:
+    columns = {"size": equiv.sizes}
+    for sa in sens_att:
+        columns[f"{sa}_l"] = aux_anonymity.ec_n_values(equiv, sa)
+        columns[f"{sa}_entropy"] = aux_anonymity.ec_entropy(equiv, sa)
+        columns[f"{sa}_beta"] = aux_anonymity.ec_beta(equiv, sa)
+        columns[f"{sa}_delta"] = aux_anonymity.ec_delta(equiv, sa)
+        columns[f"{sa}_t"] = aux_anonymity.ec_emd(equiv, sa)
+    return columns
+
+
+def _export_equiv_classes_equiv(
+    equiv: aux_anonymity.EquivClasses,
+    sens_att: typing.Union[typing.List, np.ndarray],
+    file_name: str,
+    file_format: str,
+    row_group_size: int,
+) -> None:
+    columns = _ec_statistics(equiv, sens_att)
+    writer: typing.Any = None
+    schema = None
+    try:
+        for start in range(0, max(equiv.n_ec, 1), row_group_size):
+            stop = min(start + row_group_size, equiv.n_ec)
+            block = equiv.data[equiv.quasi_ident].iloc[equiv.first[start:stop]]
+            block = block.reset_index(drop=True)
+            for name, values in columns.items():
+                block[name] = values[start:stop]
+            if writer is None:
+                batch = pa.RecordBatch.from_pandas(block, preserve_index=False)
+                schema = batch.schema
+                if file_format == "parquet":
+                    writer = pyarrow.parquet.ParquetWriter(file_name, batch.schema)
+                else:
+                    writer = pyarrow.ipc.new_file(file_name, batch.schema)
+            else:
+                batch = pa.RecordBatch.from_pandas(
+                    block, schema=schema, preserve_index=False
+                )
+            if file_format == "parquet":
+                writer.write_batch(batch, row_group_size=row_group_size)
+            else:
+                writer.write_batch(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export_equiv_classes(
+    data: pd.DataFrame,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray],
+    file_name: str,
+    file_format: typing.Optional[str] = None,
+    row_group_size: int = 65536,
+) -> None:
+    """Export the values of the privacy models for each equivalence class.
+
+    For each equivalence class the values of the quasi-identifiers, its size
+    and, for each sensitive attribute, l, entropy, beta distance, delta and
+    t (EMD) are written, one row per class. The file is written in row groups
+    (record batches), so only one group of classes is converted at a time.
+
+    :param data: dataframe with the data under study.
+    :type data: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: is a list of strings
+
+    :param file_name: name of the output file.
+    :type file_name: string
+
+    :param file_format: "parquet" or "arrow" (Arrow IPC file). By default it is
+        obtained from the extension of file_name (.parquet, .arrow, .feather or
+        .ipc).
+    :type file_format: string
+
+    :param row_group_size: number of equivalence classes in each row group.
+        Default to 65536.
+    :type row_group_size: int
+    """
+    if file_format is None:
+        _, file_extension = os.path.splitext(file_name)
+        if file_extension not in _FORMATS:
+            raise ValueError(
+                "Invalid file extension. Expected one of "
+                f"{list(_FORMATS)} or an explicit file_format"
+            )
+        file_format = _FORMATS[file_extension]
+    if file_format not in ("parquet", "arrow"):
+        raise ValueError("Invalid file format. Expected 'parquet' or 'arrow'")
+    aux_functions.check_qi(data, quasi_ident)
+    aux_functions.check_sa(data, sens_att)
+    equiv = aux_anonymity.EquivClasses(data, quasi_ident)
+    _export_equiv_classes_equiv(equiv, sens_att, file_name, file_format, row_group_size)
@@ -37,7 +37,11 @@ class _NpEncoder(json.JSONEncoder):
 
 
 def get_json_report(
-    data: pd.DataFrame, quasi_ident: list, sens_att: list, gen=True
+    data: pd.DataFrame,
+    quasi_ident: list,
+    sens_att: list,
+    gen=True,
+    weights: typing.Optional[str] = None,
 ) -> str:
     """Generate a report (JSON) with the parameters obtained for each anonymity check.
 
@@ -55,30 +59,61 @@ def get_json_report(
     :param gen: default to true. If true it is generalized for the case of
         multiple SA, if False, the set of QI is updated for each SA.
     :type gen: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
     """
-    (
-        k_anon,
-        (alpha, alpha_k),
-        l_div,
-        entropy_l,
-        (c_div, l_c_div),
-        basic_beta,
-        enhanced_beta,
-        delta_disc,
-        t_clos,
-    ) = base.get_report_values(data, quasi_ident, sens_att, gen=gen)
-
-    json_data: typing.Dict[str, typing.Any] = {
-        "data": {"quasi-identifiers": quasi_ident, "sensitive attributes": sens_att},
-        "k_anonymity": {"k": k_anon},
-        "alpha_k_anonymity": {"alpha": alpha, "k": alpha_k},
-        "l_diversity": {"l": l_div},
-        "entropy_l_diversity": {"l": entropy_l},
-        "recursive_c_l_diversity": {"c": c_div, "l": l_c_div},
-        "basic_beta_likeness": {"beta": basic_beta},
-        "enhanced_beta_likeness": {"beta": enhanced_beta},
-        "t_closeness": {"t": t_clos},
-        "delta_disclosure": {"delta": delta_disc},
-    }
+    values = base.get_report_values(
+        data, quasi_ident, sens_att, gen=gen, weights=weights
+    )
+    json_data: typing.Dict[str, typing.Any] = base._report_dict(
+        quasi_ident, sens_att, values
+    )
+
+    return json.dumps(json_data, cls=_NpEncoder)
+
+
+def get_json_utility_report(
+    data_raw: pd.DataFrame,
+    data_anon: pd.DataFrame,
+    quasi_ident: list,
+    sens_att: list,
+    sup=True,
+    gen=True,
+    weights: typing.Optional[str] = None,
+) -> str:
+    """Generate a report (JSON) both with the utility and anonymity checks.
+
+    :param data_raw: dataframe with the data raw under study.
+    :type data_raw: pandas dataframe
+
+    :param data_anon: dataframe with the data anonymized.
+    :type data_anon: pandas dataframe
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: is a list of strings
+
+    :param sup: boolean, default to True. If true, suppression has been applied to the
+        original dataset (some records may have been deleted).
+    :type  sup: boolean
 
+    :param gen: default to true. If true it is generalized for the case of
+        multiple SA, if False, the set of QI is updated for each SA.
+    :type gen: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row in both datasets. If None, each row is a
+        record.
+    :type weights: string
+    """
+    json_data = base.get_anonymity_utility_values(
+        data_raw, data_anon, quasi_ident, sens_att, sup=sup, gen=gen, weights=weights
+    )
     return json.dumps(json_data, cls=_NpEncoder)
@@ -21,7 +21,9 @@ import typing
 from datetime import datetime
 import numpy as np
 import pandas as pd
-from pycanon import metrics
+from pycanon.anonymity.utils import aux_anonymity
+from pycanon.metrics._attribute_statistics import _sizes_ec
+from pycanon.metrics._utility_metrics import _utility_metrics_equiv
 from pycanon.report import base
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
@@ -57,11 +59,13 @@ def get_utility_report_values(
         original dataset (somo records may have been deleted)-
     :type  sup: boolean
     """
-    avg_ec = metrics.average_ecsize(data_raw, data_anon, quasi_ident, sup)
-    cm = metrics.classification_metric(data_raw, data_anon, quasi_ident, sens_att)
-    dm = metrics.discernability_metric(data_raw, data_anon, quasi_ident)
+    equiv = aux_anonymity.EquivClasses(data_anon, quasi_ident)
+    utility = _utility_metrics_equiv(equiv, len(data_raw), sens_att, sup)
+    avg_ec = utility["average_ecsize"]
+    cm = utility["classification_metric"]
+    dm = utility["discernability_metric"]
 
-    stats_ec = metrics.sizes_ec(data_anon, quasi_ident)
+    stats_ec = _sizes_ec(equiv.sizes)
 
     return avg_ec, cm, dm, stats_ec
 
@@ -103,25 +107,27 @@ def get_pdf_utility_report(
         'report.pdf'
     :type file_pdf: string with extension .pdf
     """
-    avg_ec, cm, dm, stats_ec = get_utility_report_values(
-        data_raw, data_anon, quasi_ident, sens_att, sup
-    )
-
-    (
-        k_anon,
-        (alpha, alpha_k),
-        l_div,
-        entropy_l,
-        (c_div, l_c_div),
-        basic_beta,
-        enhanced_beta,
-        delta_disc,
-        t_clos,
-    ) = base.get_report_values(data_anon, quasi_ident, sens_att, gen=True)
-
     _, file_extension = os.path.splitext(file_pdf)
     if file_extension != ".pdf":
         raise ValueError("Invalid file extension. Expected .pdf extension for file_pdf")
+
+    report = base.get_anonymity_utility_values(
+        data_raw, data_anon, quasi_ident, sens_att, sup=sup, gen=gen
+    )
+    k_anon = report["k_anonymity"]["k"]
+    alpha = report["alpha_k_anonymity"]["alpha"]
+    l_div = report["l_diversity"]["l"]
+    entropy_l = report["entropy_l_diversity"]["l"]
+    c_div = report["recursive_c_l_diversity"]["c"]
+    basic_beta = report["basic_beta_likeness"]["beta"]
+    enhanced_beta = report["enhanced_beta_likeness"]["beta"]
+    t_clos = report["t_closeness"]["t"]
+    delta_disc = report["delta_disclosure"]["delta"]
+    avg_ec = report["utility"]["average_ecsize"]
+    cm = report["utility"]["classification_metric"]
+    dm = report["utility"]["discernability_metric"]
+    stats_ec = report["equivalence_classes"]
+
     doc = SimpleDocTemplate(
         file_pdf,
         pagesize=A4,
@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2022 Spanish National Research Council (CSIC)
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Cost-based planning of the evaluation of several models over a dataset.
+
+The number of rows and the cardinality of the QI and SA (estimated from a
+sample of rows) are used to estimate the number of equivalence classes and
+the cost and memory of each way of grouping the records. The cheapest one
+within the memory budget is chosen (in memory, the records are sorted
+instead of hashed if the QI are almost unique or already sorted), the
+records are grouped once and the requested privacy models and metrics are
+evaluated over the same classes, in parallel threads if the estimated cost
+is high enough.
+"""
+
+import math
+import os
+import typing
+import warnings
+from concurrent import futures
+
+import numpy as np
+import pandas as pd
+import tabulate
+
+from pycanon.anonymity._beta_likeness import _basic_beta_likeness_equiv
+from pycanon.anonymity._beta_likeness import _enhanced_beta_likeness_equiv
+from pycanon.anonymity._delta_disclosure import _delta_disclosure_equiv
+from pycanon.anonymity._k_anonymity import _alpha_k_anonymity_equiv
+from pycanon.anonymity._k_anonymity import _k_anonymity_equiv
+from pycanon.anonymity._l_diversity import _entropy_l_diversity_equiv
+from pycanon.anonymity._l_diversity import _l_diversity_equiv
+from pycanon.anonymity._l_diversity import _recursive_c_l_diversity_equiv
+from pycanon.anonymity._t_closeness import _t_closeness_equiv
+from pycanon.anonymity.utils import aux_anonymity
+from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_sketch
+from pycanon.anonymity.utils import aux_spill
+from pycanon.anonymity.utils import aux_sql
+from pycanon.metrics import _bootstrap
+
+SAMPLE_ROWS = 10000
+# Relative cost of each grouping engine per row and column
+ENGINE_COSTS = {"memory": 1.0, "spill": 3.0, "sketch": 2.0}
+# Estimated cost of the models above which they are evaluated in threads
+PARALLEL_COST = 2**22
+
+
+def _k_anonymity(equiv: aux_anonymity.EquivClasses, sens_att: list, gen) -> int:
+    return _k_anonymity_equiv(equiv)
+
+
+def _recursive_c_l_diversity(
+    equiv: aux_anonymity.EquivClasses, sens_att: list, gen
+) -> typing.Tuple[float, int]:
+    return _recursive_c_l_diversity_equiv(equiv, sens_att, gen=gen)
+
+
+MODELS: typing.Dict[str, typing.Callable] = {
+    "k_anonymity": _k_anonymity,
+    "alpha_k_anonymity": _alpha_k_anonymity_equiv,
+    "l_diversity": _l_diversity_equiv,
+    "entropy_l_diversity": _entropy_l_diversity_equiv,
+    "recursive_c_l_diversity": _recursive_c_l_diversity,
+    "basic_beta_likeness": _basic_beta_likeness_equiv,
+    "enhanced_beta_likeness": _enhanced_beta_likeness_equiv,
+    "t_closeness": _t_closeness_equiv,
+    "delta_disclosure": _delta_disclosure_equiv,
+    "average_rir": _bootstrap.METRICS["average_rir"],
+    "max_rir": _bootstrap.METRICS["max_rir"],
+}
+REPORT_MODELS = [
+    "k_anonymity",
+    "alpha_k_anonymity",
+    "l_diversity",
+    "entropy_l_diversity",
+    "recursive_c_l_diversity",
+    "basic_beta_likeness",
+    "enhanced_beta_likeness",
+    "delta_disclosure",
+    "t_closeness",
+]
+SKETCH_MODELS = ["k_anonymity", "l_diversity"]
+SA_MODELS = [
+    name for name in MODELS if name not in ["k_anonymity", "average_rir", "max_rir"]
+]
+
+
+class Plan(typing.NamedTuple):
+    """Execution plan of the evaluation of several models.
+
+    The estimates are None when they cannot be known in advance (e.g. for
+    iterables of chunks or SQL tables). The grouping ("hash" or "sort", see
+    aux_anonymity.choose_grouping) is None if the records are not grouped in
+    memory.
+    """
+
+    source: str
+    engine: str
+    grouping: typing.Optional[str]
+    n_jobs: int
+    models: typing.List[str]
+    n_rows: typing.Optional[int]
+    cardinalities: typing.Dict[str, int]
+    n_classes: typing.Optional[int]
+    memory: typing.Optional[int]
+    cost: typing.Optional[float]
+    steps: typing.List[typing.Tuple[str, typing.Optional[float]]]
+
+
+def plan_evaluation(
+    data: typing.Any,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+    models: typing.Union[str, typing.List[str], None] = None,
+    gen=True,
+    memory_limit: typing.Union[int, str, None] = None,
+    n_jobs: typing.Optional[int] = None,
+    exact: bool = True,
+) -> Plan:
+    """Choose how to evaluate the given models over the data.
+
+    :param data: dataframe with the data under study, Arrow-compatible table
+        (e.g. polars dataframe or pyarrow table), iterable of dataframes with
+        chunks of the data, table of a SQL database, or equivalence classes
+        already built (e.g. aux_index.EquivIndex).
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes, aux_sql.SQLTable or
+        aux_anonymity.EquivClasses
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param models: name of the models and metrics to be evaluated (see
+        MODELS). If None, all the models that can be evaluated with the
+        given SA.
+    :type models: string or list of strings
+
+    :param gen: default to true. If true it is generalized for the case of
+        multiple SA, if False, the set of QI is updated for each SA.
+    :type gen: boolean
+
+    :param memory_limit: memory budget, in bytes or as a string with a unit
+        (e.g. "512MB"). If None, the records are grouped in memory.
+    :type memory_limit: int or string
+
+    :param n_jobs: number of threads used to evaluate the models. If None,
+        it is chosen from the estimated cost.
+    :type n_jobs: int
+
+    :param exact: whether only exact results are allowed. If False, k and l
+        can be estimated with a sketch when the budget is too small. The
+        estimates are upper estimates, which can exceed the true values.
+    :type exact: boolean
+
+    :return: the execution plan.
+    :rtype: Plan
+    """
+    quasi_ident = list(np.asarray(quasi_ident).tolist())
+    sens_att = [] if sens_att is None else list(np.asarray(sens_att).tolist())
+    models = _check_models(models, sens_att)
+    grouping = None
+    limit = None
+    if memory_limit is not None:
+        limit = aux_spill.parse_memory_limit(memory_limit)
+    columns = list(dict.fromkeys(quasi_ident + sens_att))
+
+    if isinstance(data, aux_anonymity.EquivClasses):
+        source, engine = "classes", "prebuilt"
+        data.check_columns(quasi_ident, sens_att)
+        n_rows = data.n_records
+        cardinalities = {sa: len(data.sa_counts(sa).values) for sa in sens_att}
+        n_classes = data.n_ec
+    elif isinstance(data, aux_sql.SQLTable):
+        source, engine = "sql", "database"
+        n_rows, cardinalities, n_classes = None, {}, None
+    elif isinstance(data, pd.DataFrame) or aux_functions.is_arrow_like(data):
+        source = "dataframe" if isinstance(data, pd.DataFrame) else "arrow"
+        if source == "arrow":
+            data = aux_functions.from_arrow(data, columns)
+        n_rows = len(data)
+        cardinalities, n_classes = _estimate_cardinalities(data, quasi_ident, sens_att)
+        engine = "memory"
+        grouping = aux_anonymity.choose_grouping(data, quasi_ident)
+        needed = aux_spill.estimate_memory(n_rows, len(columns))
+        if limit is not None and needed > limit:
+            sketch = not exact and set(models) <= set(SKETCH_MODELS)
+            engine = "sketch" if sketch and (gen or len(sens_att) <= 1) else "spill"
+            grouping = None
+    else:
+        source = "chunks"
+        engine = "chunks" if limit is None else "spill"
+        n_rows, cardinalities, n_classes = None, {}, None
+
+    steps = _estimate_steps(
+        engine,
+        grouping,
+        models,
+        n_rows,
+        cardinalities,
+        n_classes,
+        quasi_ident,
+        sens_att,
+        gen,
+    )
+    model_cost = sum(cost or 0 for step, cost in steps[1:])
+    if n_jobs is None:
+        n_jobs = 1
+        if len(models) > 1 and model_cost > PARALLEL_COST and engine != "sketch":
+            n_jobs = min(len(models), os.cpu_count() or 1)
+    memory = None
+    if n_rows is not None and engine != "prebuilt":
+        memory = aux_spill.estimate_memory(n_rows, len(columns))
+        if limit is not None and engine in ["spill", "sketch"]:
+            memory = limit
+    cost = None
+    if all(cost is not None for _, cost in steps):
+        cost = float(sum(cost for _, cost in steps))
+    return Plan(
+        source,
+        engine,
+        grouping,
+        n_jobs,
+        models,
+        n_rows,
+        cardinalities,
+        n_classes,
+        memory,
+        cost,
+        steps,
+    )
+
+
+def explain(
+    data: typing.Any,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+    models: typing.Union[str, typing.List[str], None] = None,
+    gen=True,
+    memory_limit: typing.Union[int, str, None] = None,
+    n_jobs: typing.Optional[int] = None,
+    exact: bool = True,
+) -> str:
+    """Describe the execution plan of the evaluation of several models.
+
+    The parameters are those of plan_evaluation.
+
+    :return: description of the chosen plan, with the estimated cost (in
+        operations over rows or classes) of each step.
+    :rtype: string
+    """
+    plan = plan_evaluation(
+        data, quasi_ident, sens_att, models, gen, memory_limit, n_jobs, exact
+    )
+    return format_plan(plan)
+
+
+def format_plan(plan: Plan) -> str:
+    """Describe an execution plan as text.
+
+    :param plan: execution plan.
+    :type plan: Plan
+
+    :return: description of the plan.
+    :rtype: string
+    """
+    sketch = plan.engine == "sketch"
+    summary = [
+        ["Source", plan.source],
+        ["Engine", plan.engine],
+        ["Grouping", plan.grouping or "-"],
+        ["Exact", "no, k and l are upper estimates" if sketch else "yes"],
+        ["Threads", plan.n_jobs],
+        ["Rows", _format_number(plan.n_rows)],
+        ["Equivalence classes (estimated)", _format_number(plan.n_classes)],
+        ["Memory (estimated)", _format_bytes(plan.memory)],
+        ["Cost (estimated)", _format_number(plan.cost)],
+    ]
+    summary += [
+        [f"Cardinality of {col} (estimated)", _format_number(n)]
+        for col, n in plan.cardinalities.items()
+    ]
+    steps = [[step, _format_number(cost)] for step, cost in plan.steps]
+    return "\n\n".join(
+        [
+            tabulate.tabulate(summary, headers=["Plan", "Value"]),
+            tabulate.tabulate(steps, headers=["Step", "Cost"]),
+        ]
+    )
+
+
+def evaluate_models(
+    data: typing.Any,
+    quasi_ident: typing.Union[typing.List, np.ndarray],
+    sens_att: typing.Union[typing.List, np.ndarray, None] = None,
+    models: typing.Union[str, typing.List[str], None] = None,
+    gen=True,
+    weights: typing.Optional[str] = None,
+    memory_limit: typing.Union[int, str, None] = None,
+    n_jobs: typing.Optional[int] = None,
+    exact: bool = True,
+) -> dict:
+    """Evaluate several models and metrics with the plan chosen for the data.
+
+    The records are grouped once, with the engine of the plan, and all the
+    models are evaluated over the same equivalence classes.
+
+    :param data: data under study (see plan_evaluation).
+    :type data: pandas dataframe, object implementing __arrow_c_stream__ or
+        __dataframe__, iterable of pandas dataframes, aux_sql.SQLTable or
+        aux_anonymity.EquivClasses
+
+    :param quasi_ident: list with the name of the columns of the dataframe
+        that are quasi-identifiers.
+    :type quasi_ident: list of strings
+
+    :param sens_att: list with the name of the columns of the dataframe
+        that are the sensitive attributes.
+    :type sens_att: list of strings
+
+    :param models: name of the models and metrics to be evaluated (see
+        MODELS). If None, all the models that can be evaluated with the
+        given SA.
+    :type models: string or list of strings
+
+    :param gen: default to true. If true it is generalized for the case of
+        multiple SA, if False, the set of QI is updated for each SA.
+    :type gen: boolean
+
+    :param weights: name of the column with the number of records
+        represented by each row (e.g. for pre-aggregated data). If None, each
+        row is a record.
+    :type weights: string
+
+    :param memory_limit: memory budget, in bytes or as a string with a unit
+        (e.g. "512MB"). If None, the records are grouped in memory.
+    :type memory_limit: int or string
+
+    :param n_jobs: number of threads used to evaluate the models. If None,
+        it is chosen from the estimated cost.
+    :type n_jobs: int
+
+    :param exact: whether only exact results are allowed. If False, k and l
+        can be estimated with a sketch when the budget is too small, and a
+        warning is issued as the estimates can exceed the true values.
+    :type exact: boolean
+
+    :return: value of each model, as returned by its function in
+        pycanon.anonymity or pycanon.metrics.
+    :rtype: dict
+    """
+    quasi_ident = list(np.asarray(quasi_ident).tolist())
+    sens_att = [] if sens_att is None else list(np.asarray(sens_att).tolist())
+    if aux_functions.is_arrow_like(data):
+        columns = quasi_ident + sens_att + ([] if weights is None else [weights])
+        data = aux_functions.from_arrow(data, list(dict.fromkeys(columns)))
+    plan = plan_evaluation(
+        data, quasi_ident, sens_att, models, gen, memory_limit, n_jobs, exact
+    )
+    if plan.engine == "sketch":
+        warnings.warn(
+            "The memory limit is too small for the exact models: k and l are "
+            "estimated with a sketch and can exceed the true values.",
+            stacklevel=2,
+        )
+        sketch = aux_sketch.get_equiv_sketch(data, quasi_ident, sens_att, weights)
+        results = {
+            "k_anonymity": sketch.k_anonymity()[0],
+            "l_diversity": sketch.l_diversity()[0] if sens_att else None,
+        }
+        return {name: results[name] for name in plan.models}
+
+    limit = memory_limit if plan.engine == "spill" else None
+    equiv = aux_anonymity.get_equiv_classes(
+        data,
+        quasi_ident,
+        sens_att,
+        weights,
+        memory_limit=limit,
+        grouping=plan.grouping or "auto",
+    )
+    # the frequencies of the SA are shared by the models, so they are
+    # calculated before evaluating the models in parallel
+    if any(name in SA_MODELS for name in plan.models):
+        for i, sa in enumerate(sens_att):
+            classes = equiv if gen else equiv.extend(np.delete(sens_att, i))
+            classes.sa_counts(sa)
+
+    def evaluate(name: str) -> typing.Any:
+        return MODELS[name](equiv, np.array(sens_att), gen)
+
+    with futures.ThreadPoolExecutor(max_workers=plan.n_jobs) as executor:
+        values = list(executor.map(evaluate, plan.models))
+    return dict(zip(plan.models, values))
+
+
+def _check_models(
+    models: typing.Union[str, typing.List[str], None], sens_att: list
+) -> typing.List[str]:
+    if models is None:
+        return [name for name in MODELS if sens_att or name not in SA_MODELS]
+    models = [models] if isinstance(models, str) else list(models)
+    for name in models:
+        if name not in MODELS:
+            raise ValueError(f"Unknown model: {name}. Use one of {list(MODELS)}")
+        if name in SA_MODELS and not sens_att:
+            raise ValueError(f"Sensitive attributes are needed for {name}")
+    return models
+
+
+def _estimate_cardinalities(
+    data: pd.DataFrame, quasi_ident: list, sens_att: list
+) -> typing.Tuple[typing.Dict[str, int], int]:
+    """Estimate the number of distinct values of each column and of the QI.
+
+    The GEE estimator of Charikar et al. is applied to a sample of rows.
+    """
+    aux_functions.check_qi(data, quasi_ident)
+    aux_functions.check_sa(data, sens_att)
+    n_rows = len(data)
+    sample = data
+    if n_rows > SAMPLE_ROWS:
+        rows = np.random.default_rng(0).choice(n_rows, SAMPLE_ROWS, replace=False)
+        sample = data.iloc[np.sort(rows)]
+    cardinalities = {
+        col: _gee(sample[col].value_counts(dropna=True).to_numpy(), n_rows)
+        for col in dict.fromkeys(quasi_ident + sens_att)
+    }
+    sizes = sample.groupby(by=quasi_ident, observed=True).size().to_numpy()
+    return cardinalities, _gee(sizes, n_rows)
+
+
+def _gee(counts: np.ndarray, n_rows: int) -> int:
+    """Estimate the number of distinct values from their counts in a sample."""
+    n_sample = int(counts.sum())
+    if n_sample == 0:
+        return 0
+    singletons = int(np.sum(counts == 1))
+    estimate = math.sqrt(n_rows / n_sample) * singletons + len(counts) - singletons
+    return int(min(round(estimate), n_rows))
+
+
+def _estimate_steps(
+    engine: str,
+    grouping: typing.Optional[str],
+    models: typing.List[str],
+    n_rows: typing.Optional[int],
+    cardinalities: typing.Dict[str, int],
+    n_classes: typing.Optional[int],
+    quasi_ident: list,
+    sens_att: list,
+    gen=True,
+) -> typing.List[typing.Tuple[str, typing.Optional[float]]]:
+    """Estimate the cost of grouping the records and of each model."""
+    n_columns = len(set(quasi_ident + sens_att))
+    group_cost = None
+    if engine == "prebuilt":
+        group_cost = 0.0
+    elif n_rows is not None and engine in ENGINE_COSTS:
+        group_cost = ENGINE_COSTS[engine] * n_rows * n_columns
+    method = engine if grouping is None else f"{engine}, {grouping}"
+    steps = [(f"group ({method})", group_cost)]
+    if n_classes is None:
+        return steps + [(name, None) for name in models]
+    # the SA histograms are stored as (class, value) pairs
+    n_values = [cardinalities.get(sa, 1) for sa in sens_att]
+    n_pairs = sum(min(n_classes * m, n_rows or n_classes * m) for m in n_values)
+    if not gen and len(sens_att) > 1 and any(name in SA_MODELS for name in models):
+        regroup = None
+        if engine != "prebuilt" and n_rows is not None:
+            regroup = float(len(sens_att) * n_rows * n_columns)
+        steps.append(("group QI extended with the SA (gen=False)", regroup))
+    for name in models:
+        if name not in SA_MODELS:
+            steps.append((name, float(n_classes)))
+        elif name == "t_closeness":
+            # dense cumulative distributions of each class
+            steps.append((name, float(sum(n_classes * m for m in n_values))))
+        else:
+            steps.append((name, float(n_pairs)))
+    return steps
+
+
+def _format_number(value: typing.Optional[float]) -> str:
+    if value is None:
+        return "unknown"
+    if isinstance(value, float) and not value.is_integer():
+        return f"{value:.3g}"
+    return f"{int(value):,}"
+
+
+def _format_bytes(value: typing.Optional[int]) -> str:
+    if value is None:
+        return "unknown"
+    for unit in ["B", "KB", "MB", "GB"]:
+        if value < 1024:
+            return f"{value:.0f} {unit}"
+        value /= 1024
+    return f"{value:.1f} TB"
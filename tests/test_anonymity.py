@@ -1,9 +1,27 @@
+import gzip
+import io
+import sqlite3
+import types
+
 import numpy as np
 import pandas as pd
 import pytest
 
+import pycanon
 from pycanon import anonymity
-from pycanon.anonymity.utils import aux_anonymity, aux_functions
+from pycanon.anonymity.utils import (
+    aux_anonymity,
+    aux_cache,
+    aux_fingerprint,
+    aux_functions,
+    aux_index,
+    aux_results,
+    aux_sketch,
+    aux_spill,
+    aux_sql,
+)
+from pycanon.anonymity._k_anonymity import _alpha_k_anonymity_equiv
+from pycanon.report import base as report_base
 
 
 class TestMathScores:
@@ -83,6 +101,34 @@ class TestMathScores:
             anonymity.delta_disclosure(self.data_anon, self.qi, self.sa), float
         )
 
+    def test_worst_equiv_classes_k(self):
+        worst = anonymity.worst_equiv_classes(self.data_anon, self.qi, n=3)
+        assert len(worst) == 3
+        assert worst["k"].iloc[0] == anonymity.k_anonymity(self.data_anon, self.qi)
+        assert list(worst.columns) == self.qi + ["size", "k"]
+
+    def test_worst_equiv_classes_t(self):
+        worst = anonymity.worst_equiv_classes(
+            self.data_anon, self.qi, self.sa, model="t_closeness", n=2
+        )
+        assert worst["t"].iloc[0] == pytest.approx(
+            anonymity.t_closeness(self.data_anon, self.qi, self.sa)
+        )
+        assert worst["t"].iloc[0] >= worst["t"].iloc[1]
+
+    def test_worst_equiv_classes_enhanced_beta(self):
+        worst = anonymity.worst_equiv_classes(
+            self.data_anon, self.qi, self.sa, model="enhanced_beta_likeness", n=2
+        )
+        assert worst["beta"].iloc[0] == pytest.approx(
+            anonymity.enhanced_beta_likeness(self.data_anon, self.qi, self.sa)
+        )
+
+    def test_worst_equiv_classes_error(self):
+        with pytest.raises(ValueError):
+            anonymity.worst_equiv_classes(self.data_anon, self.qi, self.sa, model="k")
+
+
 class TestMultipleSA:
     qi = [
         "Gender",
@@ -141,6 +187,448 @@ class TestUnitary:
         data = aux_functions.read_file(self.file_name)
         assert isinstance(data, pd.DataFrame)
         
+    def test_read_file_columns(self):
+        data = aux_functions.read_file(
+            self.file_name, quasi_ident=self.qi, sens_att=self.sa,
+            engine="pyarrow", compact_dtypes=True
+        )
+        assert data.columns.tolist() == self.qi + self.sa
+        data_full = aux_functions.read_file(self.file_name)
+        assert anonymity.k_anonymity(data, self.qi) == anonymity.k_anonymity(
+            data_full, self.qi
+        )
+        assert anonymity.t_closeness(
+            data, self.qi, self.sa
+        ) == anonymity.t_closeness(data_full, self.qi, self.sa)
+        for engine in ["pyarrow", "c"]:
+            with pytest.raises(ValueError, match="quasi-identifiers"):
+                aux_functions.read_file(
+                    self.file_name, quasi_ident=["other"], engine=engine
+                )
+            with pytest.raises(ValueError, match="sensitive attributes"):
+                aux_functions.read_file(
+                    self.file_name, quasi_ident=self.qi, sens_att=["other"],
+                    engine=engine
+                )
+
+    @pytest.mark.parametrize("extension", [".parquet", ".feather", ".arrow"])
+    def test_read_file_arrow(self, tmp_path, extension):
+        data = aux_functions.read_file(self.file_name)
+        file_name = tmp_path / f"data{extension}"
+        if extension == ".parquet":
+            data.to_parquet(file_name)
+        else:
+            data.to_feather(file_name)
+        data_arrow = aux_functions.read_file(
+            file_name, quasi_ident=self.qi, sens_att=self.sa,
+            filters=[("Gender", "==", "Female")]
+        )
+        data_female = data[data["Gender"] == "Female"][self.qi + self.sa]
+        assert data_arrow.columns.tolist() == self.qi + self.sa
+        assert data_arrow.equals(data_female.reset_index(drop=True))
+        with pytest.raises(ValueError, match="quasi-identifiers"):
+            aux_functions.read_file(file_name, quasi_ident=["other"])
+
+    def test_read_file_filters(self):
+        with pytest.raises(ValueError):
+            aux_functions.read_file(
+                self.file_name, filters=[("Gender", "==", "Female")]
+            )
+
+    def test_read_file_cache(self, tmp_path):
+        file_name = tmp_path / "data.csv"
+        data = aux_functions.read_file(self.file_name)
+        data.to_csv(file_name, index=False)
+        cache_dir = tmp_path / "cache"
+        data_read = aux_functions.read_file(
+            file_name, quasi_ident=self.qi, compact_dtypes=True, cache_dir=cache_dir
+        )
+        assert len(list(cache_dir.glob("*.arrow"))) == 1
+        data_cached = aux_functions.read_file(
+            file_name, quasi_ident=self.qi, compact_dtypes=True, cache_dir=cache_dir
+        )
+        assert data_cached.equals(data_read)
+        data.iloc[:10].to_csv(file_name, index=False)
+        data_changed = aux_functions.read_file(
+            file_name, quasi_ident=self.qi, cache_dir=cache_dir, cache_size=0
+        )
+        assert len(data_changed) == 10
+        assert len(list(cache_dir.glob("*.arrow"))) == 0
+
+    def test_read_file_cache_without_pyarrow(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(aux_cache, "AVAILABLE", False)
+        with pytest.raises(ImportError, match="pyarrow"):
+            aux_functions.read_file(self.file_name, cache_dir=tmp_path)
+        assert len(aux_functions.read_file(self.file_name)) > 0
+
+    @pytest.mark.parametrize("compression", ["gz", "bz2", "xz"])
+    def test_read_file_compressed(self, tmp_path, compression):
+        data = aux_functions.read_file(self.file_name)
+        file_name = tmp_path / f"data.csv.{compression}"
+        data.to_csv(file_name, index=False)
+        assert aux_functions.read_file(file_name).equals(data)
+
+    def test_read_file_stdin(self, monkeypatch):
+        data = aux_functions.read_file(self.file_name)
+        stdin = io.TextIOWrapper(
+            io.BufferedReader(io.BytesIO(gzip.compress(data.to_csv(index=False).encode())))
+        )
+        monkeypatch.setattr("sys.stdin", stdin)
+        chunks = aux_functions.iter_file("-", chunksize=10)
+        assert anonymity.k_anonymity(chunks, self.qi) == anonymity.k_anonymity(
+            data, self.qi
+        )
+
+    def test_sql_table(self):
+        data = aux_functions.read_file(self.file_name)
+        con = sqlite3.connect(":memory:")
+        data.to_sql("students", con, index=False)
+        table = aux_sql.SQLTable(con, "students")
+        assert anonymity.k_anonymity(table, self.qi) == anonymity.k_anonymity(
+            data, self.qi
+        )
+        assert anonymity.l_diversity(
+            table, self.qi, self.sa
+        ) == anonymity.l_diversity(data, self.qi, self.sa)
+        assert anonymity.t_closeness(
+            table, self.qi, self.sa
+        ) == anonymity.t_closeness(data, self.qi, self.sa)
+        with pytest.raises(ValueError):
+            anonymity.k_anonymity(table, ["age"])
+
+    def test_sql_quote(self):
+        con = sqlite3.connect(":memory:")
+        assert aux_sql.SQLTable(con, 'main.a"b')._quote_table() == '"main"."a""b"'
+        # SQLAlchemy connectables quote with the preparer of their dialect
+        preparer = types.SimpleNamespace(quote=lambda name: f"`{name}`")
+        engine = types.SimpleNamespace(
+            dialect=types.SimpleNamespace(identifier_preparer=preparer)
+        )
+        assert aux_sql.SQLTable(engine, "db.students")._quote_table() == (
+            "`db`.`students`"
+        )
+
+    def test_weights(self):
+        data = aux_functions.read_file(self.file_name)
+        columns = self.qi + self.sa
+        grouped = data.groupby(columns).size().rename("count").reset_index()
+        assert anonymity.k_anonymity(
+            grouped, self.qi, weights="count"
+        ) == anonymity.k_anonymity(data, self.qi)
+        assert anonymity.l_diversity(
+            grouped, self.qi, self.sa, weights="count"
+        ) == anonymity.l_diversity(data, self.qi, self.sa)
+        assert anonymity.t_closeness(
+            grouped, self.qi, self.sa, weights="count"
+        ) == pytest.approx(anonymity.t_closeness(data, self.qi, self.sa))
+        con = sqlite3.connect(":memory:")
+        grouped.to_sql("students", con, index=False)
+        table = aux_sql.SQLTable(con, "students")
+        assert anonymity.k_anonymity(
+            table, self.qi, weights="count"
+        ) == anonymity.k_anonymity(data, self.qi)
+        grouped["count"] = -grouped["count"]
+        with pytest.raises(ValueError):
+            anonymity.k_anonymity(grouped, self.qi, weights="count")
+        with pytest.raises(ValueError):
+            anonymity.k_anonymity(grouped, self.qi, weights="age")
+
+    def test_fractional_weights(self):
+        data = pd.DataFrame({"a": [1, 1, 2], "s": ["x", "x", "y"]})
+        equiv = aux_anonymity.EquivClasses(data, ["a"], np.array([1.5, 1.5, 2.5]))
+        assert equiv.sizes.tolist() == [3.0, 2.5]
+        assert aux_anonymity.ec_max_count(equiv, "s").tolist() == [3.0, 2.5]
+        alpha, _ = _alpha_k_anonymity_equiv(equiv, ["s"])
+        assert alpha == 1.0
+
+    def test_missing_qi(self):
+        # the records with missing QI are a class of their own, as in the
+        # original grouping with several QI
+        data = pd.DataFrame(
+            {"z": [1, 1, 1, 2], "a": [1, 1, 1, np.nan], "s": ["p", "q", "r", "p"]}
+        )
+        quasi_ident = ["z", "a"]
+        for codes in [
+            aux_anonymity.get_equiv_class_codes(data, quasi_ident),
+            aux_anonymity.get_equiv_class_codes(data, quasi_ident, "sort"),
+        ]:
+            assert codes.tolist() == [0, 0, 0, 1]
+        for kwargs in [{}, {"memory_limit": 1}]:
+            assert anonymity.k_anonymity(data, quasi_ident, **kwargs) == 1
+            assert anonymity.l_diversity(data, quasi_ident, ["s"], **kwargs) == 1
+            assert anonymity.alpha_k_anonymity(
+                data, quasi_ident, ["s"], **kwargs
+            ) == (1.0, 1)
+            assert anonymity.t_closeness(
+                data, quasi_ident, ["s"], **kwargs
+            ) == pytest.approx(0.5)
+        chunks = iter([data.iloc[:2], data.iloc[2:]])
+        assert anonymity.k_anonymity(chunks, quasi_ident) == 1
+        assert anonymity.k_anonymity(data, quasi_ident, engine="sketch") == 1
+
+    def test_memory_limit(self, monkeypatch):
+        data = aux_functions.read_file(self.file_name)
+        sens_att = self.sa + ["Gender"]
+        quasi_ident = [qi for qi in self.qi if qi != "Gender"]
+        for gen in [True, False]:
+            # a limit of 1 byte spills the records to the maximum of partitions
+            assert report_base.get_report_values(
+                data, quasi_ident, sens_att, gen=gen, memory_limit=1
+            ) == report_base.get_report_values(data, quasi_ident, sens_att, gen=gen)
+        # small blocks and fan-out to partition recursively, with a class
+        # that cannot be split
+        with monkeypatch.context() as m:
+            m.setattr(aux_spill, "MIN_BLOCK_ROWS", 8)
+            m.setattr(aux_spill, "MAX_FANOUT", 3)
+            skewed = pd.concat([data] + [data.iloc[:1]] * 50, ignore_index=True)
+            for frame in [data, skewed]:
+                assert report_base.get_report_values(
+                    frame, quasi_ident, sens_att, memory_limit=1
+                ) == report_base.get_report_values(frame, quasi_ident, sens_att)
+        # the EMD of a numerical SA depends on the order of its values
+        scores = aux_functions.read_file("./data/processed/StudentsMath_Score.csv")
+        assert anonymity.t_closeness(
+            scores, self.qi, ["Score"], memory_limit=1
+        ) == pytest.approx(anonymity.t_closeness(scores, self.qi, ["Score"]))
+        chunks = aux_functions.iter_file(self.file_name, chunksize=100)
+        assert anonymity.l_diversity(
+            chunks, self.qi, self.sa, memory_limit="1KB"
+        ) == anonymity.l_diversity(data, self.qi, self.sa)
+        grouped = data.groupby(self.qi).size().rename("count").reset_index()
+        assert anonymity.k_anonymity(
+            grouped, self.qi, weights="count", memory_limit=1
+        ) == anonymity.k_anonymity(data, self.qi)
+        assert aux_spill.parse_memory_limit("1.5 kb") == 1536
+        with pytest.raises(ValueError):
+            aux_spill.parse_memory_limit("1 PB")
+        with pytest.raises(ValueError):
+            anonymity.k_anonymity(data, self.qi, memory_limit=0)
+
+    def test_grouping(self, monkeypatch):
+        data = aux_functions.read_file(self.file_name)
+        data.loc[:9, "Gender"] = None
+        sens_att = self.sa + ["Gender"]
+        quasi_ident = [qi for qi in self.qi if qi != "Gender"] + ["Gender"]
+        hashed = aux_anonymity.EquivClasses(data, quasi_ident, grouping="hash")
+        sorted_ = aux_anonymity.EquivClasses(data, quasi_ident, grouping="sort")
+        for name in ["codes", "sizes", "first", "permutation", "offsets"]:
+            assert (getattr(hashed, name) == getattr(sorted_, name)).all()
+        assert (sorted_.codes[sorted_.rows(0)] == 0).all()
+        for gen in [True, False]:
+            assert report_base.get_report_values(
+                sorted_, quasi_ident, sens_att, gen=gen
+            ) == report_base.get_report_values(hashed, quasi_ident, sens_att, gen=gen)
+        # small dataframes are hashed without sampling them
+        ordered = data.sort_values(quasi_ident, ignore_index=True)
+        assert aux_anonymity.choose_grouping(ordered, quasi_ident) == "hash"
+        monkeypatch.setattr(aux_anonymity, "SORT_MIN_ROWS", 2)
+        # sorted or almost unique QI are grouped by sorting the records
+        assert aux_anonymity.choose_grouping(data, quasi_ident) == "hash"
+        assert aux_anonymity.choose_grouping(ordered, quasi_ident) == "sort"
+        unique = data.assign(row=np.arange(len(data))[::-1])
+        assert aux_anonymity.choose_grouping(unique, ["row"]) == "sort"
+        assert anonymity.k_anonymity(unique, ["row"]) == 1
+        assert (
+            aux_anonymity.get_equiv_class_codes(ordered, quasi_ident, "sort")
+            == aux_anonymity.get_equiv_class_codes(ordered, quasi_ident)
+        ).all()
+        with pytest.raises(ValueError):
+            aux_anonymity.EquivClasses(data, quasi_ident, grouping="tree")
+
+    def test_sketch(self):
+        data = aux_functions.read_file("./data/processed/StudentsMath_Score_k5.csv")
+        assert anonymity.k_anonymity(
+            data, self.qi, engine="sketch"
+        ) == anonymity.k_anonymity(data, self.qi)
+        assert anonymity.l_diversity(
+            data, self.qi, self.sa, engine="sketch"
+        ) == anonymity.l_diversity(data, self.qi, self.sa)
+        sketch = aux_sketch.get_equiv_sketch(data.iloc[:30], self.qi, self.sa)
+        sketch.merge(aux_sketch.get_equiv_sketch(data.iloc[30:], self.qi, self.sa))
+        full = aux_sketch.get_equiv_sketch(data, self.qi, self.sa)
+        assert (sketch.sizes() == full.sizes()).all()
+        assert sketch.complete
+        assert sketch.n_ec == aux_anonymity.EquivClasses(data, self.qi).n_ec
+        assert anonymity.k_anonymity(sketch, self.qi) == anonymity.k_anonymity(
+            data, self.qi
+        )
+        # the smallest classes are tracked even if they are not sampled
+        large = pd.DataFrame({"qi": np.repeat(np.arange(200), 50)})
+        small = pd.concat([large, pd.DataFrame({"qi": [1000]})], ignore_index=True)
+        for chunks in [[small], [small.iloc[::-1]]]:
+            sketch = aux_sketch.get_equiv_sketch(chunks, ["qi"], n_classes=8, n_small=4)
+            assert not sketch.complete
+            assert sketch.k_anonymity()[0] == 1
+        with pytest.raises(ValueError):
+            sketch.merge(aux_sketch.EquivSketch(self.qi, self.sa, epsilon=0.1))
+        with pytest.raises(ValueError):
+            anonymity.k_anonymity(data, self.qi, engine="approximate")
+
+    def test_result_cache(self, tmp_path, monkeypatch):
+        data = aux_functions.read_file(self.file_name)
+        aux_results.enable(tmp_path)
+        try:
+            hits = aux_results.info()["hits"]
+            k_anon = anonymity.k_anonymity(data, self.qi)
+            assert aux_results.info()["last"] == "miss"
+            assert anonymity.k_anonymity(data, self.qi) == k_anon
+            assert aux_results.info()["last"] == "hit"
+            assert aux_results.info()["hits"] == hits + 1
+            alpha_k = anonymity.alpha_k_anonymity(data, self.qi, self.sa)
+            assert anonymity.alpha_k_anonymity(data, self.qi, self.sa) == alpha_k
+            assert isinstance(
+                anonymity.alpha_k_anonymity(data, self.qi, self.sa), tuple
+            )
+            # other columns do not change the key, the QI do
+            anonymity.k_anonymity(data.assign(other=1), self.qi)
+            assert aux_results.info()["last"] == "hit"
+            anonymity.k_anonymity(data.assign(Gender=1), self.qi)
+            assert aux_results.info()["last"] == "miss"
+            # the results of another version are not reused
+            monkeypatch.setattr(pycanon, "__version__", "0.0.0")
+            anonymity.k_anonymity(data, self.qi)
+            assert aux_results.info()["last"] == "miss"
+        finally:
+            aux_results.disable()
+        cache = aux_results.ResultCache(tmp_path / "small.sqlite", max_size=25)
+        cache.put("a", 12345)
+        cache.put("b", (1, 2.5))
+        assert cache.get("a") == (False, None)
+        assert cache.get("b") == (True, (1, 2.5))
+
+    def test_fingerprint(self):
+        data = aux_functions.read_file(self.file_name)
+        digest, blocks = aux_fingerprint.fingerprint(
+            data, self.qi, block_size=10, blocks=True
+        )
+        assert digest == aux_fingerprint.fingerprint(
+            data, self.qi, block_size=10, n_jobs=2
+        )
+        assert digest == aux_fingerprint.fingerprint(
+            data.assign(other=1), self.qi, block_size=10
+        )
+        changed = data.copy()
+        changed.loc[25, "Gender"] = "other"
+        other_digest, other_blocks = aux_fingerprint.fingerprint(
+            changed, self.qi, block_size=10, blocks=True
+        )
+        assert other_digest != digest
+        assert aux_fingerprint.changed_rows(blocks, other_blocks, 10) == [(20, 30)]
+        categorical = data.astype({"Teacher": "category"})
+        assert aux_fingerprint.fingerprint(categorical, self.qi) != (
+            aux_fingerprint.fingerprint(data, self.qi)
+        )
+        with pytest.raises(ValueError):
+            aux_fingerprint.fingerprint(data, ["other"])
+
+    def test_index(self, tmp_path):
+        data = aux_functions.read_file(self.file_name)
+        sens_att = self.sa + ["Gender"]
+        quasi_ident = [qi for qi in self.qi if qi != "Gender"]
+        index = aux_index.build_index(
+            data, quasi_ident, tmp_path, sens_att, extended=True
+        )
+        loaded = aux_index.load_index(tmp_path)
+        for gen in [True, False]:
+            assert report_base.get_report_values(
+                loaded, quasi_ident, sens_att, gen=gen
+            ) == report_base.get_report_values(data, quasi_ident, sens_att, gen=gen)
+        worst = anonymity.worst_equiv_classes(loaded, quasi_ident, n=3)
+        assert worst.equals(anonymity.worst_equiv_classes(data, quasi_ident, n=3))
+        equiv = aux_anonymity.EquivClasses(data, quasi_ident)
+        rows = loaded.rows(0)
+        assert (equiv.codes[rows] == 0).all()
+        assert len(rows) == equiv.sizes[0] == index.sizes[0]
+        assert loaded.matches(data)
+        assert not loaded.matches(data.assign(Score=0))
+        with pytest.raises(ValueError):
+            anonymity.k_anonymity(loaded, self.qi)
+        with pytest.raises(ValueError):
+            aux_index.load_index(tmp_path / "missing")
+
+    def test_index_missing_values(self, tmp_path):
+        data = aux_functions.read_file(self.file_name)
+        quasi_ident = [qi for qi in self.qi if qi != "Gender"]
+        data.loc[::7, quasi_ident[0]] = None
+        data.loc[::5, "Gender"] = None
+        loaded = aux_index.build_index(data, quasi_ident, tmp_path, ["Gender"])
+        equiv = aux_anonymity.EquivClasses(data, quasi_ident)
+        assert loaded.n_ec == equiv.n_ec
+        assert (loaded.codes == equiv.codes).all()
+        assert loaded.data[quasi_ident[0]].isna().any()
+        assert report_base.get_report_values(
+            loaded, quasi_ident, ["Gender"]
+        ) == report_base.get_report_values(data, quasi_ident, ["Gender"])
+        worst = anonymity.worst_equiv_classes(loaded, quasi_ident, n=3)
+        assert worst.equals(anonymity.worst_equiv_classes(data, quasi_ident, n=3))
+        # the missing values are not saved as the strings "nan" or "None"
+        values, missing = aux_index._fixed_width(np.array(["a", None, np.nan]))
+        assert values.tolist() == ["a", "", ""]
+        assert missing.tolist() == [False, True, True]
+        np.save(tmp_path / "test.npy", values)
+        np.save(tmp_path / "test_missing.npy", missing)
+        assert pd.isna(loaded._load("test")).tolist() == [False, True, True]
+
+    def test_arrow_table(self):
+        pa = pytest.importorskip("pyarrow")
+        data = aux_functions.read_file(self.file_name)
+        table = pa.Table.from_pandas(data)
+        assert anonymity.k_anonymity(table, self.qi) == anonymity.k_anonymity(
+            data, self.qi
+        )
+        assert anonymity.l_diversity(
+            table, self.qi, self.sa
+        ) == anonymity.l_diversity(data, self.qi, self.sa)
+        assert anonymity.t_closeness(
+            table, self.qi, self.sa
+        ) == anonymity.t_closeness(data, self.qi, self.sa)
+        data_arrow = aux_functions.from_arrow(table, self.qi)
+        assert isinstance(data_arrow["Teacher"].dtype, pd.CategoricalDtype)
+        assert (data_arrow["Teacher"] == data["Teacher"]).all()
+
+    def test_iter_file(self):
+        data = aux_functions.read_file(self.file_name)
+        chunks = aux_functions.iter_file(
+            self.file_name, chunksize=10, columns=self.qi + self.sa
+        )
+        equiv = aux_anonymity.get_equiv_classes(chunks, self.qi, self.sa)
+        assert equiv.n_records == len(data)
+        assert anonymity.k_anonymity(
+            aux_functions.iter_file(self.file_name, chunksize=10), self.qi
+        ) == anonymity.k_anonymity(data, self.qi)
+        assert anonymity.t_closeness(
+            aux_functions.iter_file(self.file_name, chunksize=10), self.qi, self.sa
+        ) == anonymity.t_closeness(data, self.qi, self.sa)
+
+    def test_iter_file_xlsx(self, tmp_path):
+        pytest.importorskip("openpyxl")
+        data = aux_functions.read_file(self.file_name)[self.qi + self.sa]
+        # an empty row between the records and empty rows after them
+        data = pd.concat(
+            [data.iloc[:5], pd.DataFrame(index=[0], columns=data.columns),
+             data.iloc[5:], pd.DataFrame(index=range(3), columns=data.columns)],
+            ignore_index=True,
+        )
+        file_name = tmp_path / "data.xlsx"
+        data.to_excel(file_name, index=False)
+        full = aux_functions.read_file(file_name)
+        chunks = list(aux_functions.iter_file(file_name, chunksize=7))
+        assert sum(len(chunk) for chunk in chunks) == len(full) == len(data) - 3
+        assert pd.concat(chunks, ignore_index=True).isna().all(axis=1).sum() == 1
+
+    def test_iter_file_sav(self):
+        file_name_sav = "./data/raw/StudentsMath_Score.sav"
+        chunks = list(aux_functions.iter_file(file_name_sav, chunksize=10))
+        assert len(chunks) > 1
+        categories = chunks[-1]["Teacher"].cat.categories.tolist()
+        for chunk in chunks:
+            chunk_categories = chunk["Teacher"].cat.categories.tolist()
+            assert chunk_categories == categories[:len(chunk_categories)]
+        data = aux_functions.read_file(file_name_sav)
+        assert anonymity.l_diversity(
+            iter(chunks), self.qi, self.sa
+        ) == anonymity.l_diversity(data, self.qi, self.sa)
+
     def test_read_file_sav(self):
         file_name_sav = "./data/raw/StudentsMath_Score.sav"
         data = aux_functions.read_file(file_name_sav)
@@ -1,8 +1,10 @@
+import numpy as np
 import pandas as pd
 import pytest
 
 from pycanon import metrics
-from pycanon.anonymity.utils import aux_functions
+from pycanon.anonymity.utils import aux_anonymity, aux_functions
+from pycanon.metrics._utility_metrics import _utility_metrics_equiv
 
 
 class TestMetrics:
@@ -35,6 +37,93 @@ class TestMetrics:
         )
         assert isinstance(dm, int) or isinstance(dm, float)
 
+    def test_utility_metrics(self):
+        utility = metrics.utility_metrics(
+            self.data_raw, self.data_anon, self.quasi_ident, self.sens_att
+        )
+        assert utility["average_ecsize"] == pytest.approx(
+            metrics.average_ecsize(self.data_raw, self.data_anon, self.quasi_ident)
+        )
+        assert utility["classification_metric"] == pytest.approx(
+            metrics.classification_metric(
+                self.data_raw, self.data_anon, self.quasi_ident, self.sens_att
+            )
+        )
+        assert utility["discernability_metric"] == metrics.discernability_metric(
+            self.data_raw, self.data_anon, self.quasi_ident
+        )
+
+    def test_weights(self):
+        columns = self.quasi_ident + self.sens_att
+        raw = self.data_raw[columns]
+        grouped = raw.groupby(columns).size().rename("count").reset_index()
+        assert metrics.average_rir(
+            grouped, self.quasi_ident, weights="count"
+        ) == pytest.approx(metrics.average_rir(raw, self.quasi_ident))
+        assert metrics.max_rir(
+            grouped, self.quasi_ident, weights="count"
+        ) == pytest.approx(metrics.max_rir(raw, self.quasi_ident))
+        assert metrics.sizes_ec(
+            grouped, self.quasi_ident, weights="count"
+        ) == metrics.sizes_ec(raw, self.quasi_ident)
+        assert metrics.stats_quasi_ident(
+            grouped, "age", weights="count"
+        ) == pytest.approx(metrics.stats_quasi_ident(raw, "age"))
+        assert metrics.sa_entropy(
+            grouped, "salary-class", weights="count"
+        ) == pytest.approx(metrics.sa_entropy(raw, "salary-class"))
+        assert metrics.discernability_metric(
+            grouped, grouped, self.quasi_ident, weights="count"
+        ) == metrics.discernability_metric(raw, raw, self.quasi_ident)
+
+    def test_bootstrap_metrics(self):
+        names = ["average_rir", "sa_entropy", "t_closeness"]
+        results = [
+            metrics.bootstrap_metrics(
+                self.data_anon,
+                self.quasi_ident,
+                names,
+                self.sens_att,
+                n_replicates=20,
+                seed=0,
+                n_jobs=n_jobs,
+            )
+            for n_jobs in [1, 2]
+        ]
+        assert results[0] == results[1]
+        result = results[0]
+        assert result["average_rir"]["estimate"] == pytest.approx(
+            metrics.average_rir(self.data_anon, self.quasi_ident)
+        )
+        assert result["sa_entropy"]["estimate"] == pytest.approx(
+            metrics.sa_entropy(self.data_anon, "salary-class")
+        )
+        for name in names:
+            low, high = result[name]["ci"]
+            assert low <= high
+            assert result[name]["std"] >= 0
+        with pytest.raises(ValueError):
+            metrics.bootstrap_metrics(self.data_anon, self.quasi_ident, "utility")
+
+    def test_utility_metrics_fractional_weights(self):
+        data = pd.DataFrame({"qi": [1, 1, 2], "sa": ["x", "y", "y"]})
+        weights = np.array([1.5, 0.5, 2.5])
+        equiv = aux_anonymity.EquivClasses(data, ["qi"], weights)
+        utility = _utility_metrics_equiv(equiv, 4.5, ["sa"])
+        assert utility["average_ecsize"] == pytest.approx(1.125)
+        assert utility["classification_metric"] == pytest.approx(0.5 / 4.5)
+        assert utility["discernability_metric"] == pytest.approx(10.25)
+
+    def test_classification_metric_ties(self):
+        data = pd.DataFrame({"qi": [1, 1, 1, 1, 1], "sa": ["a", "a", "b", "b", "c"]})
+        # the values tied as the most frequent are not penalized
+        cm = metrics.classification_metric(data, data, ["qi"], ["sa"])
+        assert cm == pytest.approx(1 / 5)
+        # the values of several SA are pooled
+        data["sa2"] = ["a", "c", "c", "c", "d"]
+        cm = metrics.classification_metric(data, data, ["qi"], ["sa", "sa2"])
+        assert cm == pytest.approx(6 / 5)
+
     def test_average_rir(self):
         avg_rir = metrics.average_rir(self.data_anon, self.quasi_ident)
         assert isinstance(avg_rir, float)
@@ -91,3 +180,82 @@ class TestMetrics:
     def test_stats_quasi_ident_mean(self):
         stats_qi = metrics.stats_quasi_ident(self.data_raw, "age")
         assert stats_qi["mean"] > 17 and stats_qi["mean"] < 90
+
+    def test_stats_quasi_idents(self):
+        stats_qis = metrics.stats_quasi_idents(self.data_raw, ["age", "education"])
+        for qi in ["age", "education"]:
+            assert stats_qis[qi] == pytest.approx(
+                metrics.stats_quasi_ident(self.data_raw, qi)
+            )
+
+    def test_stats_quasi_idents_chunks(self):
+        chunks = (
+            self.data_raw.iloc[i : i + 5000] for i in range(0, len(self.data_raw), 5000)
+        )
+        stats_chunks = metrics.stats_quasi_idents(chunks, ["age"], n_jobs=2)
+        stats_qis = metrics.stats_quasi_idents(self.data_raw, ["age"])
+        assert stats_chunks["age"] == pytest.approx(stats_qis["age"])
+
+    def test_sa_entropies(self):
+        entropies = metrics.sa_entropies(self.data_anon, ["salary-class", "sex"])
+        assert entropies["sex"] == pytest.approx(
+            metrics.sa_entropy(self.data_anon, "sex")
+        )
+
+    def test_sa_entropies_chunks(self):
+        chunks = (
+            self.data_anon.iloc[i : i + 5000]
+            for i in range(0, len(self.data_anon), 5000)
+        )
+        entropies = metrics.sa_entropies(chunks, self.sens_att)
+        assert entropies[self.sens_att[0]] == pytest.approx(
+            metrics.sa_entropy(self.data_anon, self.sens_att[0])
+        )
+
+    def test_ec_sa_entropies(self):
+        ec_entropies = metrics.ec_sa_entropies(
+            self.data_anon, self.quasi_ident, self.sens_att
+        )
+        stats_ec = metrics.sizes_ec(self.data_anon, self.quasi_ident)
+        assert len(ec_entropies[self.sens_att[0]]) == stats_ec["n_ec"]
+        assert (ec_entropies[self.sens_att[0]] >= 0).all()
+
+    def test_record_rir(self):
+        risk = metrics.record_rir(self.data_anon, self.quasi_ident)
+        assert len(risk) == len(self.data_anon)
+        assert risk.max() == pytest.approx(
+            metrics.max_rir(self.data_anon, self.quasi_ident)
+        )
+
+    def test_record_rir_population(self):
+        qi = ["age", "education", "sex"]
+        sample = self.data_raw.iloc[::10]
+        risk = metrics.record_rir(sample, qi, population=self.data_raw)
+        assert (risk <= metrics.record_rir(sample, qi)).all()
+
+    def test_rir_summary(self):
+        summary = metrics.rir_summary(self.data_anon, self.quasi_ident)
+        assert summary["average_rir"] == pytest.approx(
+            metrics.average_rir(self.data_anon, self.quasi_ident)
+        )
+        assert summary["max_rir"] == pytest.approx(
+            metrics.max_rir(self.data_anon, self.quasi_ident)
+        )
+
+    def test_rir_summary_population(self):
+        summary = metrics.rir_summary(
+            self.data_anon, self.quasi_ident, population=self.data_anon
+        )
+        assert summary["journalist_max_rir"] == pytest.approx(summary["max_rir"])
+
+    def test_linkage_attack(self):
+        qi = ["age", "education", "sex"]
+        sample = self.data_raw.iloc[::10]
+        chunks = (
+            self.data_raw.iloc[i : i + 5000] for i in range(0, len(self.data_raw), 5000)
+        )
+        linkage = metrics.linkage_attack(sample, chunks, qi)
+        assert linkage["match_probability"] == pytest.approx(
+            metrics.record_rir(sample, qi, population=self.data_raw)
+        )
+        assert linkage["match_count_distribution"].sum() == len(sample)
@@ -4,7 +4,7 @@ import numpy as np
 import pytest
 
 from pycanon.anonymity.utils import aux_functions
-from pycanon.report import base, pdf, pdf_utility_report
+from pycanon.report import approximate, base, pdf, pdf_utility_report, planner
 from pycanon.report import json as json_rep
 
 
@@ -78,6 +78,91 @@ class TestMath(TestReport):
         for e, o in zip(expected, obtained):
             assert e == pytest.approx(o, nan_ok=True)
 
+    def test_report_arrow(self, file_name, expected):
+        pa = pytest.importorskip("pyarrow")
+        table = pa.Table.from_pandas(aux_functions.read_file(file_name))
+        obtained = base.get_report_values(table, self.qi, self.sa)
+        for e, o in zip(expected, obtained):
+            assert e == pytest.approx(o, nan_ok=True)
+
+    def test_report_approximate(self, file_name, expected):
+        dataset = aux_functions.read_file(file_name)
+        report = approximate.get_approximate_report_values(
+            dataset, self.qi, self.sa, fraction=1.0, k=5, n_replicates=5, seed=0
+        )
+        expected_json = self.generate_json_dict(dataset, self.qi, self.sa, expected)
+        for model, params in expected_json.items():
+            if model == "data":
+                continue
+            for param, value in params.items():
+                estimate = report[model][param]["estimate"]
+                assert value == pytest.approx(estimate, nan_ok=True)
+        assert report["k_anonymity"]["k"]["ci"] == [expected[0], expected[0]]
+        under_k = report["classes_under_k"]
+        assert len(under_k) == report["equivalence_classes"]["possibly_under_k"]
+        assert (under_k["estimated_size"] < 5).all()
+        assert report["equivalence_classes"]["n_ec_estimate"] == report[
+            "equivalence_classes"
+        ]["n_ec_sample"]
+
+    def test_report_approximate_sample(self, file_name, expected):
+        dataset = aux_functions.read_file(file_name)
+        reports = [
+            approximate.get_approximate_report_values(
+                dataset, self.qi, self.sa, fraction=0.5, n_replicates=5, seed=1
+            )
+            for _ in range(2)
+        ]
+        assert reports[0] == reports[1]
+        low, high = reports[0]["k_anonymity"]["k"]["ci"]
+        assert low <= reports[0]["k_anonymity"]["k"]["estimate"] <= high
+
+    def test_planner(self, file_name, expected):
+        dataset = aux_functions.read_file(file_name)
+        for memory_limit, n_jobs in [(None, None), (1, 2)]:
+            values = planner.evaluate_models(
+                dataset,
+                self.qi,
+                self.sa,
+                planner.REPORT_MODELS,
+                memory_limit=memory_limit,
+                n_jobs=n_jobs,
+            )
+            for e, o in zip(expected, values.values()):
+                assert e == pytest.approx(o, nan_ok=True)
+        plan = planner.plan_evaluation(dataset, self.qi, self.sa, memory_limit=1)
+        assert plan.engine == "spill"
+        assert plan.grouping is None
+        assert plan.n_rows == len(dataset)
+        assert "spill" in planner.format_plan(plan)
+        plan = planner.plan_evaluation(
+            dataset, self.qi, self.sa, "k_anonymity", memory_limit=1, exact=False
+        )
+        assert plan.engine == "sketch"
+        assert "upper estimates" in planner.format_plan(plan)
+        with pytest.warns(UserWarning):
+            values = planner.evaluate_models(
+                dataset, self.qi, None, "k_anonymity", memory_limit=1, exact=False
+            )
+        assert values["k_anonymity"] >= expected[0]
+        with pytest.raises(ValueError):
+            planner.plan_evaluation(dataset, self.qi, None, "l_diversity")
+        report = approximate.get_approximate_report_values(
+            dataset,
+            self.qi,
+            self.sa,
+            fraction=0.5,
+            method="stratified",
+            strata=["Gender"],
+            n_replicates=5,
+            seed=1,
+        )
+        assert report["sample"]["n_records"] == pytest.approx(len(dataset))
+        with pytest.raises(ValueError):
+            approximate.get_approximate_report_values(
+                dataset, self.qi, self.sa, method="stratified"
+            )
+
     #    @pytest.mark.skip(
     #        reason="Fails for recursive_c_l_diversity as np.nan != np.nan"
     #    )
@@ -144,4 +229,52 @@ class TestPDFReport:
         assert isinstance(avg_ec, float) and avg_ec >= 1
         assert isinstance(cm, float) and 0 <= cm <= 1
         assert isinstance(dm, int) or isinstance(dm, float) and dm >= 0
-        assert isinstance(stats_ec, dict)
\ No newline at end of file
+        assert isinstance(stats_ec, dict)
+
+    def test_get_anonymity_utility_values(self):
+        report = base.get_anonymity_utility_values(
+            self.data_raw, self.data_anon, self.qi, self.sa
+        )
+        values = base.get_report_values(self.data_anon, self.qi, self.sa)
+        expected = TestReport().generate_json_dict(
+            self.data_anon, self.qi, self.sa, values
+        )
+        for k, v in expected.items():
+            assert v == pytest.approx(report[k], nan_ok=True)
+        avg_ec, cm, dm, stats_ec = pdf_utility_report.get_utility_report_values(
+            self.data_raw, self.data_anon, self.qi, self.sa, sup=True
+        )
+        assert report["utility"]["average_ecsize"] == pytest.approx(avg_ec)
+        assert report["utility"]["classification_metric"] == pytest.approx(cm)
+        assert report["utility"]["discernability_metric"] == dm
+        assert report["equivalence_classes"] == stats_ec
+
+    def test_json_utility_report(self):
+        obtained = json.loads(
+            json_rep.get_json_utility_report(
+                self.data_raw, self.data_anon, self.qi, self.sa
+            )
+        )
+        assert {"utility", "equivalence_classes", "k_anonymity"} <= set(obtained)
+
+    def test_export_equiv_classes(self, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        from pycanon.report import export
+
+        file_name = str(tmp_path / "equiv_classes.parquet")
+        export.export_equiv_classes(
+            self.data_anon, self.qi, self.sa, file_name, row_group_size=10
+        )
+        table = pq.read_table(file_name).to_pandas()
+        assert table["size"].min() == 5
+        assert table["Score_t"].max() == pytest.approx(0.31023287057769827)
+        assert pq.ParquetFile(file_name).metadata.num_row_groups > 1
+
+    def test_export_equiv_classes_error(self):
+        pytest.importorskip("pyarrow")
+        from pycanon.report import export
+
+        with pytest.raises(ValueError):
+            export.export_equiv_classes(
+                self.data_anon, self.qi, self.sa, "equiv_classes.txt"
+            )